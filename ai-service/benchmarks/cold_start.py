@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Measure cold-start import time of lambda_handler per operation.
+
+Each measurement runs in a fresh interpreter: import lambda_handler, then
+import the modules the operation needs (lambda_handler.OPERATION_MODULES),
+as a Lambda container would on its first invocation.
+
+Usage:
+    python benchmarks/cold_start.py [--runs 5] [--json]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+SERVICE_DIR = Path(__file__).resolve().parent.parent
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+before = set(sys.modules)
+import lambda_handler
+handler_ms = (time.perf_counter() - start) * 1000
+target = sys.argv[1]
+if target == 'server':
+    lambda_handler.app
+elif target != 'handler':
+    lambda_handler.preload_operation(target)
+total_ms = (time.perf_counter() - start) * 1000
+print(json.dumps({
+    'handler_ms': handler_ms,
+    'total_ms': total_ms,
+    'modules': len(set(sys.modules) - before),
+}))
+"""
+
+
+def measure(target: str, runs: int) -> dict:
+    """Run the probe `runs` times in fresh interpreters and summarize."""
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, '-c', PROBE, target],
+            cwd=SERVICE_DIR,
+            env={**os.environ, 'PYTHONDONTWRITEBYTECODE': '0'},
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+
+    totals = [sample['total_ms'] for sample in samples]
+    return {
+        'target': target,
+        'median_ms': statistics.median(totals),
+        'min_ms': min(totals),
+        'handler_import_ms': statistics.median(sample['handler_ms'] for sample in samples),
+        'modules_loaded': samples[-1]['modules'],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--runs', type=int, default=5, help='fresh interpreters per target')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(SERVICE_DIR))
+    import lambda_handler  # noqa: E402 - only to read the operation list
+
+    targets = ['handler', *lambda_handler.OPERATION_MODULES, 'server']
+    results = [measure(target, args.runs) for target in targets]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'target':<22}{'median ms':>12}{'min ms':>10}{'modules':>10}")
+    for result in results:
+        print(
+            f"{result['target']:<22}{result['median_ms']:>12.1f}"
+            f"{result['min_ms']:>10.1f}{result['modules_loaded']:>10}"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Compare PDF extraction engines side by side on the benchmark corpus.
+
+Every installed engine (pypdf, pdfplumber, pdfium) extracts the same PDFs
+serially. For each one the report shows speed and how far its text drifts
+from the reference engine: word-level similarity per page (1.0 = identical
+words in the same order), the least similar page, and the character count.
+
+Usage:
+    python benchmarks/engines.py [--pages 1,10,100] [--pdf path.pdf ...]
+                                 [--reference pypdf] [--runs 3] [--json out.json]
+"""
+
+from __future__ import annotations
+
+import argparse
+import difflib
+import json
+import sys
+import time
+from pathlib import Path
+
+SERVICE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(SERVICE_DIR))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from pipeline import corpus_path  # noqa: E402
+from src.services.pdf_engines import available_engines, engine_version  # noqa: E402
+from src.services.pdf_extractor import extract_text_from_pdf  # noqa: E402
+
+
+def page_similarity(reference: str, candidate: str) -> float:
+    """Word-level similarity of two page texts, ignoring whitespace layout."""
+    return difflib.SequenceMatcher(None, reference.split(), candidate.split(), autojunk=False).ratio()
+
+
+def compare(pdf: Path, engines: list[str], reference: str, runs: int) -> list[dict]:
+    """Extract pdf with each engine and score its text against the reference."""
+    data = pdf.read_bytes()
+    outputs = {}
+    rows = []
+    for engine in engines:
+        timings = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            result = extract_text_from_pdf(data, parallel=False, engine=engine)
+            timings.append(time.perf_counter() - start)
+        if not result['success']:
+            rows.append({'pdf': pdf.name, 'engine': engine, 'error': result['error']})
+            continue
+        outputs[engine] = result
+        best = min(timings)
+        rows.append({
+            'pdf': pdf.name,
+            'engine': engine,
+            'version': engine_version(engine),
+            'page_count': result['page_count'],
+            'seconds': round(best, 4),
+            'pages_per_sec': round(result['page_count'] / best, 1),
+            'chars': len(result['text']),
+        })
+
+    baseline = outputs.get(reference)
+    for row in rows:
+        engine = row['engine']
+        if baseline is None or engine not in outputs:
+            continue
+        reference_pages = {page['page']: page['text'] for page in baseline['pages']}
+        candidate_pages = {page['page']: page['text'] for page in outputs[engine]['pages']}
+        scores = {
+            number: page_similarity(reference_pages.get(number, ''), candidate_pages.get(number, ''))
+            for number in sorted(reference_pages.keys() | candidate_pages.keys())
+        }
+        if scores:
+            worst = min(scores, key=scores.get)
+            row['similarity'] = round(sum(scores.values()) / len(scores), 4)
+            row['least_similar_page'] = worst
+            row['least_similarity'] = round(scores[worst], 4)
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--pages', default='1,10,100', help='comma-separated synthetic corpus page counts')
+    parser.add_argument('--lines-per-page', type=int, default=None, help='text lines per synthetic page')
+    parser.add_argument('--pdf', type=Path, nargs='*', default=[], help='extra PDFs to compare')
+    parser.add_argument('--reference', default='pypdf', help='engine the others are scored against')
+    parser.add_argument('--runs', type=int, default=3, help='runs per engine; the fastest is reported')
+    parser.add_argument('--json', type=Path, help='also write results to this JSON file')
+    args = parser.parse_args()
+
+    engines = available_engines()
+    pdfs = [corpus_path(int(pages), args.lines_per_page) for pages in args.pages.split(',') if pages]
+    pdfs += args.pdf
+
+    rows = []
+    for pdf in pdfs:
+        rows.extend(compare(pdf, engines, args.reference, args.runs))
+
+    print(f"{'pdf':<28}{'engine':<24}{'pages':>7}{'sec':>9}{'pages/s':>10}{'chars':>10}{'similar':>9}{'worst':>12}")
+    for row in rows:
+        if 'error' in row:
+            print(f"{row['pdf']:<28}{row['engine']:<24}  error: {row['error']}")
+            continue
+        worst = f"p{row['least_similar_page']}={row['least_similarity']:.2f}" if 'similarity' in row else ''
+        similarity = f"{row['similarity']:.3f}" if 'similarity' in row else ''
+        print(
+            f"{row['pdf']:<28}{row['version']:<24}{row['page_count']:>7}{row['seconds']:>9.3f}"
+            f"{row['pages_per_sec']:>10.1f}{row['chars']:>10}{similarity:>9}{worst:>12}"
+        )
+
+    if args.json:
+        args.json.write_text(json.dumps({'reference': args.reference, 'results': rows}, indent=2) + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Benchmark the local embedding index on a synthetic set of 10k+ facts.
+
+Unique facts are generated from case-file templates, then a share of them
+is restated the way different PDFs of one case restate them (leading
+articles, "occurred", citations in the text, reordered clauses). The
+report shows how long embedding and near-duplicate collapse take with
+brute force and with LSH, duplicate precision/recall against the known
+groups, and top-k retrieval latency and LSH recall against brute force.
+Distinct synthetic facts can differ only in a person's name, which facts
+from one case file rarely do, so precision here is a lower bound.
+
+Usage:
+    python benchmarks/fact_index.py [--facts 12000] [--duplicate-rate 0.3]
+                                    [--queries 500] [--k 8] [--json out.json]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+SERVICE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(SERVICE_DIR))
+
+from src.services.embedding_index import VectorIndex, duplicate_leaders, embed_texts, numbers_in  # noqa: E402
+
+FIRST = ['Maria', 'James', 'Aisha', 'Tomas', 'Wei', 'Priya', 'Daniel', 'Fatima', 'Noah', 'Elena', 'Kwame', 'Sofia']
+LAST = ['Lopez', 'Carter', 'Okafor', 'Novak', 'Chen', 'Patel', 'Reyes', 'Haddad', 'Murphy', 'Ivanova', 'Mensah', 'Rossi']
+STREETS = ['Main St', 'Oak Ave', 'Route 9', 'Elm St', 'Harbor Blvd', 'Pine Rd', 'Lake Dr', 'Market St', 'I-95', 'Cedar Ln']
+INJURIES = ['lumbar strain', 'cervical sprain', 'fractured left wrist', 'concussion', 'torn rotator cuff',
+            'whiplash', 'herniated disc at L4-L5', 'knee contusion', 'fractured rib', 'shoulder laceration']
+PROVIDERS = ['St. Mary Hospital', 'Harbor Physical Therapy', 'Dr. Alvarez', 'Northside Urgent Care',
+             'Valley Orthopedics', 'Dr. Kim', 'City Chiropractic', 'Mercy Imaging Center']
+TREATMENTS = ['an MRI', 'X-rays', 'twelve physical therapy sessions', 'an epidural injection', 'surgery',
+              'chiropractic adjustments', 'a CT scan', 'pain management visits']
+VEHICLES = ['2019 Honda Civic', '2021 Ford F-150', '2016 Toyota Camry', 'delivery van', 'city bus', '2020 Tesla Model 3']
+MONTHS = ['January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October', 'November', 'December']
+
+
+def date(rng: random.Random) -> str:
+    return f'{rng.choice(MONTHS)} {rng.randint(1, 28)}, {rng.randint(2019, 2024)}'
+
+
+def person(rng: random.Random) -> str:
+    return f'{rng.choice(FIRST)} {rng.choice(LAST)}'
+
+
+TEMPLATES = [
+    lambda r: f'{person(r)} was rear-ended by a {r.choice(VEHICLES)} at {r.choice(STREETS)} on {date(r)}',
+    lambda r: f'{person(r)} was diagnosed with a {r.choice(INJURIES)} by {r.choice(PROVIDERS)} on {date(r)}',
+    lambda r: f'{r.choice(PROVIDERS)} billed ${r.randint(300, 90000):,} for {r.choice(TREATMENTS)}',
+    lambda r: f'{person(r)} underwent {r.choice(TREATMENTS)} at {r.choice(PROVIDERS)} for a {r.choice(INJURIES)}',
+    lambda r: f'{person(r)} missed {r.randint(2, 40)} weeks of work and lost ${r.randint(1000, 60000):,} in wages',
+    lambda r: f'Police cited the driver of the {r.choice(VEHICLES)} for running a red light at {r.choice(STREETS)}',
+    lambda r: f'Repair estimate for the {r.choice(VEHICLES)} owned by {person(r)} was ${r.randint(800, 30000):,}',
+    lambda r: f'{person(r)} witnessed the collision on {r.choice(STREETS)} and gave a statement on {date(r)}',
+]
+
+
+def restate(fact: str, rng: random.Random) -> str:
+    """A restatement of fact as another PDF of the same case might word it."""
+    variant = fact
+    if rng.random() < 0.5:
+        variant = 'The records show that ' + variant[0].lower() + variant[1:]
+    if ' on ' in variant and rng.random() < 0.5:
+        head, _, tail = variant.partition(' on ')
+        variant = f'On {tail}, {head[0].lower() + head[1:]}'
+    if rng.random() < 0.4:
+        variant = variant.replace(' was ', ' had been ', 1)
+    if rng.random() < 0.5:
+        variant += f' (see page {rng.randint(1, 40)})'
+    return variant + rng.choice(['.', '', '.'])
+
+
+def build_facts(total: int, duplicate_rate: float, seed: int) -> tuple[list[str], list[int]]:
+    """Facts and the group id of each; restatements share their original's group."""
+    rng = random.Random(seed)
+    unique_count = int(total / (1 + duplicate_rate))
+    seen: set[str] = set()
+    originals: list[str] = []
+    while len(originals) < unique_count:
+        fact = rng.choice(TEMPLATES)(rng)
+        if fact not in seen:
+            seen.add(fact)
+            originals.append(fact)
+
+    facts = [fact + '.' for fact in originals]
+    groups = list(range(len(originals)))
+    while len(facts) < total:
+        group = rng.randrange(len(originals))
+        facts.append(restate(originals[group], rng))
+        groups.append(group)
+
+    # Interleave so restatements are not all at the end
+    order = list(range(len(facts)))
+    rng.shuffle(order)
+    return [facts[i] for i in order], [groups[i] for i in order]
+
+
+def duplicate_scores(leaders: np.ndarray, groups: list[int]) -> dict:
+    """Precision and recall of collapsed facts against the true groups."""
+    first_of_group: dict[int, int] = {}
+    truth = []
+    for index, group in enumerate(groups):
+        truth.append(group in first_of_group)
+        first_of_group.setdefault(group, index)
+    truth = np.array(truth)
+    collapsed = leaders != np.arange(len(leaders))
+    correct = collapsed & np.array([groups[int(leaders[i])] == groups[i] for i in range(len(groups))])
+    return {
+        'collapsed': int(collapsed.sum()),
+        'true_duplicates': int(truth.sum()),
+        'precision': round(float(correct.sum() / max(1, collapsed.sum())), 4),
+        'recall': round(float(correct.sum() / max(1, truth.sum())), 4),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--facts', type=int, default=12000, help='total facts including restatements')
+    parser.add_argument('--duplicate-rate', type=float, default=0.3, help='restatements per unique fact')
+    parser.add_argument('--threshold', type=float, default=0.8, help='duplicate similarity threshold')
+    parser.add_argument('--queries', type=int, default=500, help='top-k retrieval queries')
+    parser.add_argument('--k', type=int, default=8, help='facts retrieved per query')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--json', type=Path, help='also write results to this JSON file')
+    args = parser.parse_args()
+
+    facts, groups = build_facts(args.facts, args.duplicate_rate, args.seed)
+    print(f'{len(facts)} facts in {len(set(groups))} groups')
+
+    start = time.perf_counter()
+    vectors = embed_texts(facts)
+    embed_s = time.perf_counter() - start
+    print(f'embed: {embed_s:.3f}s ({len(facts) / embed_s:,.0f} facts/s)')
+
+    numbers = [numbers_in(fact) for fact in facts]
+    report = {'facts': len(facts), 'groups': len(set(groups)), 'embed_s': round(embed_s, 4), 'modes': []}
+    rng = np.random.default_rng(args.seed)
+    queries = vectors[rng.choice(len(vectors), size=min(args.queries, len(vectors)), replace=False)]
+    brute_ids = None
+
+    print(f"{'mode':<8}{'dedupe s':>10}{'collapsed':>11}{'precision':>11}{'recall':>8}{'query ms':>10}{'recall@k':>10}")
+    for mode, ann in (('brute', False), ('lsh', True)):
+        start = time.perf_counter()
+        leaders = duplicate_leaders(vectors, args.threshold, ann=ann, numbers=numbers)
+        dedupe_s = time.perf_counter() - start
+        scores = duplicate_scores(leaders, groups)
+
+        index = VectorIndex(vectors.shape[1], ann=ann)
+        index.add(vectors)
+        index.search(queries[:1], args.k)  # builds LSH buckets outside the timing
+        start = time.perf_counter()
+        _, ids = index.search(queries, args.k)
+        query_ms = (time.perf_counter() - start) * 1000 / len(queries)
+        if brute_ids is None:
+            brute_ids = ids
+        overlap = np.mean([len(set(a) & set(b)) / args.k for a, b in zip(ids.tolist(), brute_ids.tolist())])
+
+        row = {'mode': mode, 'dedupe_s': round(dedupe_s, 4), **scores,
+               'query_ms': round(query_ms, 4), 'recall_at_k': round(float(overlap), 4)}
+        report['modes'].append(row)
+        print(f"{mode:<8}{row['dedupe_s']:>10}{row['collapsed']:>11}{row['precision']:>11}{row['recall']:>8}"
+              f"{row['query_ms']:>10}{row['recall_at_k']:>10}")
+
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2) + '\n')
+
+
+if __name__ == '__main__':
+    main()
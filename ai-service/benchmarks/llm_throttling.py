@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Drive fact extraction against a local fake Anthropic API that throttles.
+
+The fake server speaks just enough of POST /v1/messages for the SDK. It
+enforces its own requests/min and input tokens/min buckets (answering 429
+with retry-after), reports anthropic-ratelimit-* headers, answers 529
+overloaded when more than --server-concurrency requests are in flight, and
+injects random 529s at --overload-rate.
+
+Each mode runs in a fresh interpreter pointed at the server through
+ANTHROPIC_BASE_URL:
+    scheduler  LLM_SCHEDULER=true, the shared scheduler paces and retries calls
+    direct     LLM_SCHEDULER=false, raw SDK calls with the SDK's own retries
+
+The report shows how many calls returned facts, how many silently came back
+empty, how many raised, how often the server throttled, and call latency.
+
+Usage:
+    python benchmarks/llm_throttling.py [--calls 60] [--rpm 120] [--itpm 60000]
+                                        [--modes scheduler,direct] [--json out.json]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+SERVICE_DIR = Path(__file__).resolve().parent.parent
+
+
+# --- fake server ---------------------------------------------------------------
+
+class Bucket:
+    """Server-side token bucket holding burst_seconds worth of allowance."""
+
+    def __init__(self, per_minute: float, burst_seconds: float):
+        self.per_minute = per_minute
+        self.capacity = per_minute * burst_seconds / 60
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def take(self, amount: float) -> float:
+        """Take amount and return 0, or return the seconds until it would fit."""
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.per_minute / 60)
+        self.updated = now
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            self.level -= amount
+            return 0.0
+        return (amount - self.level) * 60 / self.per_minute
+
+
+class FakeAnthropic:
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.requests = Bucket(args.rpm, args.burst_seconds)
+        self.tokens = Bucket(args.itpm, args.burst_seconds)
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.counts = {'ok': 0, '429': 0, '529': 0}
+
+    def headers(self) -> dict:
+        return {
+            'anthropic-ratelimit-requests-limit': str(self.args.rpm),
+            'anthropic-ratelimit-requests-remaining': str(max(0, int(self.requests.level))),
+            'anthropic-ratelimit-input-tokens-limit': str(self.args.itpm),
+            'anthropic-ratelimit-input-tokens-remaining': str(max(0, int(self.tokens.level))),
+        }
+
+    def admit(self, input_tokens: int) -> tuple[int, dict]:
+        with self.lock:
+            if self.in_flight >= self.args.server_concurrency or random.random() < self.args.overload_rate:
+                self.counts['529'] += 1
+                return 529, self.headers()
+            wait = self.requests.take(1)
+            if not wait:
+                wait = self.tokens.take(input_tokens)
+                if wait:
+                    # Give the request back; nothing was served
+                    self.requests.level += 1
+            headers = self.headers()
+            if wait:
+                self.counts['429'] += 1
+                headers['retry-after'] = str(math.ceil(wait))
+                return 429, headers
+            self.in_flight += 1
+            self.counts['ok'] += 1
+            return 200, headers
+
+    def done(self) -> None:
+        with self.lock:
+            self.in_flight -= 1
+
+
+def make_handler(fake: FakeAnthropic):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, *args) -> None:
+            pass
+
+        def send_json(self, status: int, body: dict, headers: dict) -> None:
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('content-type', 'application/json')
+            self.send_header('content-length', str(len(data)))
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self) -> None:
+            request = json.loads(self.rfile.read(int(self.headers['content-length'])))
+            text = json.dumps(request.get('system', '')) + json.dumps(request['messages'])
+            input_tokens = len(text) // 4
+
+            status, headers = fake.admit(input_tokens)
+            if status == 429:
+                self.send_json(429, {'type': 'error', 'error': {'type': 'rate_limit_error', 'message': 'Rate limited'}}, headers)
+                return
+            if status == 529:
+                self.send_json(529, {'type': 'error', 'error': {'type': 'overloaded_error', 'message': 'Overloaded'}}, headers)
+                return
+
+            try:
+                time.sleep(fake.args.latency_ms / 1000)
+                facts = [{'fact_text': f'Fact {index}', 'category': 'other', 'page_reference': 'page 1'} for index in range(3)]
+                self.send_json(200, {
+                    'id': 'msg_fake',
+                    'type': 'message',
+                    'role': 'assistant',
+                    'model': request['model'],
+                    'content': [{'type': 'text', 'text': json.dumps(facts)}],
+                    'stop_reason': 'end_turn',
+                    'stop_sequence': None,
+                    'usage': {'input_tokens': input_tokens, 'output_tokens': 60},
+                }, headers)
+            finally:
+                fake.done()
+
+    return Handler
+
+
+# --- client side -----------------------------------------------------------------
+
+async def run_calls(calls: int, chars: int) -> dict:
+    sys.path.insert(0, str(SERVICE_DIR))
+    from src.services.anthropic_service import extract_facts_from_text_async
+
+    async def one(index: int) -> tuple[str, float]:
+        text = f'Document {index}. ' + 'The claimant was treated for injuries. ' * (chars // 40)
+        start = time.perf_counter()
+        try:
+            facts = await extract_facts_from_text_async(text, f'doc_{index}.pdf')
+            outcome = 'ok' if facts else 'empty'
+        except Exception:
+            outcome = 'error'
+        return outcome, time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(one(index) for index in range(calls)))
+    wall = time.perf_counter() - start
+    latencies = sorted(latency for _, latency in results)
+    summary = {outcome: sum(1 for result, _ in results if result == outcome) for outcome in ('ok', 'empty', 'error')}
+    summary.update({
+        'wall_s': round(wall, 2),
+        'p50_s': round(latencies[len(latencies) // 2], 2),
+        'p95_s': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 2),
+    })
+    try:
+        from src.services.llm_scheduler import LLM_SCHEDULER, get_llm_scheduler
+        if LLM_SCHEDULER:
+            summary['scheduler'] = get_llm_scheduler().get_stats()
+    except ImportError:
+        pass
+    return summary
+
+
+def run_mode(mode: str, port: int, args: argparse.Namespace, fake: FakeAnthropic) -> dict:
+    before = dict(fake.counts)
+    env = {
+        **os.environ,
+        'ANTHROPIC_BASE_URL': f'http://127.0.0.1:{port}',
+        'ANTHROPIC_API_KEY': 'fake-key',
+        'FACT_CACHE_BACKEND': 'none',
+        'LLM_SCHEDULER': 'true' if mode == 'scheduler' else 'false',
+        'LLM_RETRY_BASE_SECONDS': str(args.retry_base),
+    }
+    output = subprocess.run(
+        [sys.executable, __file__, '--worker', '--calls', str(args.calls), '--chars', str(args.chars)],
+        env=env, capture_output=True, text=True, cwd=SERVICE_DIR,
+    )
+    if output.returncode != 0:
+        raise SystemExit(f'{mode} run failed:\n{output.stderr}')
+    summary = json.loads(output.stdout.strip().splitlines()[-1])
+    summary['mode'] = mode
+    summary['server'] = {key: fake.counts[key] - before[key] for key in fake.counts}
+    return summary
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--calls', type=int, default=60, help='concurrent extract_facts calls per mode')
+    parser.add_argument('--chars', type=int, default=4000, help='document text characters per call')
+    parser.add_argument('--rpm', type=int, default=120, help='fake server requests per minute')
+    parser.add_argument('--itpm', type=int, default=60000, help='fake server input tokens per minute')
+    parser.add_argument('--burst-seconds', type=float, default=10, help='seconds of allowance the server buckets hold')
+    parser.add_argument('--server-concurrency', type=int, default=8, help='in-flight requests before 529s')
+    parser.add_argument('--overload-rate', type=float, default=0.02, help='share of requests answered 529 at random')
+    parser.add_argument('--latency-ms', type=float, default=300, help='fake response latency')
+    parser.add_argument('--retry-base', type=float, default=0.5, help='LLM_RETRY_BASE_SECONDS for the scheduler')
+    parser.add_argument('--modes', default='scheduler,direct', help='comma-separated modes to run')
+    parser.add_argument('--json', type=Path, help='also write results to this JSON file')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(asyncio.run(run_calls(args.calls, args.chars))))
+        return
+
+    rows = []
+    for mode in args.modes.split(','):
+        # A fresh server per mode so both start with full buckets
+        fake = FakeAnthropic(args)
+        server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(fake))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            rows.append(run_mode(mode, server.server_address[1], args, fake))
+        finally:
+            server.shutdown()
+
+    print(f"{'mode':<12}{'ok':>6}{'empty':>7}{'error':>7}{'429s':>7}{'529s':>7}{'wall s':>9}{'p50 s':>8}{'p95 s':>8}")
+    for row in rows:
+        print(
+            f"{row['mode']:<12}{row['ok']:>6}{row['empty']:>7}{row['error']:>7}"
+            f"{row['server']['429']:>7}{row['server']['529']:>7}{row['wall_s']:>9}{row['p50_s']:>8}{row['p95_s']:>8}"
+        )
+
+    if args.json:
+        args.json.write_text(json.dumps(rows, indent=2) + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,434 @@
+#!/usr/bin/env python3
+"""
+Offline throughput benchmark for PDF extraction and the lambda_handler operations.
+
+Synthetic corpora are built with samples/generate_sample_pdfs.py (reportlab)
+and cached between runs. Every (target, corpus) case runs in a fresh
+interpreter so peak RSS is measured per case. S3, Postgres and Anthropic are
+replaced by in-process stubs, so no network or credentials are needed; the
+stubbed LLM answers after --llm-latency-ms to approximate API round trips.
+
+Targets:
+    extract              extract_text_from_pdf on the PDF bytes
+    extract_text         lambda_handler extract_text (S3 download, extract, DB update)
+    extract_facts        lambda_handler extract_facts on per-page text
+    extract_facts_batch  lambda_handler extract_facts_batch, one item per PDF copy
+    process_case         lambda_handler process_case: download, extract and facts per PDF copy
+    generate_draft       lambda_handler generate_draft with facts scaled to pages
+
+Usage:
+    python benchmarks/pipeline.py [--pages 1,10,100,500,2000] [--targets extract,extract_text]
+                                  [--runs 3] [--output results.json] [--compare baseline.json]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import math
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from types import SimpleNamespace
+
+SERVICE_DIR = Path(__file__).resolve().parent.parent
+SAMPLES_DIR = SERVICE_DIR.parent / 'samples'
+RESULTS_DIR = Path(__file__).resolve().parent / 'results'
+CORPUS_DIR = Path(tempfile.gettempdir()) / 'demand-letter-bench-corpus'
+
+TARGETS = ['extract', 'extract_text', 'extract_facts', 'extract_facts_batch', 'process_case', 'generate_draft']
+BATCH_ITEMS = 4
+
+
+# --- corpus ------------------------------------------------------------------
+
+def corpus_path(pages: int, lines_per_page: int | None) -> Path:
+    """Build (or reuse) a synthetic PDF with the given page count."""
+    density = lines_per_page or 'full'
+    path = CORPUS_DIR / f'corpus_{pages}p_{density}.pdf'
+    if not path.exists():
+        sys.path.insert(0, str(SAMPLES_DIR))
+        from generate_sample_pdfs import build_synthetic_pdf
+
+        CORPUS_DIR.mkdir(parents=True, exist_ok=True)
+        partial = path.with_suffix('.tmp')
+        build_synthetic_pdf(partial, pages, lines_per_page)
+        partial.replace(path)
+    return path
+
+
+# --- local stubs -------------------------------------------------------------
+
+class StubBody:
+    """Minimal botocore StreamingBody."""
+
+    def __init__(self, data: bytes):
+        self._data = data
+
+    def read(self) -> bytes:
+        return self._data
+
+    def iter_chunks(self, chunk_size: int):
+        for start in range(0, len(self._data), chunk_size):
+            yield self._data[start:start + chunk_size]
+
+
+class StubS3Client:
+    """Serves object keys as local file paths, honouring Range requests."""
+
+    def head_object(self, Bucket: str, Key: str) -> dict:
+        return {'ContentLength': os.path.getsize(Key)}
+
+    def get_object(self, Bucket: str, Key: str, Range: str | None = None) -> dict:
+        data = Path(Key).read_bytes()
+        if Range:
+            start, end = Range.removeprefix('bytes=').split('-')
+            data = data[int(start):int(end) + 1]
+        return {'Body': StubBody(data)}
+
+
+class StubCursor:
+    def __init__(self, connection: 'StubConnection'):
+        self.connection = connection
+        self.rowcount = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=None) -> None:
+        # Touch every parameter the way the driver would when serializing
+        self.connection.bytes_sent += sum(len(str(param)) for param in params or ())
+        self.rowcount = 1
+
+    def mogrify(self, query, params=None) -> bytes:
+        # Used by psycopg2.extras.execute_values to render each row
+        return repr(params).encode()
+
+    def fetchone(self):
+        return None
+
+    def fetchall(self) -> list:
+        return []
+
+
+class StubConnection:
+    closed = False
+    encoding = 'UTF8'
+
+    def __init__(self):
+        self.bytes_sent = 0
+
+    def cursor(self) -> StubCursor:
+        return StubCursor(self)
+
+    def commit(self) -> None:
+        pass
+
+    def rollback(self) -> None:
+        pass
+
+
+class StubPool:
+    """Stands in for psycopg2's ThreadedConnectionPool."""
+
+    def getconn(self) -> StubConnection:
+        return StubConnection()
+
+    def putconn(self, conn, close: bool = False) -> None:
+        pass
+
+    def closeall(self) -> None:
+        pass
+
+
+class StubMessages:
+    """Answers messages.create with canned facts or a draft after a fixed delay."""
+
+    def __init__(self, latency_s: float):
+        self.latency_s = latency_s
+
+    def _respond(self, max_tokens: int, messages: list, system: list) -> SimpleNamespace:
+        prompt = messages[-1]['content']
+        if any('"fact_text"' in block['text'] for block in system):
+            text = json.dumps([
+                {
+                    'fact_text': f'Synthetic fact {index} about the incident',
+                    'category': 'other',
+                    'page_reference': marker,
+                }
+                for index, marker in enumerate(
+                    line.strip('- ').lower() for line in prompt.splitlines() if line.startswith('--- Page ')
+                )
+            ] or [{'fact_text': 'Synthetic fact', 'category': 'other', 'page_reference': 'page 1'}])
+        else:
+            text = 'Dear Claims Adjuster,\n\n' + 'This letter sets out our demand. ' * 200
+        return SimpleNamespace(
+            content=[SimpleNamespace(type='text', text=text)],
+            usage=SimpleNamespace(input_tokens=len(prompt) // 4, output_tokens=len(text) // 4),
+            stop_reason='end_turn',
+        )
+
+    def create(self, model: str, max_tokens: int, messages: list, system: list = (), **kwargs) -> SimpleNamespace:
+        time.sleep(self.latency_s)
+        return self._respond(max_tokens, messages, system)
+
+    @property
+    def with_raw_response(self) -> 'StubRawMessages':
+        return StubRawMessages(self)
+
+
+class StubRawMessages:
+    """messages.with_raw_response, as used by the LLM scheduler: the reply plus rate-limit headers."""
+
+    def __init__(self, messages: StubMessages):
+        self.messages = messages
+
+    def create(self, **kwargs):
+        reply = self.messages.create(**kwargs)
+        if asyncio.iscoroutine(reply):
+            async def parsed():
+                return self._raw(await reply)
+            return parsed()
+        return self._raw(reply)
+
+    @staticmethod
+    def _raw(message: SimpleNamespace) -> SimpleNamespace:
+        return SimpleNamespace(headers={}, parse=lambda: message)
+
+
+class StubAsyncMessages(StubMessages):
+    async def create(self, model: str, max_tokens: int, messages: list, system: list = (), **kwargs) -> SimpleNamespace:
+        await asyncio.sleep(self.latency_s)
+        return self._respond(max_tokens, messages, system)
+
+
+def install_stubs(llm_latency_s: float) -> None:
+    """Point the service modules at the local stubs."""
+    from src.services import anthropic_service, database_service, s3_service
+
+    s3_service._s3_client = StubS3Client()
+    database_service._pool = StubPool()
+    sync_client = SimpleNamespace(messages=StubMessages(llm_latency_s))
+    async_client = SimpleNamespace(messages=StubAsyncMessages(llm_latency_s))
+    anthropic_service.get_client = lambda: sync_client
+    anthropic_service.get_async_client = lambda: async_client
+
+
+# --- worker ------------------------------------------------------------------
+
+def peak_rss_mb(who: int = resource.RUSAGE_SELF) -> float:
+    peak = resource.getrusage(who).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def percentile(samples: list[float], q: float) -> float:
+    """Nearest-rank percentile."""
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, math.ceil(q / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def build_call(target: str, pdf_path: Path):
+    """Return a zero-argument callable running one invocation of target."""
+    import lambda_handler
+    from src.services.pdf_extractor import extract_text_from_pdf
+
+    pdf_bytes = pdf_path.read_bytes()
+    if target == 'extract':
+        return lambda: extract_text_from_pdf(pdf_bytes)
+
+    pages = extract_text_from_pdf(pdf_bytes)['pages']
+    payloads = {
+        'extract_text': {'pdfId': 'bench', 's3Key': str(pdf_path)},
+        'extract_facts': {'pages': pages, 'pdfFilename': pdf_path.name},
+        'extract_facts_batch': {'items': [
+            {'pdfId': f'bench-{index}', 'pages': pages, 'pdfFilename': pdf_path.name}
+            for index in range(BATCH_ITEMS)
+        ]},
+        'process_case': {'pdfs': [
+            {'pdfId': f'bench-{index}', 's3Key': str(pdf_path), 'pdfFilename': pdf_path.name}
+            for index in range(BATCH_ITEMS)
+        ]},
+        'generate_draft': {
+            'facts': [
+                {'factText': f"Fact from page {page['page']}", 'category': 'other'}
+                for page in pages
+            ],
+            'templateStructure': {},
+            'templateContent': '',
+        },
+    }
+    event = {'operation': target, 'payload': payloads[target]}
+
+    def call():
+        response = lambda_handler.lambda_handler(event)
+        if response['statusCode'] != 200:
+            raise RuntimeError(f"{target} failed: {response['body'][:200]}")
+        return response
+
+    return call
+
+
+def run_case(spec: dict) -> dict:
+    """Run one benchmark case in this interpreter."""
+    os.chdir(SERVICE_DIR)
+    sys.path.insert(0, str(SERVICE_DIR))
+    install_stubs(spec['llm_latency_ms'] / 1000)
+
+    pdf_path = Path(spec['pdf'])
+    call = build_call(spec['target'], pdf_path)
+    quiet = io.StringIO()
+    with contextlib.redirect_stdout(quiet):
+        for _ in range(spec['warmup']):
+            call()
+        latencies = []
+        for _ in range(spec['runs']):
+            start = time.perf_counter()
+            call()
+            latencies.append(time.perf_counter() - start)
+
+    processed_pages = spec['pages'] * (BATCH_ITEMS if spec['target'] in ('extract_facts_batch', 'process_case') else 1)
+    return {
+        'target': spec['target'],
+        'pages': spec['pages'],
+        'pdf_bytes': pdf_path.stat().st_size,
+        'runs': spec['runs'],
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 2),
+        'pages_per_sec': round(processed_pages / percentile(latencies, 50), 1),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        # Largest extraction worker process, when parallel extraction kicked in
+        'peak_worker_rss_mb': round(peak_rss_mb(resource.RUSAGE_CHILDREN), 1),
+    }
+
+
+def measure(spec: dict) -> dict:
+    """Run one case in a fresh interpreter and return its result."""
+    env = {
+        **os.environ,
+        # Measure real work, not cache hits
+        'EXTRACTION_CACHE_BACKEND': 'none',
+        'FACT_CACHE_BACKEND': 'none',
+        'METRICS_JSON_LOG': 'false',
+    }
+    completed = subprocess.run(
+        [sys.executable, __file__, '--worker', json.dumps(spec)],
+        cwd=SERVICE_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if completed.returncode != 0:
+        raise SystemExit(f"{spec['target']} @ {spec['pages']} pages failed:\n{completed.stderr}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+# --- reporting ---------------------------------------------------------------
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=SERVICE_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_table(results: list[dict], baseline: dict | None = None) -> None:
+    header = f"{'target':<22}{'pages':>7}{'p50 ms':>11}{'p95 ms':>11}{'pages/s':>11}{'RSS MB':>9}"
+    if baseline:
+        header += f"{'vs base':>10}"
+    print(header)
+    for result in results:
+        line = (
+            f"{result['target']:<22}{result['pages']:>7}{result['p50_ms']:>11.1f}"
+            f"{result['p95_ms']:>11.1f}{result['pages_per_sec']:>11.1f}{result['peak_rss_mb']:>9.1f}"
+        )
+        previous = (baseline or {}).get((result['target'], result['pages']))
+        if previous:
+            line += f"{(result['p50_ms'] / previous['p50_ms'] - 1) * 100:>+9.1f}%"
+        print(line)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--pages', default='1,10,100,500,2000', help='comma-separated corpus page counts')
+    parser.add_argument('--lines-per-page', type=int, default=None, help='text lines per page (default: full page)')
+    parser.add_argument('--targets', default=','.join(TARGETS), help='comma-separated targets to run')
+    parser.add_argument('--runs', type=int, default=3, help='timed runs per case')
+    parser.add_argument('--warmup', type=int, default=1, help='untimed runs per case')
+    parser.add_argument('--llm-latency-ms', type=float, default=200, help='stubbed Anthropic response delay')
+    parser.add_argument('--output', type=Path, help='JSON results path (default: benchmarks/results/pipeline-<commit>.json)')
+    parser.add_argument('--compare', type=Path, help='earlier results JSON to compare p50 against')
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_case(json.loads(args.worker))))
+        return
+
+    targets = [target for target in args.targets.split(',') if target]
+    unknown = set(targets) - set(TARGETS)
+    if unknown:
+        parser.error(f"unknown targets: {', '.join(sorted(unknown))}")
+
+    results = []
+    for pages in (int(value) for value in args.pages.split(',')):
+        pdf = corpus_path(pages, args.lines_per_page)
+        for target in targets:
+            results.append(measure({
+                'target': target,
+                'pages': pages,
+                'pdf': str(pdf),
+                'runs': args.runs,
+                'warmup': args.warmup,
+                'llm_latency_ms': args.llm_latency_ms,
+            }))
+            print(f"{target} @ {pages} pages: p50 {results[-1]['p50_ms']:.1f} ms", file=sys.stderr)
+
+    commit = git_commit()
+    report = {
+        'commit': commit,
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'config': {
+            'runs': args.runs,
+            'warmup': args.warmup,
+            'lines_per_page': args.lines_per_page,
+            'llm_latency_ms': args.llm_latency_ms,
+            'batch_items': BATCH_ITEMS,
+        },
+        'results': results,
+    }
+
+    output = args.output or RESULTS_DIR / f"pipeline-{commit or 'local'}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2) + '\n')
+
+    baseline = None
+    if args.compare:
+        previous = json.loads(args.compare.read_text())
+        baseline = {(result['target'], result['pages']): result for result in previous['results']}
+    print_table(results, baseline)
+    print(f'\nSaved {output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -3,36 +3,106 @@ AI Service Lambda Handler
 Handles PDF text extraction and AI-powered demand letter generation
 """
 
+import asyncio
 import json
 import os
 import sys
-from typing import Dict, Any
+import time
+from typing import Dict, Any, AsyncIterator, Iterator, List, Optional
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
 
 # Debug: Print S3 bucket name
-print(f"[DEBUG] S3_BUCKET_NAME from env: {os.getenv('S3_BUCKET_NAME', 'NOT_SET')}")
+if os.getenv('LOG_LEVEL', 'INFO').upper() == 'DEBUG':
+    print(f"[DEBUG] S3_BUCKET_NAME from env: {os.getenv('S3_BUCKET_NAME', 'NOT_SET')}")
 
 # Add src directory to path
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
 
-from src.services.pdf_extractor import extract_text_from_pdf
-from src.services.s3_service import download_from_s3
-from src.services.database_service import update_pdf_extracted_text
+from src.services.metrics import invocation, invocation_usage, stage, record_pdf
 
-# Load environment variables
-load_dotenv()
+# Service modules are imported inside each handler so a cold start only
+# pays for the dependencies (pypdf, boto3, psycopg2, anthropic) that the
+# requested operation needs. Clients inside those modules are created on
+# first use and reused across warm invocations.
+OPERATION_MODULES = {
+    'extract_text': [
+        'src.services.s3_service',
+        'src.services.incremental_extraction',
+        'src.services.database_service',
+    ],
+    'extract_facts': ['src.services.fact_chunking'],
+    'extract_facts_batch': [
+        'src.services.database_service',
+        'src.services.s3_service',
+        'src.services.extraction_cache',
+        'src.services.fact_chunking',
+        'src.services.fact_selection',
+    ],
+    'process_case': [
+        'src.services.database_service',
+        'src.services.s3_service',
+        'src.services.incremental_extraction',
+        'src.services.extraction_cache',
+        'src.services.fact_chunking',
+        'src.services.fact_selection',
+    ],
+    'generate_draft': ['src.services.anthropic_service'],
+    'get_pages': ['src.services.database_service'],
+    'search': ['src.services.search_service'],
+    'reindex_search': ['src.services.search_service'],
+}
+
+# Characters of streamed text buffered before each database append
+EXTRACT_STREAM_FLUSH_CHARS = int(os.getenv('EXTRACT_STREAM_FLUSH_CHARS', 1_000_000))
+
+# Most pages returned by one get_pages call
+PAGE_FETCH_MAX_PAGES = int(os.getenv('PAGE_FETCH_MAX_PAGES', 100))
+
+# PDFs processed at once by extract_facts_batch
+FACT_BATCH_CONCURRENCY = int(os.getenv('FACT_BATCH_CONCURRENCY', 8))
+
+# process_case stage limits: S3 downloads, text extractions and fact
+# extractions (FACT_BATCH_CONCURRENCY) run at once, and at most
+# CASE_MAX_IN_FLIGHT PDFs are downloaded but not yet extracted
+CASE_DOWNLOAD_CONCURRENCY = int(os.getenv('CASE_DOWNLOAD_CONCURRENCY', 4))
+CASE_EXTRACT_CONCURRENCY = int(os.getenv('CASE_EXTRACT_CONCURRENCY', 2))
+CASE_MAX_IN_FLIGHT = int(os.getenv('CASE_MAX_IN_FLIGHT', 6))
+# Drop facts that repeat a fact from an earlier PDF of the same batch
+FACT_BATCH_DEDUPE = os.getenv('FACT_BATCH_DEDUPE', 'true').lower() == 'true'
 
 def lambda_handler(event: Dict[str, Any], context: Any = None) -> Dict[str, Any]:
+    """
+    Sync Lambda entry point
+    
+    Runs lambda_handler_async to completion so Lambda and other sync callers
+    keep working unchanged.
+    """
+    return asyncio.run(lambda_handler_async(event, context))
+
+
+def preload_operation(operation: str) -> None:
+    """Import the modules an operation needs, e.g. to warm a container"""
+    import importlib
+    for module in OPERATION_MODULES.get(operation, []):
+        importlib.import_module(module)
+
+
+async def lambda_handler_async(event: Dict[str, Any], context: Any = None) -> Dict[str, Any]:
     """
     Main Lambda handler for AI operations
     
     Supports the following operations:
     - extract_text: Extract text from PDF
     - extract_facts: Extract structured facts from text
-    - generate_draft: Generate demand letter draft
+    - extract_facts_batch: Extract facts for many PDFs concurrently
+    - process_case: Download, extract and extract facts for a case's PDFs in one pipeline
+    - generate_draft: Generate demand letter draft (draftMode single or sections)
+    - get_pages: Read a range of stored page text of an extracted PDF
+    - search: Full-text search over extracted PDF pages and facts
+    - reindex_search: Index page and fact rows stored before search existed
     """
     
     try:
@@ -43,19 +113,34 @@ def lambda_handler(event: Dict[str, Any], context: Any = None) -> Dict[str, Any]
         operation = event.get('operation')
         payload = event.get('payload', {})
         
-        if operation == 'extract_text':
-            return handle_extract_text(payload)
-        elif operation == 'extract_facts':
-            return handle_extract_facts(payload)
-        elif operation == 'generate_draft':
-            return handle_generate_draft(payload)
-        else:
-            return {
-                'statusCode': 400,
-                'body': json.dumps({
-                    'error': f'Unknown operation: {operation}'
-                })
-            }
+        with invocation(str(operation)) as timing:
+            if operation == 'extract_text':
+                # Download, pypdf and Postgres are blocking, so keep them off the event loop
+                response = await asyncio.to_thread(handle_extract_text, payload)
+            elif operation == 'extract_facts':
+                response = await handle_extract_facts(payload)
+            elif operation == 'extract_facts_batch':
+                response = await handle_extract_facts_batch(payload)
+            elif operation == 'process_case':
+                response = await handle_process_case(payload)
+            elif operation == 'generate_draft':
+                response = await handle_generate_draft(payload)
+            elif operation == 'get_pages':
+                response = await asyncio.to_thread(handle_get_pages, payload)
+            elif operation == 'search':
+                response = await asyncio.to_thread(handle_search, payload)
+            elif operation == 'reindex_search':
+                response = await asyncio.to_thread(handle_reindex_search, payload)
+            else:
+                response = {
+                    'statusCode': 400,
+                    'body': json.dumps({
+                        'error': f'Unknown operation: {operation}'
+                    })
+                }
+            
+            timing['status'] = response['statusCode']
+            return response
             
     except Exception as e:
         print(f'Error in lambda_handler: {str(e)}')
@@ -67,9 +152,110 @@ def lambda_handler(event: Dict[str, Any], context: Any = None) -> Dict[str, Any]
         }
 
 
+def _file_size(file) -> int:
+    """Size of an open file without reading it"""
+    position = file.tell()
+    size = file.seek(0, os.SEEK_END)
+    file.seek(position)
+    return size
+
+
+def _extract_and_store(
+    pdf_id: str,
+    pdf_file,
+    parallel: Optional[bool] = None,
+    engine: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Extract text from an open PDF file and store it as page records
+    
+    Args:
+        pdf_id: UUID of PDF record
+        pdf_file: Downloaded PDF, left open for the caller to close
+        parallel: Extract pages in parallel (default decided by page count)
+        engine: PDF engine name (default PDF_ENGINE)
+        
+    Returns:
+        Extraction result as from extract_text_incremental
+    """
+    from src.services.incremental_extraction import PDF_INCREMENTAL_EXTRACTION, extract_text_incremental
+    from src.services.database_service import (
+        clear_pdf_pages,
+        get_pdf_pages,
+        save_pdf_pages,
+        store_pdf_page_rows,
+        update_pdf_extracted_text,
+    )
+    
+    # Stored page fingerprints let unchanged pages skip extraction
+    stored_pages = None
+    if PDF_INCREMENTAL_EXTRACTION:
+        with stage('load_pages'):
+            try:
+                stored_pages = get_pdf_pages(pdf_id)
+            except Exception as e:
+                print(f'Page records unavailable, extracting every page: {str(e)}')
+    
+    # Extract text straight from the downloaded file
+    print(f'Extracting text from PDF')
+    pdf_size = _file_size(pdf_file)
+    with stage('extract'):
+        result = extract_text_incremental(stored_pages, pdf_file, parallel=parallel, engine=engine)
+    record_pdf(pdf_size, result['page_count'] if result['success'] else None)
+    
+    if not result['success']:
+        return result
+    
+    if result['cached']:
+        print(f'Extraction cache hit for PDF {pdf_id}')
+    if result['reused_pages']:
+        print(f"Reused {result['reused_pages']} of {result['page_count']} pages, extracted {result['extracted_pages']}")
+    if result.get('ocr'):
+        ocr = result['ocr']
+        print(f"OCRed {ocr['pages']} scanned pages in {ocr['seconds']}s ({ocr['cached']} cached)")
+    
+    # Update database
+    print(f'Updating database with extracted text')
+    with stage('db_update'):
+        if result['page_changes'] is None:
+            # Unfingerprinted page rows keep the text searchable
+            stored = (
+                update_pdf_extracted_text(pdf_id, result['text'], result['page_count'])
+                and clear_pdf_pages(pdf_id)
+                and store_pdf_page_rows(pdf_id, [
+                    {'page_number': page['page'], 'fingerprint': '', 'text': page['text']}
+                    for page in result['pages']
+                ])
+            )
+        else:
+            stored = save_pdf_pages(pdf_id, result['page_count'], **result['page_changes'])
+    
+    if not stored:
+        # Reported as a failure so callers and the job queue do not treat unsaved text as done
+        return {**result, 'success': False, 'error': 'Failed to store extracted text in database'}
+    return result
+
+
+def _extraction_summary(pdf_id: str, result: Dict[str, Any]) -> Dict[str, Any]:
+    """Counts and ids describing a successful extraction, without its text"""
+    return {
+        'pdfId': pdf_id,
+        'page_count': result['page_count'],
+        'pages_with_text': len(result['pages']),
+        'chars': sum(len(page['text']) for page in result['pages']),
+        'engine': result['engine'],
+        'cached': result['cached'],
+        'extracted_pages': result['extracted_pages'],
+        'reused_pages': result['reused_pages'],
+        'ocr': result.get('ocr'),
+    }
+
+
 def handle_extract_text(payload: Dict[str, Any]) -> Dict[str, Any]:
     """Extract text from PDF"""
     try:
+        from src.services.s3_service import download_from_s3_to_file
+        
         pdf_id = payload.get('pdfId')
         s3_key = payload.get('s3Key')
         
@@ -81,11 +267,12 @@ def handle_extract_text(payload: Dict[str, Any]) -> Dict[str, Any]:
                 })
             }
         
-        # Download PDF from S3
+        # Download PDF from S3 into a temp file (spooled in memory when small)
         print(f'Downloading PDF from S3: {s3_key}')
-        pdf_bytes = download_from_s3(s3_key)
+        with stage('download'):
+            pdf_file = download_from_s3_to_file(s3_key)
         
-        if not pdf_bytes:
+        if pdf_file is None:
             return {
                 'statusCode': 500,
                 'body': json.dumps({
@@ -93,9 +280,10 @@ def handle_extract_text(payload: Dict[str, Any]) -> Dict[str, Any]:
                 })
             }
         
-        # Extract text
-        print(f'Extracting text from PDF')
-        result = extract_text_from_pdf(pdf_bytes)
+        try:
+            result = _extract_and_store(pdf_id, pdf_file, payload.get('parallel'), payload.get('engine'))
+        finally:
+            pdf_file.close()
         
         if not result['success']:
             return {
@@ -105,16 +293,12 @@ def handle_extract_text(payload: Dict[str, Any]) -> Dict[str, Any]:
                 })
             }
         
-        # Update database
-        print(f'Updating database with extracted text')
-        update_pdf_extracted_text(pdf_id, result['text'], result['page_count'])
-        
         return {
             'statusCode': 200,
+            # Text stays in pdf_pages; clients read page ranges with get_pages
             'body': json.dumps({
                 'success': True,
-                'text': result['text'],
-                'page_count': result['page_count'],
+                **_extraction_summary(pdf_id, result),
             })
         }
         
@@ -128,16 +312,286 @@ def handle_extract_text(payload: Dict[str, Any]) -> Dict[str, Any]:
         }
 
 
-def handle_extract_facts(payload: Dict[str, Any]) -> Dict[str, Any]:
+def handle_get_pages(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Read stored page text of an extracted PDF, PAGE_FETCH_MAX_PAGES pages at a time"""
+    try:
+        from src.services.database_service import get_pdf_page_range
+        
+        pdf_id = payload.get('pdfId')
+        if not pdf_id:
+            return {
+                'statusCode': 400,
+                'body': json.dumps({
+                    'error': 'Missing pdfId'
+                })
+            }
+        
+        first_page = max(1, int(payload.get('startPage') or 1))
+        last_page = int(payload.get('endPage') or first_page + PAGE_FETCH_MAX_PAGES - 1)
+        last_page = min(last_page, first_page + PAGE_FETCH_MAX_PAGES - 1)
+        if last_page < first_page:
+            return {
+                'statusCode': 400,
+                'body': json.dumps({
+                    'error': 'endPage is before startPage'
+                })
+            }
+        
+        with stage('load_pages'):
+            found = get_pdf_page_range(pdf_id, first_page, last_page)
+        if found is None:
+            return {
+                'statusCode': 404,
+                'body': json.dumps({
+                    'error': f'PDF not found: {pdf_id}'
+                })
+            }
+        
+        page_count = found['page_count'] or 0
+        return {
+            'statusCode': 200,
+            'body': json.dumps({
+                'pdfId': pdf_id,
+                'page_count': found['page_count'],
+                'stored_pages': found['stored_pages'],
+                'startPage': first_page,
+                'endPage': last_page,
+                # Blank pages may have no record, so numbers missing from pages are blank
+                'pages': found['pages'],
+                'nextPage': last_page + 1 if last_page < page_count else None,
+            })
+        }
+    
+    except Exception as e:
+        print(f'Error reading pages: {str(e)}')
+        return {
+            'statusCode': 500,
+            'body': json.dumps({
+                'error': str(e)
+            })
+        }
+
+
+def _extract_text_priority(payload: Dict[str, Any]) -> int:
+    """Queue priority of an extract_text job: the PDF size, so small PDFs run first"""
+    size = payload.get('sizeBytes')
+    if size is None and payload.get('s3Key'):
+        from src.services.s3_service import get_object_size
+        size = get_object_size(payload['s3Key'])
+    # Unknown sizes queue behind every known one
+    return int(size) if size is not None else 2 ** 62
+
+
+# Operations that can run as background jobs -> (handler, priority function)
+JOB_OPERATIONS = {
+    'extract_text': (handle_extract_text, _extract_text_priority),
+}
+
+_job_queue = None
+
+
+def get_job_queue():
+    """Return the background job queue, creating and starting it on first use"""
+    global _job_queue
+    if _job_queue is None:
+        from src.services.job_queue import JobQueue, build_job_store
+        handlers = {operation: handler for operation, (handler, _) in JOB_OPERATIONS.items()}
+        _job_queue = JobQueue(build_job_store(), handlers)
+        _job_queue.start()
+    return _job_queue
+
+
+def enqueue_job(operation: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Queue an operation to run in the background
+    
+    Args:
+        operation: One of JOB_OPERATIONS
+        payload: Operation payload, as for lambda_handler
+        
+    Returns:
+        Lambda-style response with the job id (202), or 400 for unknown operations
+    """
+    if operation not in JOB_OPERATIONS:
+        return {
+            'statusCode': 400,
+            'body': json.dumps({
+                'error': f'Unknown job operation: {operation}'
+            })
+        }
+    
+    priority = JOB_OPERATIONS[operation][1](payload)
+    job = get_job_queue().enqueue(operation, payload, priority)
+    print(f"Queued {operation} job {job['id']} (priority {priority})")
+    return {
+        'statusCode': 202,
+        'body': json.dumps({
+            'job_id': job['id'],
+            'status': job['status'],
+        })
+    }
+
+
+async def lambda_stream_handler(event: Dict[str, Any]) -> AsyncIterator[str]:
+    """
+    Streaming variant of lambda_handler
+    
+    Yields newline-delimited JSON records as work progresses instead of
+    building one response body. Supports the following operations:
+    - extract_text: Stream extracted PDF text page by page
+    - extract_facts_batch: Stream one result per PDF as each finishes
+    - process_case: Stream stage progress and one result per PDF
+    """
+    try:
+        print(f'[lambda_stream_handler] Received request - Operation: {event.get("operation")}')
+        
+        operation = event.get('operation')
+        payload = event.get('payload', {})
+        
+        if operation == 'extract_text':
+            async for line in _iterate_in_thread(handle_extract_text_stream(payload)):
+                yield line
+        elif operation == 'extract_facts_batch':
+            async for line in handle_extract_facts_batch_stream(payload):
+                yield line
+        elif operation == 'process_case':
+            async for line in handle_process_case_stream(payload):
+                yield line
+        else:
+            yield _ndjson({'event': 'error', 'error': f'Unknown streaming operation: {operation}'})
+    
+    except Exception as e:
+        print(f'Error in lambda_stream_handler: {str(e)}')
+        yield _ndjson({'event': 'error', 'error': str(e)})
+
+
+async def _iterate_in_thread(iterator: Iterator[str]) -> AsyncIterator[str]:
+    """Drive a blocking generator from a worker thread, one item at a time"""
+    sentinel = object()
+    while True:
+        item = await asyncio.to_thread(next, iterator, sentinel)
+        if item is sentinel:
+            return
+        yield item
+
+
+def _ndjson(record: Dict[str, Any]) -> str:
+    """Serialize one record as an NDJSON line"""
+    return json.dumps(record) + '\n'
+
+
+def handle_extract_text_stream(payload: Dict[str, Any]) -> Iterator[str]:
+    """
+    Extract text from PDF, streaming one NDJSON record per page
+    
+    Page text is forwarded as soon as it is extracted and appended to the
+    database in bounded batches, so no full copy of the document text is
+    ever assembled in memory.
+    """
+    from src.services.s3_service import download_from_s3_to_file
+    
+    pdf_id = payload.get('pdfId')
+    s3_key = payload.get('s3Key')
+    
+    if not pdf_id or not s3_key:
+        yield _ndjson({'event': 'error', 'error': 'Missing pdfId or s3Key'})
+        return
+    
+    # Download PDF from S3
+    print(f'Downloading PDF from S3: {s3_key}')
+    pdf_file = download_from_s3_to_file(s3_key)
+    
+    if pdf_file is None:
+        yield _ndjson({'event': 'error', 'error': 'Failed to download PDF from S3'})
+        return
+    
+    try:
+        yield from _stream_pdf_pages(pdf_id, pdf_file, payload.get('engine'))
+    finally:
+        pdf_file.close()
+
+
+def _stream_pdf_pages(pdf_id: str, pdf_file, engine: Optional[str] = None) -> Iterator[str]:
+    """Emit NDJSON page records for an open PDF file and store its text"""
+    from src.services.pdf_extractor import iter_pdf_pages, open_document
+    from src.services.database_service import append_pdf_extracted_text, clear_pdf_pages, store_pdf_page_rows
+    
+    try:
+        document = open_document(pdf_file, engine)
+        page_count = document.page_count
+    except Exception as e:
+        yield _ndjson({'event': 'error', 'error': str(e)})
+        return
+    
+    yield _ndjson({'event': 'start', 'pdfId': pdf_id, 'page_count': page_count})
+    
+    # Buffer page text and append it to the database in batches
+    buffer = []
+    page_rows = []
+    buffered_chars = 0
+    first_write = True
+    pages_with_text = 0
+    
+    def flush() -> bool:
+        nonlocal buffer, page_rows, buffered_chars, first_write
+        chunk = '\n\n'.join(buffer)
+        ok = True
+        if not first_write:
+            chunk = '\n\n' + chunk
+        else:
+            # Drop page records of a previous version of this PDF
+            ok = clear_pdf_pages(pdf_id)
+        ok = ok and append_pdf_extracted_text(pdf_id, chunk, reset=first_write, page_count=page_count)
+        # Page records keep streamed text searchable; without fingerprints they
+        # are re-extracted by the next incremental extraction
+        ok = ok and store_pdf_page_rows(pdf_id, page_rows)
+        buffer = []
+        page_rows = []
+        buffered_chars = 0
+        first_write = False
+        return ok
+    
+    try:
+        for record in iter_pdf_pages(document):
+            pages_with_text += 1
+            yield _ndjson({'event': 'page', **record})
+            
+            buffer.append(record['text'])
+            page_rows.append({'page_number': record['page'], 'fingerprint': '', 'text': record['text']})
+            buffered_chars += len(record['text'])
+            if buffered_chars >= EXTRACT_STREAM_FLUSH_CHARS and not flush():
+                raise RuntimeError('Failed to store extracted text in database')
+        
+        # Final write also covers PDFs with no extractable text
+        if (buffer or first_write) and not flush():
+            raise RuntimeError('Failed to store extracted text in database')
+    
+    except Exception as e:
+        print(f'Error streaming text: {str(e)}')
+        yield _ndjson({'event': 'error', 'error': str(e)})
+        return
+    finally:
+        document.close()
+    
+    yield _ndjson({
+        'event': 'done',
+        'success': True,
+        'page_count': page_count,
+        'pages_with_text': pages_with_text,
+    })
+
+
+async def handle_extract_facts(payload: Dict[str, Any]) -> Dict[str, Any]:
     """Extract structured facts from text using AI"""
     try:
-        from src.services.anthropic_service import extract_facts_from_text
+        from src.services.fact_chunking import extract_facts_chunked
         
         document_id = payload.get('documentId')
         pdf_text = payload.get('pdfText')
+        pdf_pages = payload.get('pages')
         pdf_filename = payload.get('pdfFilename', 'document.pdf')
         
-        if not pdf_text:
+        if not pdf_text and not pdf_pages:
             return {
                 'statusCode': 400,
                 'body': json.dumps({
@@ -145,14 +599,20 @@ def handle_extract_facts(payload: Dict[str, Any]) -> Dict[str, Any]:
                 })
             }
         
+        # Per-page input keeps real page numbers; plain text is chunked unpaged
+        if not pdf_pages:
+            pdf_pages = [{'page': None, 'text': pdf_text}]
+        
         # Extract facts using AI
         print(f'Extracting facts from {pdf_filename}')
-        facts = extract_facts_from_text(pdf_text, pdf_filename)
+        with stage('llm'):
+            facts = await extract_facts_chunked(pdf_pages, pdf_filename)
         
         return {
             'statusCode': 200,
             'body': json.dumps({
-                'facts': facts
+                'facts': facts,
+                'usage': invocation_usage(),
             })
         }
     
@@ -166,15 +626,403 @@ def handle_extract_facts(payload: Dict[str, Any]) -> Dict[str, Any]:
         }
 
 
-def handle_generate_draft(payload: Dict[str, Any]) -> Dict[str, Any]:
+async def _extract_facts_for_item(item: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Extract facts for one extract_facts_batch item
+    
+    The item supplies pdfText or per-page records (pages); otherwise the
+    pages stored by extract_text are read by pdfId, and a PDF with no stored
+    pages is downloaded from s3Key and extracted first.
+    """
+    from src.services.database_service import get_pdf_pages
+    from src.services.s3_service import download_from_s3_to_file
+    from src.services.extraction_cache import extract_text_cached
+    from src.services.fact_chunking import extract_facts_chunked
+    
+    pdf_id = item.get('pdfId')
+    pdf_filename = item.get('pdfFilename', 'document.pdf')
+    
+    try:
+        pdf_pages = item.get('pages')
+        if not pdf_pages and item.get('pdfText'):
+            pdf_pages = [{'page': None, 'text': item['pdfText']}]
+        
+        if not pdf_pages and pdf_id:
+            with stage('load_pages'):
+                try:
+                    rows = await asyncio.to_thread(get_pdf_pages, pdf_id)
+                except Exception as e:
+                    print(f'Page records unavailable for {pdf_filename}: {str(e)}')
+                    rows = []
+            pdf_pages = [{'page': row['page_number'], 'text': row['text']} for row in rows if row['text']]
+        
+        if not pdf_pages and item.get('s3Key'):
+            with stage('download'):
+                pdf_file = await asyncio.to_thread(download_from_s3_to_file, item['s3Key'])
+            if pdf_file is None:
+                return {'pdfId': pdf_id, 'success': False, 'error': 'Failed to download PDF from S3'}
+            try:
+                with stage('extract'):
+                    result = await asyncio.to_thread(extract_text_cached, pdf_file)
+            finally:
+                pdf_file.close()
+            if not result['success']:
+                return {'pdfId': pdf_id, 'success': False, 'error': result['error']}
+            pdf_pages = result['pages']
+        
+        if not pdf_pages:
+            return {'pdfId': pdf_id, 'success': False, 'error': 'No extracted pages, pdfText or s3Key'}
+        
+        with stage('llm'):
+            facts = await extract_facts_chunked(pdf_pages, pdf_filename)
+        return {'pdfId': pdf_id, 'success': True, 'facts': facts}
+    
+    except Exception as e:
+        print(f'Error extracting facts from {pdf_filename}: {str(e)}')
+        return {'pdfId': pdf_id, 'success': False, 'error': str(e)}
+
+
+def _batch_tasks(items: List[Dict[str, Any]]) -> List[asyncio.Task]:
+    """Start one task per batch item, bounded by FACT_BATCH_CONCURRENCY"""
+    semaphore = asyncio.Semaphore(FACT_BATCH_CONCURRENCY)
+    
+    async def run(item: Dict[str, Any]) -> Dict[str, Any]:
+        async with semaphore:
+            return await _extract_facts_for_item(item)
+    
+    return [asyncio.create_task(run(item)) for item in items]
+
+
+async def handle_extract_facts_batch(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Extract facts for many PDFs concurrently in one invocation"""
+    try:
+        items = payload.get('items')
+        
+        if not items:
+            return {
+                'statusCode': 400,
+                'body': json.dumps({
+                    'error': 'Missing items'
+                })
+            }
+        
+        print(f'Extracting facts for batch of {len(items)} PDFs')
+        results = await asyncio.gather(*_batch_tasks(items))
+        
+        collapsed = 0
+        if FACT_BATCH_DEDUPE:
+            from src.services.fact_selection import collapse_batch_facts
+            with stage('dedupe'):
+                collapsed = collapse_batch_facts(results)
+            if collapsed:
+                print(f'Collapsed {collapsed} facts repeated across PDFs')
+        
+        return {
+            'statusCode': 200,
+            'body': json.dumps({
+                'results': results,
+                'succeeded': sum(1 for result in results if result['success']),
+                'failed': sum(1 for result in results if not result['success']),
+                'collapsed': collapsed,
+                'usage': invocation_usage(),
+            })
+        }
+    
+    except Exception as e:
+        print(f'Error extracting facts batch: {str(e)}')
+        return {
+            'statusCode': 500,
+            'body': json.dumps({
+                'error': str(e)
+            })
+        }
+
+
+async def handle_extract_facts_batch_stream(payload: Dict[str, Any]) -> AsyncIterator[str]:
+    """Extract facts for many PDFs, streaming each item's result as it finishes"""
+    items = payload.get('items')
+    
+    if not items:
+        yield _ndjson({'event': 'error', 'error': 'Missing items'})
+        return
+    
+    print(f'Streaming facts for batch of {len(items)} PDFs')
+    yield _ndjson({'event': 'start', 'total': len(items)})
+    
+    succeeded = 0
+    for next_result in asyncio.as_completed(_batch_tasks(items)):
+        result = await next_result
+        succeeded += 1 if result['success'] else 0
+        yield _ndjson({'event': 'item', **result})
+    
+    yield _ndjson({
+        'event': 'done',
+        'succeeded': succeeded,
+        'failed': len(items) - succeeded,
+    })
+
+
+def _case_items(payload: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """PDFs of a process_case payload: pdfs records plus bare s3Keys"""
+    items = [dict(item) for item in payload.get('pdfs') or []]
+    items.extend({'s3Key': s3_key} for s3_key in payload.get('s3Keys') or [])
+    return items
+
+
+def _case_limits() -> Dict[str, asyncio.Semaphore]:
+    """Per-stage concurrency limits for one process_case run"""
+    return {
+        'in_flight': asyncio.Semaphore(CASE_MAX_IN_FLIGHT),
+        'download': asyncio.Semaphore(CASE_DOWNLOAD_CONCURRENCY),
+        'extract': asyncio.Semaphore(CASE_EXTRACT_CONCURRENCY),
+        'facts': asyncio.Semaphore(FACT_BATCH_CONCURRENCY),
+    }
+
+
+async def _process_case_pdf(
+    item: Dict[str, Any],
+    limits: Dict[str, asyncio.Semaphore],
+    events: asyncio.Queue,
+) -> Dict[str, Any]:
+    """
+    Run one PDF of a case through download, extraction and fact extraction
+    
+    Each stage waits for its own limit, so one PDF's facts are extracted
+    while later PDFs are still downloading. PDFs with stored page records
+    skip download and extraction. Page text is handed from stage to stage
+    in memory and never included in events.
+    
+    Args:
+        item: {pdfId, s3Key, pdfFilename}; pdfId is optional and enables
+            reusing and storing page records, reextract forces extraction
+        limits: Semaphores from _case_limits
+        events: Queue receiving a stage event as each stage finishes
+        
+    Returns:
+        {pdfId, s3Key, success, facts | stage, error}
+    """
+    from src.services.database_service import get_pdf_pages
+    from src.services.extraction_cache import extract_text_cached
+    from src.services.fact_chunking import extract_facts_chunked
+    from src.services.s3_service import download_from_s3_to_file
+    
+    pdf_id = item.get('pdfId')
+    s3_key = item.get('s3Key')
+    pdf_filename = item.get('pdfFilename') or (os.path.basename(s3_key) if s3_key else 'document.pdf')
+    current = 'load_pages'
+    
+    def finished(name: str, started: float, **fields: Any) -> None:
+        events.put_nowait({
+            'event': 'stage',
+            'pdfId': pdf_id,
+            's3Key': s3_key,
+            'stage': name,
+            'ms': round((time.perf_counter() - started) * 1000, 1),
+            **fields,
+        })
+    
+    def failed(error: str) -> Dict[str, Any]:
+        return {'pdfId': pdf_id, 's3Key': s3_key, 'success': False, 'stage': current, 'error': error}
+    
+    try:
+        pdf_pages = None
+        if pdf_id and not item.get('reextract'):
+            started = time.perf_counter()
+            with stage('load_pages'):
+                try:
+                    rows = await asyncio.to_thread(get_pdf_pages, pdf_id)
+                except Exception as e:
+                    print(f'Page records unavailable for {pdf_filename}: {str(e)}')
+                    rows = []
+            if rows:
+                pdf_pages = [{'page': row['page_number'], 'text': row['text']} for row in rows if row['text']]
+                finished(current, started, page_count=len(rows), pages_with_text=len(pdf_pages))
+        
+        if pdf_pages is None:
+            if not s3_key:
+                current = 'download'
+                return failed('No stored pages or s3Key')
+            
+            # Downloaded files count against CASE_MAX_IN_FLIGHT until extracted
+            async with limits['in_flight']:
+                current = 'download'
+                async with limits['download']:
+                    started = time.perf_counter()
+                    with stage('download'):
+                        pdf_file = await asyncio.to_thread(download_from_s3_to_file, s3_key)
+                if pdf_file is None:
+                    return failed('Failed to download PDF from S3')
+                
+                try:
+                    finished(current, started, bytes=_file_size(pdf_file))
+                    current = 'extract'
+                    async with limits['extract']:
+                        started = time.perf_counter()
+                        if pdf_id:
+                            result = await asyncio.to_thread(
+                                _extract_and_store, pdf_id, pdf_file, item.get('parallel'), item.get('engine')
+                            )
+                        else:
+                            # Without a PDF record there is nowhere to store pages
+                            with stage('extract'):
+                                result = await asyncio.to_thread(
+                                    extract_text_cached, pdf_file, item.get('parallel'), item.get('engine')
+                                )
+                finally:
+                    pdf_file.close()
+            
+            if not result['success']:
+                return failed(result['error'])
+            pdf_pages = result['pages']
+            finished(
+                current,
+                started,
+                page_count=result['page_count'],
+                pages_with_text=len(pdf_pages),
+                cached=result['cached'],
+            )
+        
+        current = 'facts'
+        if not pdf_pages:
+            return failed('No extractable text')
+        async with limits['facts']:
+            started = time.perf_counter()
+            with stage('llm'):
+                facts = await extract_facts_chunked(pdf_pages, pdf_filename)
+        finished(current, started, facts=len(facts))
+        return {'pdfId': pdf_id, 's3Key': s3_key, 'success': True, 'facts': facts}
+    
+    except Exception as e:
+        print(f'Error processing {pdf_filename} at {current}: {str(e)}')
+        return failed(str(e))
+
+
+async def _process_case_events(items: List[Dict[str, Any]]) -> AsyncIterator[Dict[str, Any]]:
+    """Run every PDF of a case through the pipeline, yielding stage and item events as they happen"""
+    limits = _case_limits()
+    events: asyncio.Queue = asyncio.Queue()
+    
+    async def run(item: Dict[str, Any]) -> None:
+        result = await _process_case_pdf(item, limits, events)
+        events.put_nowait({'event': 'item', **result})
+    
+    tasks = [asyncio.create_task(run(item)) for item in items]
+    remaining = len(tasks)
+    try:
+        while remaining:
+            event = await events.get()
+            if event['event'] == 'item':
+                remaining -= 1
+            yield event
+    finally:
+        # Stop outstanding work when the consumer goes away
+        for task in tasks:
+            task.cancel()
+
+
+async def handle_process_case(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Extract facts for every PDF of a case in one pipelined invocation
+    
+    Takes the case's PDFs as pdfs ({pdfId, s3Key, pdfFilename}) and/or bare
+    s3Keys; responds like extract_facts_batch, with per-stage timings.
+    """
+    try:
+        items = _case_items(payload)
+        
+        if not items:
+            return {
+                'statusCode': 400,
+                'body': json.dumps({
+                    'error': 'Missing pdfs or s3Keys'
+                })
+            }
+        
+        print(f'Processing case {payload.get("documentId")} with {len(items)} PDFs')
+        results = []
+        stages: Dict[str, List[Dict[str, Any]]] = {}
+        async for event in _process_case_events(items):
+            if event['event'] == 'item':
+                results.append({key: value for key, value in event.items() if key != 'event'})
+            else:
+                stages.setdefault(event['stage'], []).append(event)
+        
+        collapsed = 0
+        if FACT_BATCH_DEDUPE:
+            from src.services.fact_selection import collapse_batch_facts
+            with stage('dedupe'):
+                collapsed = collapse_batch_facts(results)
+            if collapsed:
+                print(f'Collapsed {collapsed} facts repeated across PDFs')
+        
+        return {
+            'statusCode': 200,
+            'body': json.dumps({
+                'results': results,
+                'succeeded': sum(1 for result in results if result['success']),
+                'failed': sum(1 for result in results if not result['success']),
+                'collapsed': collapsed,
+                'stages': {
+                    name: {'count': len(done), 'ms': round(sum(event['ms'] for event in done), 1)}
+                    for name, done in stages.items()
+                },
+                'usage': invocation_usage(),
+            })
+        }
+    
+    except Exception as e:
+        print(f'Error processing case: {str(e)}')
+        return {
+            'statusCode': 500,
+            'body': json.dumps({
+                'error': str(e)
+            })
+        }
+
+
+async def handle_process_case_stream(payload: Dict[str, Any]) -> AsyncIterator[str]:
+    """Process a case's PDFs, streaming stage progress and each PDF's result as it finishes"""
+    items = _case_items(payload)
+    
+    if not items:
+        yield _ndjson({'event': 'error', 'error': 'Missing pdfs or s3Keys'})
+        return
+    
+    print(f'Streaming case {payload.get("documentId")} with {len(items)} PDFs')
+    yield _ndjson({'event': 'start', 'documentId': payload.get('documentId'), 'total': len(items)})
+    
+    start = time.perf_counter()
+    succeeded = 0
+    async for event in _process_case_events(items):
+        if event['event'] == 'item' and event['success']:
+            succeeded += 1
+        yield _ndjson(event)
+    
+    # Facts repeated across PDFs are not collapsed here, since each PDF's
+    # facts were already sent; the non-streaming operation collapses them
+    yield _ndjson({
+        'event': 'done',
+        'succeeded': succeeded,
+        'failed': len(items) - succeeded,
+        'seconds': round(time.perf_counter() - start, 3),
+    })
+
+
+async def handle_generate_draft(payload: Dict[str, Any]) -> Dict[str, Any]:
     """Generate demand letter draft using AI"""
     try:
-        from src.services.anthropic_service import generate_demand_letter
+        from src.services.anthropic_service import (
+            DRAFT_MODE,
+            generate_demand_letter_async,
+            generate_demand_letter_sections,
+        )
         
         facts = payload.get('facts', [])
         template_structure = payload.get('templateStructure', {})
         template_content = payload.get('templateContent', '')
         firm_info = payload.get('firmInfo')
+        # 'single' or 'sections' (write template sections concurrently)
+        mode = str(payload.get('draftMode') or DRAFT_MODE).lower()
         
         if not facts:
             return {
@@ -185,15 +1033,18 @@ def handle_generate_draft(payload: Dict[str, Any]) -> Dict[str, Any]:
             }
         
         # Generate draft using AI
-        print(f'Generating draft with {len(facts)} facts')
+        print(f'Generating draft with {len(facts)} facts ({mode} mode)')
         if firm_info:
             print(f'Using firm info: {firm_info.get("firmName", "N/A")}')
-        draft = generate_demand_letter(facts, template_structure, template_content, firm_info)
+        generate = generate_demand_letter_sections if mode == 'sections' else generate_demand_letter_async
+        with stage('llm'):
+            draft = await generate(facts, template_structure, template_content, firm_info)
         
         return {
             'statusCode': 200,
             'body': json.dumps({
-                'draft': draft
+                'draft': draft,
+                'usage': invocation_usage(),
             })
         }
     
@@ -207,26 +1058,214 @@ def handle_generate_draft(payload: Dict[str, Any]) -> Dict[str, Any]:
         }
 
 
-# FastAPI app for local development
-from fastapi import FastAPI, Body
+def handle_search(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Search extracted PDF pages and facts"""
+    try:
+        from src.services.search_service import SCOPES, search
+        
+        query = str(payload.get('query') or '').strip()
+        scope = str(payload.get('scope') or 'all').lower()
+        document_ids = payload.get('documentIds') or ([payload['documentId']] if payload.get('documentId') else None)
+        
+        if not query:
+            return {
+                'statusCode': 400,
+                'body': json.dumps({
+                    'error': 'Missing query'
+                })
+            }
+        if scope not in SCOPES:
+            return {
+                'statusCode': 400,
+                'body': json.dumps({
+                    'error': f'Unknown scope: {scope}'
+                })
+            }
+        
+        result = search(
+            query,
+            scope,
+            document_ids=document_ids,
+            limit=int(payload.get('limit') or 0),
+            offset=int(payload.get('offset') or 0),
+        )
+        
+        return {
+            'statusCode': 200,
+            'body': json.dumps(result)
+        }
+    
+    except Exception as e:
+        print(f'Error searching: {str(e)}')
+        return {
+            'statusCode': 500,
+            'body': json.dumps({
+                'error': str(e)
+            })
+        }
 
-app = FastAPI(title='Demand Letter AI Service')
 
-@app.get('/health')
-def health_check():
-    return {
-        'status': 'ok',
-        'service': 'ai-service',
-    }
+def handle_reindex_search(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Set missing search vectors on stored pages and facts"""
+    try:
+        from src.services.search_service import reindex
+        
+        updated = reindex(int(payload.get('batchSize') or 1000))
+        print(f'Indexed {updated} rows for search')
+        
+        return {
+            'statusCode': 200,
+            'body': json.dumps({
+                'success': True,
+                'updated': updated,
+            })
+        }
+    
+    except Exception as e:
+        print(f'Error reindexing search: {str(e)}')
+        return {
+            'statusCode': 500,
+            'body': json.dumps({
+                'error': str(e)
+            })
+        }
+
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    """Serialize one server-sent event"""
+    return f'event: {event}\ndata: {json.dumps(data)}\n\n'
+
+
+async def handle_generate_draft_stream(payload: Dict[str, Any]) -> AsyncIterator[str]:
+    """
+    Generate demand letter draft, streaming HTML deltas as server-sent events
+    
+    Emits 'delta' events as the model writes, then a 'done' event with the
+    assembled draft and token usage (or an 'error' event).
+    """
+    from src.services.anthropic_service import stream_demand_letter
+    
+    facts = payload.get('facts', [])
+    template_structure = payload.get('templateStructure', {})
+    template_content = payload.get('templateContent', '')
+    firm_info = payload.get('firmInfo')
+    
+    if not facts:
+        yield _sse('error', {'error': 'Missing facts'})
+        return
+    
+    print(f'Streaming draft with {len(facts)} facts')
+    async for chunk in stream_demand_letter(facts, template_structure, template_content, firm_info):
+        event = chunk.pop('type')
+        yield _sse(event, chunk)
+
+
+# FastAPI app for local development and the Heroku web process.
+# Built on first access to `app` so Lambda invocations never import FastAPI.
+_app = None
+
+
+def create_app():
+    """Create the FastAPI app exposing the handlers over HTTP"""
+    from contextlib import asynccontextmanager
+    from fastapi import FastAPI, Body, HTTPException
+    from fastapi.responses import StreamingResponse
+
+    @asynccontextmanager
+    async def lifespan(app):
+        # Jobs queued before a restart run without waiting for a new enqueue
+        await asyncio.to_thread(get_job_queue)
+        yield
+    
+    app = FastAPI(title='Demand Letter AI Service', lifespan=lifespan)
+
+    @app.get('/health')
+    def health_check():
+        return {
+            'status': 'ok',
+            'service': 'ai-service',
+        }
+
+    @app.get('/cache/stats')
+    def cache_stats():
+        from src.services.extraction_cache import get_extraction_cache_stats
+        from src.services.fact_cache import get_fact_cache_stats
+        from src.services.ocr import get_ocr_cache_stats
+        return {
+            'extraction': get_extraction_cache_stats(),
+            'ocr': get_ocr_cache_stats(),
+            'facts': get_fact_cache_stats(),
+        }
+
+    @app.get('/llm/stats')
+    def llm_stats():
+        from src.services.llm_scheduler import get_llm_scheduler
+        return get_llm_scheduler().get_stats()
+    
+    @app.get('/metrics')
+    def metrics():
+        from fastapi import Response
+        from src.services.metrics import render_prometheus
+        rendered = render_prometheus()
+        if rendered is None:
+            return Response('prometheus_client is not installed\n', status_code=503, media_type='text/plain')
+        body, content_type = rendered
+        return Response(body, media_type=content_type)
+    
+    @app.post('/invoke')
+    async def invoke(event: Dict[str, Any] = Body(...)):
+        return await lambda_handler_async(event)
+    
+    @app.post('/jobs', status_code=202)
+    def create_job(event: Dict[str, Any] = Body(...)):
+        # The priority lookup may HEAD the S3 object, so this runs in the threadpool
+        response = enqueue_job(str(event.get('operation')), event.get('payload', {}))
+        if response['statusCode'] != 202:
+            raise HTTPException(status_code=response['statusCode'], detail=json.loads(response['body'])['error'])
+        return json.loads(response['body'])
+    
+    @app.get('/jobs/{job_id}')
+    def job_status(job_id: str):
+        job = get_job_queue().get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail='Job not found')
+        return job
+    
+    @app.get('/pdfs/{pdf_id}/pages')
+    def pdf_pages(pdf_id: str, start: int = 1, end: Optional[int] = None):
+        response = handle_get_pages({'pdfId': pdf_id, 'startPage': start, 'endPage': end})
+        if response['statusCode'] != 200:
+            raise HTTPException(status_code=response['statusCode'], detail=json.loads(response['body'])['error'])
+        return json.loads(response['body'])
+    
+    @app.post('/invoke/stream')
+    async def invoke_stream(event: Dict[str, Any] = Body(...)):
+        return StreamingResponse(lambda_stream_handler(event), media_type='application/x-ndjson')
+    
+    @app.post('/draft/stream')
+    async def draft_stream(payload: Dict[str, Any] = Body(...)):
+        return StreamingResponse(
+            handle_generate_draft_stream(payload),
+            media_type='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+        )
+    
+    return app
+
 
-@app.post('/invoke')
-def invoke(event: Dict[str, Any] = Body(...)):
-    return lambda_handler(event)
+def __getattr__(name: str):
+    # Lazily build `app` for `uvicorn lambda_handler:app`
+    global _app
+    if name == 'app':
+        if _app is None:
+            _app = create_app()
+        return _app
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
 
 # Local development server
 if __name__ == '__main__':
     import uvicorn
     port = int(os.getenv('PORT', 8000))
     print(f'🤖 AI Service running on http://localhost:{port}')
-    uvicorn.run(app, host='0.0.0.0', port=port)
+    uvicorn.run(create_app(), host='0.0.0.0', port=port)
 
@@ -2,27 +2,37 @@
 Anthropic AI Service
 """
 
+import asyncio
+import json
 import os
-from anthropic import Anthropic
-from typing import List, Dict, Any
+import re
+import weakref
+from anthropic import Anthropic, AsyncAnthropic
+from typing import List, Dict, Any, AsyncIterator, Optional, Tuple
 
-client = Anthropic(api_key=os.getenv('ANTHROPIC_API_KEY', ''))
+from src.services.fact_cache import fact_cache_key, get_cached_facts, store_cached_facts
+from src.services.fact_selection import select_draft_facts
+from src.services.llm_scheduler import LLM_SCHEDULER, LLMThrottledError, get_llm_scheduler
+from src.services.metrics import record_tokens, usage_dict
+from src.services.tokens import estimate_tokens
 
+# Created on first use so importing this module stays cheap on cold starts
+_client: Optional[Anthropic] = None
 
-def extract_facts_from_text(text: str, document_filename: str) -> List[Dict[str, Any]]:
-    """
-    Extract structured facts from PDF text using Claude
-    
-    Args:
-        text: Extracted text from PDF
-        document_filename: Name of the source document
-        
-    Returns:
-        List of extracted facts with citations
-    """
-    prompt = f"""You are a legal assistant helping extract key facts from case documents for a demand letter.
+# Async clients hold connections bound to one event loop, so one is kept
+# per loop (the sync Lambda shim runs each invocation in a fresh loop)
+_async_clients: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncAnthropic]' = weakref.WeakKeyDictionary()
+
+FACT_EXTRACTION_MAX_TOKENS = 2000
+DRAFT_MAX_TOKENS = 4000
+
+# Static instructions sent as the system prompt. They are shorter than any
+# model's minimum cacheable prefix, so they are sent without a cache
+# breakpoint. Together with FACT_EXTRACTION_PROMPT this is part of the fact
+# cache key, so any edit here invalidates previously cached facts
+FACT_EXTRACTION_SYSTEM_PROMPT = """You are a legal assistant helping extract key facts from case documents for a demand letter.
 
-Extract the following types of facts from this document:
+Extract the following types of facts from the document you are given:
 - Parties involved (plaintiff, defendant, witnesses)
 - Dates and times of incidents
 - Locations
@@ -36,128 +46,753 @@ For each fact:
 1. State it clearly and concisely
 2. Note which page/section it came from if possible
 
-Document: {document_filename}
-
-Text:
-{text}
-
 Return ONLY a JSON array of facts in this format:
 [
-  {{
+  {
     "fact_text": "Clear statement of the fact",
     "category": "incident|injury|treatment|financial|liability|other",
     "page_reference": "approximate page or section"
-  }}
+  }
 ]
 
 Extract 10-20 key facts. Be specific and accurate."""
 
+# Per-document part of the fact extraction request
+FACT_EXTRACTION_PROMPT = """Document: {document_filename}
+
+Text:
+{text}"""
+
+DRAFT_SYSTEM_PROMPT = """You are a legal assistant drafting a professional demand letter.
+
+INSTRUCTIONS:
+1. Start with a proper letterhead using the law firm information provided (if any)
+2. Use a professional, firm but respectful tone
+3. Clearly establish liability
+4. Detail all injuries and damages
+5. Demand fair compensation
+6. Include a reasonable deadline for response (typically 30 days)
+7. Use proper legal letter format
+
+IMPORTANT - FORMATTING REQUIREMENTS:
+- Output the letter in HTML format
+- Use <h1>, <h2>, <h3> tags for headings (e.g., "III. DAMAGES", "Medical Expenses")
+- Use <p> tags for paragraphs
+- Use <strong> tags for bold text (NOT markdown ** syntax)
+- Use <ul> and <li> for bullet lists
+- Use <br> for line breaks within sections
+- Use <div> tags with class attributes for semantic sections (e.g., class="letterhead", class="section")
+- Do NOT use markdown formatting like ** for bold or # for headings
+- Do NOT include <style> tags or any CSS styling
+- Do NOT include max-width, margin, or any layout styles
+- Do NOT wrap the content in <html>, <head>, or <body> tags
+- Output ONLY the semantic HTML content
+
+Write a complete demand letter with the firm's actual information (not placeholders). Make it persuasive and professional."""
+
+# Instructions for one section of a letter drafted in sections mode
+DRAFT_SECTION_SYSTEM_PROMPT = """You are a legal assistant drafting one section of a professional demand letter. The letterhead, opening, closing and every other section are written separately and assembled afterwards.
+
+INSTRUCTIONS:
+1. Write only the section you are asked for, in a professional, firm but respectful tone
+2. Rely only on the facts provided; do not invent names, dates or amounts
+3. Do not write a letterhead, date, salutation, introduction, closing or signature
+4. Leave material that belongs to the other sections in the outline to those sections
+
+IMPORTANT - FORMATTING REQUIREMENTS:
+- Output ONLY one <div class="section"> starting with the exact <h2> heading you are given
+- Use <p>, <h3>, <ul>/<li> and <strong> tags inside it as needed
+- Do NOT use markdown formatting, <style> tags, CSS, or <html>, <head>, <body> tags"""
+
+# Instructions for the letterhead, opening and closing written around the
+# sections in sections mode
+DRAFT_FRAME_SYSTEM_PROMPT = """You are a legal assistant writing the frame of a professional demand letter: the parts that come before and after its body. The body sections are written separately and inserted where you place the marker line.
+
+INSTRUCTIONS:
+1. Write a proper letterhead using the law firm information provided (if any), not placeholders
+2. Use a professional, firm but respectful tone
+3. Keep the introduction and closing short; liability, injuries, damages and the demand belong to the body sections
+4. Include a reasonable deadline for response (typically 30 days) in the closing
+5. Do not write any of the body sections yourself
+
+IMPORTANT - FORMATTING REQUIREMENTS:
+- Output the frame in HTML format
+- Use <div class="letterhead"> for the letterhead, <p> for paragraphs, <strong> for bold text and <br> for line breaks
+- Do NOT use markdown formatting, <style> tags, CSS, or <html>, <head>, <body> tags"""
+
+# Marks where the sections go inside the opening/closing written in sections mode
+DRAFT_SECTIONS_MARKER = '<!-- SECTIONS -->'
+
+DRAFT_FRAME_PROMPT = """This letter is assembled from separately written sections: {outline}. Write ONLY the parts around them.{letterhead_hint}
+
+Output, in HTML:
+1. The letterhead, date, recipient block, RE line, salutation and a short introductory paragraph
+2. A line containing exactly {marker}
+3. A short closing paragraph with the response deadline, then the closing and signature block
+
+FACTS:
+{facts_text}"""
+
+DRAFT_SECTION_PROMPT = """Letter outline: {outline}
+
+Write the section headed <h2>{heading}</h2>.
+
+{facts_label}:
+{facts_text}"""
+
+DRAFT_CONSISTENCY_PROMPT = """The demand letter below was assembled from parts written independently; each part starts with a line "{part_prefix}<part name>". Check it for inconsistencies between parts: conflicting names, dates, amounts or descriptions of the parties, and paragraphs repeated in more than one part.
+
+Return ONLY a JSON array of corrections in this format, or [] if the letter is consistent:
+[
+  {{"part": "name of the part to correct", "find": "exact text from that part, long enough to occur only once in it", "replace": "corrected text"}}
+]
+
+LETTER:
+{draft}"""
+
+# single: one completion writes the whole letter; sections: each template
+# section is written concurrently, then assembled and checked for consistency
+DRAFT_MODE = os.getenv('DRAFT_MODE', 'single').lower()
+DRAFT_SECTION_MAX_TOKENS = int(os.getenv('DRAFT_SECTION_MAX_TOKENS', 1500))
+DRAFT_SECTION_CONCURRENCY = int(os.getenv('DRAFT_SECTION_CONCURRENCY', 8))
+DRAFT_CONSISTENCY_PASS = os.getenv('DRAFT_CONSISTENCY_PASS', 'true').lower() == 'true'
+DRAFT_CONSISTENCY_MAX_TOKENS = 1000
+DRAFT_PART_PREFIX = '=== PART: '
+
+# Set PROMPT_CACHING=false to send the same prompts without cache breakpoints
+PROMPT_CACHING = os.getenv('PROMPT_CACHING', 'true').lower() == 'true'
+
+# Shortest prompt prefix Anthropic caches; 0 uses the per-model minimum
+PROMPT_CACHE_MIN_TOKENS = int(os.getenv('PROMPT_CACHE_MIN_TOKENS', 0))
+
+# Minimum cacheable prefix by model name fragment, first match wins
+# (1024 tokens for models not listed)
+PROMPT_CACHE_MODEL_MIN_TOKENS = (
+    ('haiku-4-5', 4096),
+    ('opus-4-5', 4096),
+    ('haiku', 2048),
+)
+
+
+def _client_options() -> Dict[str, Any]:
+    """Client options; the LLM scheduler does the retrying when it is enabled"""
+    return {'max_retries': 0} if LLM_SCHEDULER else {}
+
+
+def get_client() -> Anthropic:
+    """Return the sync Anthropic client, creating it on first use"""
+    global _client
+    if _client is None:
+        _client = Anthropic(api_key=os.getenv('ANTHROPIC_API_KEY', ''), **_client_options())
+    return _client
+
+
+def get_async_client() -> AsyncAnthropic:
+    """Return the AsyncAnthropic client for the running event loop"""
+    loop = asyncio.get_running_loop()
+    async_client = _async_clients.get(loop)
+    if async_client is None:
+        async_client = AsyncAnthropic(api_key=os.getenv('ANTHROPIC_API_KEY', ''), **_client_options())
+        _async_clients[loop] = async_client
+    return async_client
+
+
+def get_model() -> str:
+    """Return the configured Anthropic model name"""
+    return os.getenv('ANTHROPIC_MODEL', 'claude-haiku-4-5-20251001')
+
+
+def _request_tokens(request: Dict[str, Any]) -> int:
+    """Estimated input tokens of a messages request"""
+    system = request.get('system') or []
+    text = system if isinstance(system, str) else ''.join(block['text'] for block in system)
+    return estimate_tokens(text + ''.join(message['content'] for message in request['messages']))
+
+
+def create_message(**request) -> Any:
+    """
+    messages.create through the shared LLM scheduler
+    
+    Rate limiting, overload and connection errors are retried; throttling
+    that outlasts the retries raises LLMThrottledError.
+    """
+    if not LLM_SCHEDULER:
+        return get_client().messages.create(**request)
+    return get_llm_scheduler().call(
+        lambda: get_client().messages.with_raw_response.create(**request),
+        _request_tokens(request),
+    )
+
+
+async def create_message_async(**request) -> Any:
+    """Async version of create_message"""
+    if not LLM_SCHEDULER:
+        return await get_async_client().messages.create(**request)
+    return await get_llm_scheduler().call_async(
+        lambda: get_async_client().messages.with_raw_response.create(**request),
+        _request_tokens(request),
+    )
+
+
+def prompt_cache_min_tokens(model: str) -> int:
+    """Minimum cacheable prompt prefix for a model (see PROMPT_CACHE_MODEL_MIN_TOKENS)"""
+    if PROMPT_CACHE_MIN_TOKENS:
+        return PROMPT_CACHE_MIN_TOKENS
+    for fragment, min_tokens in PROMPT_CACHE_MODEL_MIN_TOKENS:
+        if fragment in model:
+            return min_tokens
+    return 1024
+
+
+def _system_blocks(texts: List[str], model: str) -> List[Dict[str, Any]]:
+    """
+    System prompt blocks with prompt-cache breakpoints
+    
+    Anthropic caches the prompt prefix up to each breakpoint for a few
+    minutes, so repeat calls with the same static blocks are billed at the
+    cache-read rate. Prefixes shorter than the model's minimum are not
+    cached at all, so a block is only marked once the estimated prefix
+    ending with it reaches that minimum.
+    
+    Args:
+        texts: Static system prompt parts, most widely shared first
+        model: Model the request is sent to
+        
+    Returns:
+        System prompt blocks
+    """
+    min_tokens = prompt_cache_min_tokens(model)
+    blocks = []
+    prefix_tokens = 0
+    for text in texts:
+        block = {'type': 'text', 'text': text}
+        prefix_tokens += estimate_tokens(text)
+        if PROMPT_CACHING and prefix_tokens >= min_tokens:
+            block['cache_control'] = {'type': 'ephemeral'}
+        blocks.append(block)
+    return blocks
+
+
+def _prepare_fact_extraction(text: str, document_filename: str) -> Tuple[List[Dict[str, Any]], str, str, str]:
+    """Build the system blocks, prompt, model name and cache key for a fact extraction call"""
+    model = get_model()
+    system = _system_blocks([FACT_EXTRACTION_SYSTEM_PROMPT], model)
+    prompt = FACT_EXTRACTION_PROMPT.format(document_filename=document_filename, text=text)
+    cache_key = fact_cache_key(
+        text, FACT_EXTRACTION_SYSTEM_PROMPT + FACT_EXTRACTION_PROMPT, model, FACT_EXTRACTION_MAX_TOKENS
+    )
+    return system, prompt, model, cache_key
+
+
+def _parse_facts(response_text: str) -> Optional[List[Dict[str, Any]]]:
+    """
+    Parse the JSON fact array from a model response
+    
+    Args:
+        response_text: Raw model output
+        
+    Returns:
+        Parsed facts, or None if no JSON could be found
+    """
+    # Find JSON array in response
+    json_match = re.search(r'\[\s*\{.*\}\s*\]', response_text, re.DOTALL)
+    if json_match:
+        return json.loads(json_match.group())
+    
+    # Fallback: try to parse entire response as JSON
     try:
-        message = client.messages.create(
-            model=os.getenv('ANTHROPIC_MODEL', 'claude-haiku-4-5-20251001'),
-            max_tokens=2000,
+        return json.loads(response_text)
+    except:
+        print(f"Could not parse JSON from response: {response_text[:200]}")
+        return None
+
+
+def extract_facts_from_text(text: str, document_filename: str) -> List[Dict[str, Any]]:
+    """
+    Extract structured facts from PDF text using Claude
+    
+    Args:
+        text: Extracted text from PDF
+        document_filename: Name of the source document
+        
+    Returns:
+        List of extracted facts with citations
+    """
+    system, prompt, model, cache_key = _prepare_fact_extraction(text, document_filename)
+    cached_facts = get_cached_facts(cache_key)
+    if cached_facts is not None:
+        print(f"Fact cache hit for {document_filename}")
+        return cached_facts
+    
+    try:
+        message = create_message(
+            model=model,
+            max_tokens=FACT_EXTRACTION_MAX_TOKENS,
+            system=system,
             messages=[
                 {"role": "user", "content": prompt}
             ]
         )
         
-        # Parse response
-        response_text = message.content[0].text
+        record_tokens(message.usage)
+        facts = _parse_facts(message.content[0].text)
+        if facts is None:
+            return []
+        store_cached_facts(cache_key, facts)
+        return facts
+    
+    except LLMThrottledError:
+        raise
+    except Exception as e:
+        print(f"Error extracting facts: {str(e)}")
+        return []
+
+
+async def extract_facts_from_text_async(text: str, document_filename: str) -> List[Dict[str, Any]]:
+    """
+    Async version of extract_facts_from_text using AsyncAnthropic
+    
+    Args:
+        text: Extracted text from PDF
+        document_filename: Name of the source document
         
-        # Try to extract JSON from response
-        import json
-        import re
+    Returns:
+        List of extracted facts with citations
+    """
+    system, prompt, model, cache_key = _prepare_fact_extraction(text, document_filename)
+    cached_facts = get_cached_facts(cache_key)
+    if cached_facts is not None:
+        print(f"Fact cache hit for {document_filename}")
+        return cached_facts
+    
+    try:
+        message = await create_message_async(
+            model=model,
+            max_tokens=FACT_EXTRACTION_MAX_TOKENS,
+            system=system,
+            messages=[
+                {"role": "user", "content": prompt}
+            ]
+        )
         
-        # Find JSON array in response
-        json_match = re.search(r'\[\s*\{.*\}\s*\]', response_text, re.DOTALL)
-        if json_match:
-            facts = json.loads(json_match.group())
-            return facts
-        else:
-            # Fallback: try to parse entire response as JSON
-            try:
-                facts = json.loads(response_text)
-                return facts
-            except:
-                print(f"Could not parse JSON from response: {response_text[:200]}")
-                return []
+        record_tokens(message.usage)
+        facts = _parse_facts(message.content[0].text)
+        if facts is None:
+            return []
+        store_cached_facts(cache_key, facts)
+        return facts
     
+    except LLMThrottledError:
+        raise
     except Exception as e:
         print(f"Error extracting facts: {str(e)}")
         return []
 
 
-def generate_demand_letter(facts: List[Dict], template_structure: Dict, template_content: str, firm_info: Dict = None) -> str:
+def build_firm_letterhead(firm_info: Dict = None) -> Optional[str]:
     """
-    Generate demand letter draft using Claude
+    Build the firm letterhead block, identical for every letter a firm generates
     
     Args:
-        facts: List of approved facts
-        template_structure: Template structure with placeholders
-        template_content: Template paragraph content
         firm_info: Law firm contact information (optional)
         
     Returns:
-        Generated demand letter text
+        Letterhead text, or None without firm info
     """
-    facts_text = "\n".join([f"- {fact['factText']}" for fact in facts])
-    
-    # Build firm info section
-    firm_section = ""
-    if firm_info:
-        firm_section = f"""
-
-LAW FIRM INFORMATION (use this in the letterhead):
+    if not firm_info:
+        return None
+    return f"""LAW FIRM INFORMATION (use this in the letterhead):
 Firm Name: {firm_info.get('firmName', 'Your Law Firm Name')}
 Address: {firm_info.get('address', '123 Legal Street, Suite 100')}
 City, State ZIP: {firm_info.get('city', 'City')}, {firm_info.get('state', 'ST')} {firm_info.get('zipCode', '00000')}
 Phone: {firm_info.get('phone', '(555) 123-4567')}
 Email: {firm_info.get('email', 'contact@lawfirm.com')}"""
+
+
+def _with_template(instructions: str, template_content: str = '') -> str:
+    """Instructions followed by the letter template they apply to"""
+    if not template_content:
+        return instructions
+    return f"{instructions}\n\nTEMPLATE:\n{template_content}"
+
+
+def build_demand_letter_system(
+    firm_info: Dict = None,
+    instructions: str = DRAFT_SYSTEM_PROMPT,
+    template_content: str = '',
+) -> List[Dict[str, Any]]:
+    """
+    Build the system blocks for a demand letter
+    
+    The instructions and the template are shared by every letter drafted
+    from that template, and the letterhead by every letter of one firm.
+    The instructions alone are too short to cache, so the template is
+    part of the first block and a full-length template makes that block
+    cacheable; the letterhead can end a second breakpoint.
     
-    prompt = f"""You are a legal assistant drafting a professional demand letter.
+    Args:
+        firm_info: Law firm contact information (optional)
+        instructions: Static instructions placed before the template
+        template_content: Template name or paragraph content (optional)
+        
+    Returns:
+        System prompt blocks
+    """
+    letterhead = build_firm_letterhead(firm_info)
+    blocks = [_with_template(instructions, template_content)]
+    return _system_blocks(blocks + ([letterhead] if letterhead else []), get_model())
 
-Using the following approved facts, draft a compelling demand letter:
+
+def build_demand_letter_prompt(
+    facts: List[Dict],
+    firm_info: Dict = None,
+    template_structure: Any = None,
+    template_content: str = '',
+) -> str:
+    """
+    Build the per-letter part of the demand letter request from approved facts
+    
+    Facts are de-duplicated, trimmed to DRAFT_FACT_TOKEN_BUDGET and listed
+    under the template section they support.
+    
+    Args:
+        facts: List of approved facts
+        firm_info: Law firm contact information (optional)
+        template_structure: Template structure defining the letter sections
+        template_content: Template name or paragraph content (optional)
+        
+    Returns:
+        Prompt text
+    """
+    selection = select_draft_facts(facts, template_structure)
+    facts_text = "\n\n".join(
+        f"{section['name'].upper()}:\n" + ("\n".join(section['lines']) or "- (no specific facts)")
+        for section in selection['sections']
+    )
+    letterhead_hint = " Use the law firm information above in the letterhead." if firm_info else ""
+    template_hint = " Follow the template above." if template_content else ""
+    section_names = ", ".join(section['name'] for section in selection['sections'])
+    
+    return f"""Using the following approved facts, draft a compelling demand letter.{letterhead_hint}{template_hint}
+Organize the letter into these sections, in order: {section_names}. The facts are grouped by the section they support.
 
 FACTS:
-{facts_text}{firm_section}
+{facts_text}"""
 
-INSTRUCTIONS:
-1. Start with a proper letterhead using the law firm information above (if provided)
-2. Use a professional, firm but respectful tone
-3. Clearly establish liability
-4. Detail all injuries and damages
-5. Demand fair compensation
-6. Include a reasonable deadline for response (typically 30 days)
-7. Use proper legal letter format
 
-IMPORTANT - FORMATTING REQUIREMENTS:
-- Output the letter in HTML format
-- Use <h1>, <h2>, <h3> tags for headings (e.g., "III. DAMAGES", "Medical Expenses")
-- Use <p> tags for paragraphs
-- Use <strong> tags for bold text (NOT markdown ** syntax)
-- Use <ul> and <li> for bullet lists
-- Use <br> for line breaks within sections
-- Use <div> tags with class attributes for semantic sections (e.g., class="letterhead", class="section")
-- Do NOT use markdown formatting like ** for bold or # for headings
-- Do NOT include <style> tags or any CSS styling
-- Do NOT include max-width, margin, or any layout styles
-- Do NOT wrap the content in <html>, <head>, or <body> tags
-- Output ONLY the semantic HTML content
+def generate_demand_letter(facts: List[Dict], template_structure: Dict, template_content: str, firm_info: Dict = None) -> str:
+    """
+    Generate demand letter draft using Claude
+    
+    Args:
+        facts: List of approved facts
+        template_structure: Template structure defining the letter sections
+        template_content: Template paragraph content
+        firm_info: Law firm contact information (optional)
+        
+    Returns:
+        Generated demand letter text
+    """
+    system = build_demand_letter_system(firm_info, template_content=template_content)
+    prompt = build_demand_letter_prompt(facts, firm_info, template_structure, template_content)
+    
+    try:
+        message = create_message(
+            model=get_model(),
+            max_tokens=DRAFT_MAX_TOKENS,
+            system=system,
+            messages=[
+                {"role": "user", "content": prompt}
+            ]
+        )
+        
+        record_tokens(message.usage)
+        return message.content[0].text
+    
+    except LLMThrottledError:
+        raise
+    except Exception as e:
+        print(f"Error generating draft: {str(e)}")
+        return f"Error generating draft: {str(e)}"
 
-Write a complete demand letter with the firm's actual information (not placeholders). Make it persuasive and professional."""
 
+async def generate_demand_letter_async(facts: List[Dict], template_structure: Dict, template_content: str, firm_info: Dict = None) -> str:
+    """
+    Async version of generate_demand_letter using AsyncAnthropic
+    
+    Args:
+        facts: List of approved facts
+        template_structure: Template structure defining the letter sections
+        template_content: Template paragraph content
+        firm_info: Law firm contact information (optional)
+        
+    Returns:
+        Generated demand letter text
+    """
+    system = build_demand_letter_system(firm_info, template_content=template_content)
+    prompt = build_demand_letter_prompt(facts, firm_info, template_structure, template_content)
+    
     try:
-        message = client.messages.create(
-            model=os.getenv('ANTHROPIC_MODEL', 'claude-haiku-4-5-20251001'),
-            max_tokens=4000,
+        message = await create_message_async(
+            model=get_model(),
+            max_tokens=DRAFT_MAX_TOKENS,
+            system=system,
             messages=[
                 {"role": "user", "content": prompt}
             ]
         )
         
+        record_tokens(message.usage)
         return message.content[0].text
     
+    except LLMThrottledError:
+        raise
     except Exception as e:
         print(f"Error generating draft: {str(e)}")
         return f"Error generating draft: {str(e)}"
 
+
+async def stream_demand_letter(facts: List[Dict], template_structure: Dict, template_content: str, firm_info: Dict = None) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Stream demand letter generation using the Anthropic streaming API
+    
+    Args:
+        facts: List of approved facts
+        template_structure: Template structure defining the letter sections
+        template_content: Template paragraph content
+        firm_info: Law firm contact information (optional)
+        
+    Yields:
+        {type: 'delta', text} for each HTML fragment, then one
+        {type: 'done', draft, usage} with the assembled draft, or
+        {type: 'error', error} if generation fails
+    """
+    system = build_demand_letter_system(firm_info, template_content=template_content)
+    prompt = build_demand_letter_prompt(facts, firm_info, template_structure, template_content)
+    
+    request = {
+        'model': get_model(),
+        'max_tokens': DRAFT_MAX_TOKENS,
+        'system': system,
+        'messages': [
+            {"role": "user", "content": prompt}
+        ],
+    }
+    scheduler = get_llm_scheduler() if LLM_SCHEDULER else None
+    
+    try:
+        attempt = 0
+        while True:
+            if scheduler:
+                await scheduler.acquire_async(_request_tokens(request))
+            started = False
+            try:
+                async with get_async_client().messages.stream(**request) as stream:
+                    async for text in stream.text_stream:
+                        started = True
+                        yield {'type': 'delta', 'text': text}
+            
+                    message = await stream.get_final_message()
+            except Exception as e:
+                delay = scheduler.release_error(e, attempt) if scheduler else None
+                # Once text has been sent the stream cannot be restarted
+                if delay is None or started:
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            except BaseException:
+                # The client went away mid-stream
+                if scheduler:
+                    scheduler.release()
+                raise
+            if scheduler:
+                scheduler.release(getattr(stream.response, 'headers', None))
+            break
+        
+        record_tokens(message.usage)
+        yield {
+            'type': 'done',
+            'draft': ''.join(block.text for block in message.content if block.type == 'text'),
+            'usage': usage_dict(message.usage),
+            'stop_reason': message.stop_reason,
+        }
+    
+    except Exception as e:
+        print(f"Error streaming draft: {str(e)}")
+        yield {'type': 'error', 'error': str(e)}
+
+
+def _roman(number: int) -> str:
+    """Roman numeral for a section number"""
+    numerals = ((10, 'X'), (9, 'IX'), (5, 'V'), (4, 'IV'), (1, 'I'))
+    result = ''
+    for value, numeral in numerals:
+        while number >= value:
+            result += numeral
+            number -= value
+    return result
+
+
+def _strip_fences(text: str) -> str:
+    """Remove markdown code fences the model sometimes wraps HTML in"""
+    return re.sub(r'\n?```\s*$', '', re.sub(r'^\s*```\w*\n?', '', text)).strip()
+
+
+def _parse_corrections(response_text: str) -> List[Dict[str, str]]:
+    """Parse the consistency pass response into {part, find, replace} corrections"""
+    json_match = re.search(r'\[.*\]', response_text, re.DOTALL)
+    if not json_match:
+        return []
+    try:
+        corrections = json.loads(json_match.group())
+    except json.JSONDecodeError:
+        return []
+    return [
+        item for item in corrections
+        if isinstance(item, dict) and isinstance(item.get('find'), str) and isinstance(item.get('replace'), str) and item['find']
+    ]
+
+
+async def _complete_async(system: List[Dict[str, Any]], prompt: str, max_tokens: int) -> str:
+    """Run one completion and return its text"""
+    message = await create_message_async(
+        model=get_model(),
+        max_tokens=max_tokens,
+        system=system,
+        messages=[
+            {"role": "user", "content": prompt}
+        ]
+    )
+    record_tokens(message.usage)
+    return ''.join(block.text for block in message.content if block.type == 'text')
+
+
+async def check_draft_consistency(parts: List[Tuple[str, str]]) -> List[str]:
+    """
+    Consistency pass over a letter assembled from separately written parts
+    
+    The model only lists corrections, so the pass costs a short completion
+    instead of rewriting the whole letter. Each correction is applied only
+    inside the part it names and only if its text occurs there exactly
+    once; a correction without a known part must match exactly once in the
+    whole letter. Anything else is skipped rather than guessed at.
+    
+    Args:
+        parts: (name, HTML) of each part in letter order
+        
+    Returns:
+        HTML of each part with the corrections applied
+    """
+    draft = '\n'.join(f'{DRAFT_PART_PREFIX}{name}\n{text}' for name, text in parts)
+    response_text = await _complete_async(
+        [{'type': 'text', 'text': 'You are a legal assistant proofreading a demand letter.'}],
+        DRAFT_CONSISTENCY_PROMPT.format(part_prefix=DRAFT_PART_PREFIX, draft=draft),
+        DRAFT_CONSISTENCY_MAX_TOKENS,
+    )
+    corrections = _parse_corrections(response_text)
+    names = [name for name, _ in parts]
+    texts = [text for _, text in parts]
+    applied = 0
+    for correction in corrections:
+        find = correction['find']
+        part = correction.get('part')
+        if part in names:
+            candidates = [names.index(part)]
+        else:
+            candidates = [index for index, text in enumerate(texts) if find in text]
+        matches = sum(texts[index].count(find) for index in candidates)
+        if matches == 1:
+            index = next(index for index in candidates if find in texts[index])
+            texts[index] = texts[index].replace(find, correction['replace'], 1)
+            applied += 1
+    if corrections:
+        print(f'Consistency pass applied {applied} of {len(corrections)} corrections')
+    return texts
+
+
+async def generate_demand_letter_sections(
+    facts: List[Dict],
+    template_structure: Dict,
+    template_content: str,
+    firm_info: Dict = None,
+) -> str:
+    """
+    Generate a demand letter by writing its template sections concurrently
+    
+    Each section is written from the facts selected for it while a separate
+    call writes the letterhead, opening and closing around them. The parts
+    are assembled in template order and, with DRAFT_CONSISTENCY_PASS, checked
+    for contradictions between sections. Falls back to a single completion
+    if any part fails.
+    
+    Args:
+        facts: List of approved facts
+        template_structure: Template structure defining the letter sections
+        template_content: Template name or paragraph content (optional)
+        firm_info: Law firm contact information (optional)
+        
+    Returns:
+        Generated demand letter text
+    """
+    selection = select_draft_facts(facts, template_structure)
+    sections = selection['sections']
+    headings = [f"{_roman(number)}. {section['name'].upper()}" for number, section in enumerate(sections, start=1)]
+    outline = ', '.join(headings)
+    all_lines = "\n".join(line for section in sections for line in section['lines'])
+    
+    section_system = _system_blocks([_with_template(DRAFT_SECTION_SYSTEM_PROMPT, template_content)], get_model())
+    semaphore = asyncio.Semaphore(max(1, DRAFT_SECTION_CONCURRENCY))
+    
+    async def write_section(heading: str, section: Dict[str, Any]) -> str:
+        # Sections without facts of their own (e.g. the demand) draw on the whole case
+        own = bool(section['lines'])
+        prompt = DRAFT_SECTION_PROMPT.format(
+            outline=outline,
+            heading=heading,
+            facts_label='FACTS FOR THIS SECTION' if own else 'FACTS OF THE CASE',
+            facts_text="\n".join(section['lines']) if own else all_lines,
+        )
+        async with semaphore:
+            return _strip_fences(await _complete_async(section_system, prompt, DRAFT_SECTION_MAX_TOKENS))
+    
+    async def write_frame() -> str:
+        prompt = DRAFT_FRAME_PROMPT.format(
+            outline=outline,
+            letterhead_hint=" Use the law firm information above in the letterhead." if firm_info else "",
+            marker=DRAFT_SECTIONS_MARKER,
+            facts_text=all_lines,
+        )
+        async with semaphore:
+            system = build_demand_letter_system(firm_info, DRAFT_FRAME_SYSTEM_PROMPT, template_content)
+            return _strip_fences(await _complete_async(system, prompt, DRAFT_SECTION_MAX_TOKENS))
+    
+    try:
+        frame, *parts = await asyncio.gather(
+            write_frame(),
+            *(write_section(heading, section) for heading, section in zip(headings, sections)),
+        )
+        
+        opening, marker, closing = frame.partition(DRAFT_SECTIONS_MARKER)
+        if not marker:
+            closing = ''
+        named_parts = [
+            (name, text)
+            for name, text in (('OPENING', opening.strip()), *zip(headings, parts), ('CLOSING', closing.strip()))
+            if text
+        ]
+        texts = [text for _, text in named_parts]
+        
+        if DRAFT_CONSISTENCY_PASS:
+            try:
+                texts = await check_draft_consistency(named_parts)
+            except Exception as e:
+                # The assembled draft is still usable without the pass
+                print(f"Error checking draft consistency: {str(e)}")
+        return '\n'.join(texts)
+    
+    except LLMThrottledError:
+        raise
+    except Exception as e:
+        print(f"Error generating draft sections, falling back to a single completion: {str(e)}")
+        return await generate_demand_letter_async(facts, template_structure, template_content, firm_info)
@@ -0,0 +1,245 @@
+"""
+Result cache with pluggable backends
+
+Backends store JSON-serializable dict values under string keys:
+- memory: in-process LRU bounded by total serialized size, optional TTL
+- disk: gzip-compressed JSON files in a local directory
+- postgres: a key/value table in the application database
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, BinaryIO, Optional, Tuple, Union
+
+from src.services.metrics import record_cache
+
+
+def sha256_hex(data: Union[bytes, BinaryIO]) -> str:
+    """Return the hex SHA-256 digest of bytes or a binary file, read in chunks"""
+    if isinstance(data, (bytes, bytearray)):
+        return hashlib.sha256(data).hexdigest()
+    
+    digest = hashlib.sha256()
+    data.seek(0)
+    for chunk in iter(lambda: data.read(1024 * 1024), b''):
+        digest.update(chunk)
+    data.seek(0)
+    return digest.hexdigest()
+
+
+class CacheStats:
+    """Thread-safe hit/miss counters for one cache"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.errors = 0
+    
+    def record(self, field: str) -> None:
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+    
+    def as_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'stores': self.stores,
+                'errors': self.errors,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+class MemoryCacheBackend:
+    """In-process LRU cache evicting by total serialized size"""
+    
+    def __init__(self, max_bytes: int, ttl_seconds: Optional[float] = None):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries: 'OrderedDict[str, Tuple[Dict[str, Any], int, float]]' = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+    
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, size, stored_at = entry
+            if self.ttl_seconds is not None and time.time() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                self._size -= size
+                return None
+            self._entries.move_to_end(key)
+            return value
+    
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        size = len(json.dumps(value))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._size -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size, time.time())
+            self._size += size
+            while self._size > self.max_bytes:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._size -= evicted_size
+
+
+class DiskCacheBackend:
+    """Local on-disk cache storing one gzip JSON file per key"""
+    
+    def __init__(self, directory: str, max_bytes: Optional[int] = None, ttl_seconds: Optional[float] = None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        os.makedirs(directory, exist_ok=True)
+    
+    def _path(self, key: str) -> str:
+        # Keys may contain separators, so files are named by their digest
+        return os.path.join(self.directory, sha256_hex(key.encode('utf-8')) + '.json.gz')
+    
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        path = self._path(key)
+        try:
+            if self.ttl_seconds is not None and time.time() - os.path.getmtime(path) > self.ttl_seconds:
+                os.remove(path)
+                return None
+            with gzip.open(path, 'rt', encoding='utf-8') as file:
+                entry = json.load(file)
+        except FileNotFoundError:
+            return None
+        # Guard against digest collisions between distinct keys
+        if entry.get('key') != key:
+            return None
+        # Touch so size-based eviction removes least recently used files first
+        os.utime(path)
+        return entry['value']
+    
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        path = self._path(key)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as raw, gzip.open(raw, 'wt', encoding='utf-8') as file:
+                json.dump({'key': key, 'value': value}, file)
+            # Atomic rename so concurrent readers never see partial files
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        
+        if self.max_bytes is not None:
+            self._evict()
+    
+    def _evict(self) -> None:
+        """Remove least recently used files until under max_bytes"""
+        files = []
+        total = 0
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json.gz'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+        
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+class PostgresCacheBackend:
+    """Cache stored in a key/value table in the application database"""
+    
+    def __init__(self, table: str, ttl_seconds: Optional[float] = None):
+        self.table = table
+        self.ttl_seconds = ttl_seconds
+    
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        from src.services.database_service import get_cache_entry
+        return get_cache_entry(self.table, key)
+    
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        from src.services.database_service import put_cache_entry
+        put_cache_entry(self.table, key, value, self.ttl_seconds)
+
+
+class ResultCache:
+    """Cache front-end that counts hits and misses and never raises"""
+    
+    def __init__(self, name: str, backend):
+        self.name = name
+        self.backend = backend
+        self.stats = CacheStats()
+    
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            value = self.backend.get(key)
+        except Exception as e:
+            print(f'[{self.name}] Cache read failed: {str(e)}')
+            self.stats.record('errors')
+            value = None
+        self.stats.record('hits' if value is not None else 'misses')
+        record_cache(self.name, value is not None)
+        return value
+    
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        try:
+            self.backend.set(key, value)
+            self.stats.record('stores')
+        except Exception as e:
+            print(f'[{self.name}] Cache write failed: {str(e)}')
+            self.stats.record('errors')
+
+
+def build_cache(
+    name: str,
+    backend: str,
+    max_bytes: int,
+    directory: str,
+    table: str,
+    ttl_seconds: Optional[float] = None,
+) -> Optional[ResultCache]:
+    """
+    Build a cache from configuration values
+    
+    Args:
+        name: Cache name used in log messages
+        backend: One of memory, disk, postgres or none
+        max_bytes: Size bound for the memory and disk backends
+        directory: Directory for the disk backend
+        table: Table name for the postgres backend
+        ttl_seconds: Optional entry lifetime
+        
+    Returns:
+        ResultCache, or None when caching is disabled
+    """
+    backend = backend.lower()
+    if backend == 'memory':
+        return ResultCache(name, MemoryCacheBackend(max_bytes, ttl_seconds))
+    if backend == 'disk':
+        return ResultCache(name, DiskCacheBackend(directory, max_bytes, ttl_seconds))
+    if backend == 'postgres':
+        return ResultCache(name, PostgresCacheBackend(table, ttl_seconds))
+    if backend == 'none':
+        return None
+    raise ValueError(f'Unknown cache backend: {backend}')
@@ -0,0 +1,346 @@
+"""
+CPU-only text embeddings and vector index for facts
+
+Texts are embedded offline with the hashing trick: words, word bigrams and
+character trigrams are hashed into EMBEDDING_DIM signed buckets, weighted
+by inverse document frequency over the batch and L2-normalized, so cosine
+similarity is a dot product. No model download or network call is needed,
+and near-identical wording ("rear-end collision on May 12, 2024" in the
+police report and the intake packet) lands close together.
+
+VectorIndex scores queries with NumPy matrix products. Large indexes can
+switch to random-hyperplane LSH so only vectors sharing a hash bucket with
+the query are scored.
+"""
+
+import os
+import re
+import zlib
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+EMBEDDING_DIM = int(os.getenv('EMBEDDING_DIM', 1024))
+# auto uses LSH once an index holds EMBEDDING_ANN_MIN_SIZE vectors
+EMBEDDING_ANN = os.getenv('EMBEDDING_ANN', 'auto').lower()
+EMBEDDING_ANN_MIN_SIZE = int(os.getenv('EMBEDDING_ANN_MIN_SIZE', 50000))
+EMBEDDING_ANN_TABLES = int(os.getenv('EMBEDDING_ANN_TABLES', 16))
+EMBEDDING_ANN_BITS = int(os.getenv('EMBEDDING_ANN_BITS', 8))
+
+# Rows of the similarity matrix computed at once when finding duplicates
+_BLOCK_ROWS = 2048
+
+_TOKEN = re.compile(r"[a-z0-9$]+(?:[.,'/-][a-z0-9]+)*")
+_NUMBER = re.compile(r'\d[\d,]*(?:\.\d+)?')
+_SUFFIXES = ('ing', 'ed', 'es', 's')
+# Function words carry no meaning for matching facts and would split bigrams
+_STOPWORDS = frozenset(
+    'a an the and or of to in on at by for from with as is was were be been being has have had '
+    'that this these those it its their his her they he she which who whom'.split()
+)
+
+
+def _stem(word: str) -> str:
+    """Crude suffix stripping so 'fractured' and 'fracture' share features"""
+    if len(word) > 4 and not word[0].isdigit():
+        for suffix in _SUFFIXES:
+            if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+                return word[:-len(suffix)]
+    return word
+
+
+@lru_cache(maxsize=65536)
+def _hashed(feature: str, dim: int) -> Tuple[int, float]:
+    """Bucket and sign of one feature; crc32 is stable across processes"""
+    value = zlib.crc32(feature.encode())
+    return value % dim, 1.0 if value & 0x80000000 else -1.0
+
+
+@lru_cache(maxsize=65536)
+def _word_features(word: str, dim: int) -> Tuple[Tuple[int, float], ...]:
+    """Hashed word and character trigram features of one word"""
+    padded = f'#{word}#'
+    features = [_hashed('w:' + word, dim)]
+    # Trigrams carry half weight so shared words dominate shared spelling
+    features.extend((bucket, sign * 0.5) for bucket, sign in (
+        _hashed('c:' + padded[i:i + 3], dim) for i in range(len(padded) - 2)
+    ))
+    return tuple(features)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased, lightly stemmed word tokens without stopwords"""
+    return [_stem(token) for token in _TOKEN.findall(text.lower()) if token not in _STOPWORDS]
+
+
+class TextEmbedder:
+    """
+    Hashing-trick TF-IDF embedder
+    
+    fit learns inverse document frequencies from a batch of texts; transform
+    then embeds texts (e.g. section queries) in the same space.
+    """
+    
+    def __init__(self, dim: int = EMBEDDING_DIM):
+        self.dim = dim
+        self.idf = np.ones(dim, dtype=np.float32)
+    
+    def _counts(self, texts: Sequence[str]) -> np.ndarray:
+        rows: List[int] = []
+        cols: List[int] = []
+        values: List[float] = []
+        for row, text in enumerate(texts):
+            words = tokenize(text)
+            for word in words:
+                for bucket, weight in _word_features(word, self.dim):
+                    rows.append(row)
+                    cols.append(bucket)
+                    values.append(weight)
+            for first, second in zip(words, words[1:]):
+                bucket, weight = _hashed(f'b:{first} {second}', self.dim)
+                rows.append(row)
+                cols.append(bucket)
+                values.append(weight)
+        
+        counts = np.zeros((len(texts), self.dim), dtype=np.float32)
+        np.add.at(counts, (np.asarray(rows, dtype=np.intp), np.asarray(cols, dtype=np.intp)), np.asarray(values, dtype=np.float32))
+        return counts
+    
+    def _normalize(self, counts: np.ndarray) -> np.ndarray:
+        vectors = counts * self.idf
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        np.divide(vectors, norms, out=vectors, where=norms > 0)
+        return vectors
+    
+    def fit_transform(self, texts: Sequence[str]) -> np.ndarray:
+        """Learn IDF weights from texts and return their unit vectors"""
+        counts = self._counts(texts)
+        df = np.count_nonzero(counts, axis=0)
+        self.idf = (np.log((1 + len(texts)) / (1 + df)) + 1).astype(np.float32)
+        return self._normalize(counts)
+    
+    def transform(self, texts: Sequence[str]) -> np.ndarray:
+        """Unit vectors of texts using the fitted IDF weights"""
+        return self._normalize(self._counts(texts))
+
+
+def embed_texts(texts: Sequence[str], dim: int = EMBEDDING_DIM) -> np.ndarray:
+    """Unit vectors for a batch of texts, IDF-weighted over the batch"""
+    return TextEmbedder(dim).fit_transform(texts)
+
+
+class VectorIndex:
+    """
+    Cosine-similarity index over unit vectors
+    
+    Brute force scores every stored vector with one matrix product. With
+    ann enabled, each of tables random-hyperplane hashes of bits bits puts
+    vectors into buckets and only vectors sharing a bucket with the query
+    are scored, trading a little recall for sublinear search.
+    """
+    
+    def __init__(
+        self,
+        dim: int = EMBEDDING_DIM,
+        ann: Optional[bool] = None,
+        tables: int = EMBEDDING_ANN_TABLES,
+        bits: int = EMBEDDING_ANN_BITS,
+        seed: int = 0,
+    ):
+        self.dim = dim
+        self._ann = ann
+        self.tables = tables
+        self.bits = bits
+        self._vectors = np.zeros((0, dim), dtype=np.float32)
+        self._planes = np.random.default_rng(seed).standard_normal((dim, tables * bits)).astype(np.float32)
+        self._buckets: Optional[List[Dict[int, np.ndarray]]] = None
+        self._codes: Optional[np.ndarray] = None
+    
+    def __len__(self) -> int:
+        return len(self._vectors)
+    
+    @property
+    def ann(self) -> bool:
+        """Whether searches use LSH candidates"""
+        if self._ann is not None:
+            return self._ann
+        if EMBEDDING_ANN in ('true', 'false'):
+            return EMBEDDING_ANN == 'true'
+        return len(self) >= EMBEDDING_ANN_MIN_SIZE
+    
+    def add(self, vectors: np.ndarray) -> None:
+        """Append unit vectors; their ids are their insertion positions"""
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        self._vectors = np.vstack([self._vectors, vectors]) if len(self) else vectors.copy()
+        self._buckets = None
+    
+    def _hash(self, vectors: np.ndarray) -> np.ndarray:
+        """LSH code per table for each vector, shape (n, tables)"""
+        bits = (vectors @ self._planes > 0).reshape(len(vectors), self.tables, self.bits)
+        return bits @ (1 << np.arange(self.bits, dtype=np.int64))
+    
+    def _build_buckets(self) -> List[Dict[int, np.ndarray]]:
+        if self._buckets is None:
+            self._codes = self._hash(self._vectors)
+            self._buckets = []
+            for table in range(self.tables):
+                codes = self._codes[:, table]
+                order = np.argsort(codes, kind='stable')
+                values, starts = np.unique(codes[order], return_index=True)
+                groups = np.split(order, starts[1:])
+                self._buckets.append({int(value): group for value, group in zip(values, groups)})
+        return self._buckets
+    
+    def _candidates(self, code: np.ndarray) -> np.ndarray:
+        buckets = self._build_buckets()
+        found = [buckets[table].get(int(code[table])) for table in range(self.tables)]
+        found = [group for group in found if group is not None]
+        return np.unique(np.concatenate(found)) if found else np.zeros(0, dtype=np.intp)
+    
+    def search(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Top-k most similar stored vectors for each query
+        
+        Args:
+            queries: Unit query vectors, shape (q, dim)
+            k: Results per query
+            
+        Returns:
+            (scores, ids), each shape (q, k), best first; missing results
+            have id -1 and score -inf
+        """
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.dim)
+        scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        ids = np.full((len(queries), k), -1, dtype=np.intp)
+        if not len(self) or k <= 0:
+            return scores, ids
+        
+        if not self.ann:
+            similarities = queries @ self._vectors.T
+            take = min(k, len(self))
+            top = np.argpartition(-similarities, take - 1, axis=1)[:, :take]
+            top_scores = np.take_along_axis(similarities, top, axis=1)
+            order = np.argsort(-top_scores, axis=1, kind='stable')
+            ids[:, :take] = np.take_along_axis(top, order, axis=1)
+            scores[:, :take] = np.take_along_axis(top_scores, order, axis=1)
+            return scores, ids
+        
+        for row, code in enumerate(self._hash(queries)):
+            candidates = self._candidates(code)
+            if not len(candidates):
+                continue
+            similarities = self._vectors[candidates] @ queries[row]
+            order = np.argsort(-similarities, kind='stable')[:k]
+            ids[row, :len(order)] = candidates[order]
+            scores[row, :len(order)] = similarities[order]
+        return scores, ids
+    
+    def similar_pairs(self, threshold: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        All pairs of stored vectors at least threshold similar
+        
+        Returns:
+            (later, earlier, score) arrays with earlier < later
+        """
+        if self.ann:
+            return self._similar_pairs_lsh(threshold)
+        
+        later, earlier, score = [], [], []
+        for start in range(0, len(self), _BLOCK_ROWS):
+            end = min(len(self), start + _BLOCK_ROWS)
+            # Only compare each vector with the ones before it
+            similarities = self._vectors[start:end] @ self._vectors[:end].T
+            rows, cols = np.nonzero(similarities >= threshold)
+            keep = cols < rows + start
+            later.append(rows[keep] + start)
+            earlier.append(cols[keep])
+            score.append(similarities[rows[keep], cols[keep]])
+        if not later:
+            return np.zeros(0, np.intp), np.zeros(0, np.intp), np.zeros(0, np.float32)
+        return np.concatenate(later), np.concatenate(earlier), np.concatenate(score)
+    
+    def _similar_pairs_lsh(self, threshold: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        pairs: Dict[Tuple[int, int], float] = {}
+        for buckets in self._build_buckets():
+            for group in buckets.values():
+                if len(group) < 2:
+                    continue
+                similarities = self._vectors[group] @ self._vectors[group].T
+                rows, cols = np.nonzero(np.tril(similarities >= threshold, k=-1))
+                for row, col in zip(rows.tolist(), cols.tolist()):
+                    first, second = int(group[row]), int(group[col])
+                    key = (first, second) if first > second else (second, first)
+                    pairs[key] = float(similarities[row, col])
+        if not pairs:
+            return np.zeros(0, np.intp), np.zeros(0, np.intp), np.zeros(0, np.float32)
+        keys = np.array(list(pairs), dtype=np.intp)
+        return keys[:, 0], keys[:, 1], np.array(list(pairs.values()), dtype=np.float32)
+
+
+def numbers_in(text: str) -> frozenset:
+    """Numbers mentioned in a text, e.g. amounts, dates and page numbers"""
+    return frozenset(match.replace(',', '') for match in _NUMBER.findall(text))
+
+
+def duplicate_leaders(
+    vectors: np.ndarray,
+    threshold: float,
+    ann: Optional[bool] = None,
+    numbers: Optional[Sequence[frozenset]] = None,
+) -> np.ndarray:
+    """
+    Assign each vector to the earlier vector it duplicates
+    
+    Vectors are taken in order; one is kept unless it is at least threshold
+    similar to an earlier kept vector, in which case it joins the most
+    similar one. Comparing only against kept vectors stops chains of small
+    differences from merging unrelated texts.
+    
+    Args:
+        vectors: Unit vectors in priority order
+        threshold: Cosine similarity at which vectors are duplicates
+        ann: Use LSH candidate pairs (default: by index size)
+        numbers: numbers_in() of each text; texts are only duplicates when
+            one's numbers include the other's, so "$8,632" never merges
+            with "$13,082"
+            
+    Returns:
+        leaders array; leaders[i] == i for kept vectors
+    """
+    index = VectorIndex(vectors.shape[1], ann=ann)
+    index.add(vectors)
+    later, earlier, score = index.similar_pairs(threshold)
+    
+    leaders = np.arange(len(vectors))
+    # Visit pairs by later vector, most similar earlier vector first
+    order = np.lexsort((-score, later))
+    current, decided = -1, False
+    for position in order.tolist():
+        item = int(later[position])
+        if item != current:
+            current, decided = item, False
+        if decided:
+            continue
+        other = int(earlier[position])
+        if numbers is not None and not (numbers[item] <= numbers[other] or numbers[other] <= numbers[item]):
+            continue
+        if leaders[other] == other:
+            leaders[item] = other
+            decided = True
+    return leaders
+
+
+def find_duplicates(texts: Sequence[str], threshold: float, ann: Optional[bool] = None) -> np.ndarray:
+    """
+    Embed texts in one batch and assign each to the earlier text it restates
+    
+    Args:
+        texts: Texts in priority order
+        threshold: Cosine similarity at which texts are duplicates
+        ann: Use LSH candidate pairs (default: by batch size)
+        
+    Returns:
+        leaders array as from duplicate_leaders
+    """
+    return duplicate_leaders(embed_texts(texts), threshold, ann=ann, numbers=[numbers_in(text) for text in texts])
@@ -0,0 +1,100 @@
+"""
+Content-addressed cache for PDF text extraction
+
+Results are keyed by the SHA-256 of the PDF bytes plus the extractor version,
+so the same police report uploaded to many documents is extracted once.
+"""
+
+import os
+import tempfile
+from typing import Dict, Any, BinaryIO, Optional, Union
+
+from src.services.cache_service import build_cache, sha256_hex
+from src.services.ocr import ocr_version
+from src.services.pdf_engines import extractor_version
+from src.services.pdf_extractor import PdfSource, extract_text_from_pdf
+
+EXTRACTION_CACHE_BACKEND = os.getenv('EXTRACTION_CACHE_BACKEND', 'memory')
+EXTRACTION_CACHE_MAX_BYTES = int(os.getenv('EXTRACTION_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+EXTRACTION_CACHE_DIR = os.getenv(
+    'EXTRACTION_CACHE_DIR',
+    os.path.join(tempfile.gettempdir(), 'demand-letter-extraction-cache'),
+)
+EXTRACTION_CACHE_TABLE = 'pdf_extraction_cache'
+
+_cache = None
+_cache_built = False
+
+
+def get_extraction_cache():
+    """Return the configured extraction cache, building it on first use"""
+    global _cache, _cache_built
+    if not _cache_built:
+        _cache = build_cache(
+            'extraction_cache',
+            EXTRACTION_CACHE_BACKEND,
+            EXTRACTION_CACHE_MAX_BYTES,
+            EXTRACTION_CACHE_DIR,
+            EXTRACTION_CACHE_TABLE,
+        )
+        _cache_built = True
+    return _cache
+
+
+def extraction_cache_key(pdf_bytes: Union[bytes, BinaryIO], engine: Optional[str] = None) -> str:
+    """Cache key for a PDF: content hash plus the engine setting's extractor and OCR versions"""
+    ocr = ocr_version()
+    version = f'{extractor_version(engine)}+ocr-{ocr}' if ocr else extractor_version(engine)
+    return f'{version}:{sha256_hex(pdf_bytes)}'
+
+
+def extract_text_cached(
+    pdf_bytes: PdfSource,
+    parallel: Optional[bool] = None,
+    engine: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Extract text from PDF bytes, reusing a cached result when available
+    
+    Args:
+        pdf_bytes: PDF file content as bytes or a binary file object
+        parallel: Passed through to extract_text_from_pdf on a miss
+        engine: Extraction engine or auto (default PDF_EXTRACT_ENGINE)
+        
+    Returns:
+        Same dictionary as extract_text_from_pdf plus a 'cached' flag
+    """
+    cache = get_extraction_cache()
+    if cache is None:
+        return {**extract_text_from_pdf(pdf_bytes, parallel=parallel, engine=engine), 'cached': False}
+    
+    key = extraction_cache_key(pdf_bytes, engine)
+    entry = cache.get(key)
+    if entry is not None:
+        # Only pages are stored; the joined text is rebuilt on read
+        return {
+            'success': True,
+            'text': '\n\n'.join([page['text'] for page in entry['pages']]),
+            'page_count': entry['page_count'],
+            'pages': entry['pages'],
+            'engine': entry.get('engine'),
+            'cached': True,
+        }
+    
+    result = extract_text_from_pdf(pdf_bytes, parallel=parallel, engine=engine)
+    if result['success']:
+        cache.set(key, {
+            'page_count': result['page_count'],
+            'pages': result['pages'],
+            'engine': result['engine'],
+        })
+    
+    return {**result, 'cached': False}
+
+
+def get_extraction_cache_stats() -> Dict[str, Any]:
+    """Return hit/miss counters for the extraction cache"""
+    cache = get_extraction_cache()
+    if cache is None:
+        return {'backend': 'none'}
+    return {'backend': EXTRACTION_CACHE_BACKEND, **cache.stats.as_dict()}
@@ -0,0 +1,94 @@
+"""
+Result cache for AI fact extraction
+
+Facts are keyed by a hash of the whitespace-normalized document text, the
+prompt template, the model name and max_tokens, so re-running extraction
+on unchanged PDFs skips the Claude call entirely.
+"""
+
+import json
+import os
+import tempfile
+from typing import Dict, Any, List, Optional
+
+from src.services.cache_service import build_cache, sha256_hex
+
+FACT_CACHE_BACKEND = os.getenv('FACT_CACHE_BACKEND', 'memory')
+FACT_CACHE_MAX_BYTES = int(os.getenv('FACT_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+FACT_CACHE_TTL_SECONDS = float(os.getenv('FACT_CACHE_TTL_SECONDS', 7 * 24 * 3600))
+FACT_CACHE_DIR = os.getenv(
+    'FACT_CACHE_DIR',
+    os.path.join(tempfile.gettempdir(), 'demand-letter-fact-cache'),
+)
+FACT_CACHE_TABLE = 'fact_extraction_cache'
+
+_cache = None
+_cache_built = False
+
+
+def get_fact_cache():
+    """Return the configured fact cache, building it on first use"""
+    global _cache, _cache_built
+    if not _cache_built:
+        _cache = build_cache(
+            'fact_cache',
+            FACT_CACHE_BACKEND,
+            FACT_CACHE_MAX_BYTES,
+            FACT_CACHE_DIR,
+            FACT_CACHE_TABLE,
+            ttl_seconds=FACT_CACHE_TTL_SECONDS,
+        )
+        _cache_built = True
+    return _cache
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace so re-extracted text with different spacing hits the cache"""
+    return ' '.join(text.split())
+
+
+def fact_cache_key(text: str, prompt_template: str, model: str, max_tokens: int) -> str:
+    """
+    Build the cache key for one fact extraction call
+    
+    Args:
+        text: Document text sent to the model
+        prompt_template: Prompt template without the filename or text filled in
+        model: Anthropic model name
+        max_tokens: Completion token limit
+        
+    Returns:
+        Hex digest identifying the request
+    """
+    parts = {
+        'text': sha256_hex(normalize_text(text).encode('utf-8')),
+        'prompt': sha256_hex(prompt_template.encode('utf-8')),
+        'model': model,
+        'max_tokens': max_tokens,
+    }
+    return sha256_hex(json.dumps(parts, sort_keys=True).encode('utf-8'))
+
+
+def get_cached_facts(cache_key: str) -> Optional[List[Dict[str, Any]]]:
+    """Return cached facts for a key, or None on a miss"""
+    cache = get_fact_cache()
+    if cache is None:
+        return None
+    entry = cache.get(cache_key)
+    return entry['facts'] if entry is not None else None
+
+
+def store_cached_facts(cache_key: str, facts: List[Dict[str, Any]]) -> None:
+    """Cache facts for a key; empty results are not cached so failures are retried"""
+    cache = get_fact_cache()
+    if cache is None or not facts:
+        return
+    cache.set(cache_key, {'facts': facts})
+
+
+def get_fact_cache_stats() -> Dict[str, Any]:
+    """Return hit/miss counters for the fact cache"""
+    cache = get_fact_cache()
+    if cache is None:
+        return {'backend': 'none'}
+    return {'backend': FACT_CACHE_BACKEND, **cache.stats.as_dict()}
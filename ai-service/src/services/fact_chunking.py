@@ -0,0 +1,191 @@
+"""
+Chunked map-reduce fact extraction for long documents
+
+Per-page text is packed into token-budgeted windows with overlap, each
+window is sent to Claude concurrently under a semaphore, and the results
+are merged, de-duplicated and tied back to real page numbers.
+"""
+
+import asyncio
+import os
+import re
+from typing import Dict, Any, List, Optional
+
+from src.services.anthropic_service import extract_facts_from_text_async
+from src.services.tokens import CHARS_PER_TOKEN
+
+FACT_CHUNK_TOKENS = int(os.getenv('FACT_CHUNK_TOKENS', 12000))
+FACT_CHUNK_OVERLAP_TOKENS = int(os.getenv('FACT_CHUNK_OVERLAP_TOKENS', 300))
+FACT_CHUNK_CONCURRENCY = int(os.getenv('FACT_CHUNK_CONCURRENCY', 4))
+
+
+def _split_text(text: str, max_chars: int) -> List[str]:
+    """Split text into pieces of at most max_chars, preferring whitespace boundaries"""
+    pieces = []
+    while len(text) > max_chars:
+        cut = text.rfind(' ', 0, max_chars)
+        if cut <= 0:
+            cut = max_chars
+        pieces.append(text[:cut])
+        text = text[cut:].lstrip()
+    if text:
+        pieces.append(text)
+    return pieces
+
+
+def _format_window(segments: List[Dict[str, Any]]) -> str:
+    """Join window segments, marking where each page starts"""
+    parts = []
+    current_page = object()
+    for segment in segments:
+        if segment['page'] is not None and segment['page'] != current_page:
+            parts.append(f"--- Page {segment['page']} ---")
+        current_page = segment['page']
+        parts.append(segment['text'])
+    return '\n\n'.join(parts)
+
+
+def chunk_pages(
+    pages: List[Dict[str, Any]],
+    max_tokens: int = FACT_CHUNK_TOKENS,
+    overlap_tokens: int = FACT_CHUNK_OVERLAP_TOKENS,
+) -> List[Dict[str, Any]]:
+    """
+    Pack per-page text into token-budgeted windows with overlap
+    
+    Args:
+        pages: {page, text} records as returned by extract_text_from_pdf;
+            page may be None when page boundaries are unknown
+        max_tokens: Estimated token budget per window
+        overlap_tokens: Estimated tokens carried over from the previous window
+        
+    Returns:
+        List of {text, first_page, last_page} windows in document order
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    overlap_chars = min(overlap_tokens * CHARS_PER_TOKEN, max_chars // 2)
+    
+    segments = []
+    for page in pages:
+        for piece in _split_text(page['text'], max_chars):
+            segments.append({'page': page.get('page'), 'text': piece})
+    
+    windows = []
+    current: List[Dict[str, Any]] = []
+    current_chars = 0
+    
+    def emit():
+        page_numbers = [segment['page'] for segment in current if segment['page'] is not None]
+        windows.append({
+            'text': _format_window(current),
+            'first_page': min(page_numbers) if page_numbers else None,
+            'last_page': max(page_numbers) if page_numbers else None,
+        })
+    
+    for segment in segments:
+        if current and current_chars + len(segment['text']) > max_chars:
+            emit()
+            # Carry the tail of the previous window so facts spanning the
+            # boundary are seen whole by at least one call
+            tail = current[-1]
+            overlap_text = tail['text'][-overlap_chars:] if overlap_chars else ''
+            current = [{'page': tail['page'], 'text': overlap_text}] if overlap_text else []
+            current_chars = len(overlap_text)
+        current.append(segment)
+        current_chars += len(segment['text'])
+    
+    if current:
+        emit()
+    
+    return windows
+
+
+def _resolve_page(fact: Dict[str, Any], window: Dict[str, Any]) -> Optional[int]:
+    """Return the page a fact cites if it falls inside its window"""
+    if window['first_page'] is None:
+        return None
+    for number in re.findall(r'\d+', str(fact.get('page_reference', ''))):
+        page = int(number)
+        if window['first_page'] <= page <= window['last_page']:
+            return page
+    return None
+
+
+def _fact_key(fact: Dict[str, Any]) -> str:
+    """Normalized fact text used to detect duplicates"""
+    text = str(fact.get('fact_text', '')).lower()
+    return ' '.join(re.sub(r'[^\w\s]', ' ', text).split())
+
+
+def merge_facts(results: List[List[Dict[str, Any]]], windows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Merge per-window facts, tying page references to real pages and dropping duplicates
+    
+    Args:
+        results: Facts returned for each window, in window order
+        windows: Windows produced by chunk_pages
+        
+    Returns:
+        De-duplicated facts in document order
+    """
+    merged: Dict[str, Dict[str, Any]] = {}
+    for facts, window in zip(results, windows):
+        for fact in facts:
+            if not isinstance(fact, dict) or not fact.get('fact_text'):
+                continue
+            
+            fact = dict(fact)
+            if window['first_page'] is not None:
+                page = _resolve_page(fact, window)
+                fact['page_number'] = page
+                if page is not None:
+                    fact['page_reference'] = f'page {page}'
+                elif window['first_page'] == window['last_page']:
+                    fact['page_number'] = window['first_page']
+                    fact['page_reference'] = f"page {window['first_page']}"
+                else:
+                    fact['page_reference'] = f"pages {window['first_page']}-{window['last_page']}"
+            
+            key = _fact_key(fact)
+            existing = merged.get(key)
+            if existing is None:
+                merged[key] = fact
+            elif existing.get('page_number') is None and fact.get('page_number') is not None:
+                # Prefer the copy that pins down an exact page
+                merged[key] = fact
+    
+    return list(merged.values())
+
+
+async def extract_facts_chunked(
+    pages: List[Dict[str, Any]],
+    document_filename: str,
+    max_tokens: int = FACT_CHUNK_TOKENS,
+    concurrency: int = FACT_CHUNK_CONCURRENCY,
+) -> List[Dict[str, Any]]:
+    """
+    Extract facts from a long document by mapping over chunks concurrently
+    
+    Args:
+        pages: {page, text} records; page may be None for unpaged text
+        document_filename: Name of the source document
+        max_tokens: Estimated token budget per chunk
+        concurrency: Maximum chunks in flight at once
+        
+    Returns:
+        Merged list of facts; paged input adds a page_number field
+    """
+    windows = chunk_pages(pages, max_tokens=max_tokens)
+    if not windows:
+        return []
+    
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    
+    async def run(window: Dict[str, Any]) -> List[Dict[str, Any]]:
+        async with semaphore:
+            return await extract_facts_from_text_async(window['text'], document_filename)
+    
+    if len(windows) > 1:
+        print(f'Extracting facts from {document_filename} in {len(windows)} chunks')
+    results = await asyncio.gather(*(run(window) for window in windows))
+    return merge_facts(results, windows)
@@ -0,0 +1,324 @@
+"""
+Token-budgeted fact selection for demand letter drafts
+
+Approved facts are collapsed when their embeddings show they restate each
+other, grouped by category and assigned to the template's letter sections;
+sections that claim no category retrieve their most similar facts. When the facts
+outgrow DRAFT_FACT_TOKEN_BUDGET, sections take turns keeping their most
+specific facts so every section stays represented and the prompt stays
+within a predictable size.
+"""
+
+import os
+import re
+from typing import Dict, Any, List, Optional
+
+from src.services.embedding_index import TextEmbedder, VectorIndex, find_duplicates
+from src.services.metrics import count
+from src.services.tokens import estimate_tokens
+
+DRAFT_FACT_TOKEN_BUDGET = int(os.getenv('DRAFT_FACT_TOKEN_BUDGET', 6000))
+# Embedding cosine similarity at or above which two facts count as the same fact
+DRAFT_FACT_SIMILARITY = float(os.getenv('DRAFT_FACT_SIMILARITY', 0.8))
+# Facts retrieved for template sections that claim no fact categories
+DRAFT_SECTION_TOP_K = int(os.getenv('DRAFT_SECTION_TOP_K', 8))
+DRAFT_SECTION_MIN_SIMILARITY = float(os.getenv('DRAFT_SECTION_MIN_SIMILARITY', 0.15))
+# Similarity at which facts from different PDFs of a batch are the same fact
+FACT_BATCH_SIMILARITY = float(os.getenv('FACT_BATCH_SIMILARITY', 0.85))
+
+# Categories used by fact extraction, most important first
+CATEGORIES = ('liability', 'injury', 'treatment', 'financial', 'incident', 'other')
+
+# Keywords classifying facts that arrive without a category
+CATEGORY_KEYWORDS = {
+    'liability': ('fault', 'negligen', 'liab', 'citation', 'cited', 'violat', 'ran a red', 'failed to', 'admitted', 'rear-end', 'speeding', 'insur', 'policy'),
+    'injury': ('injur', 'fractur', 'sprain', 'strain', 'whiplash', 'pain', 'laceration', 'concussion', 'diagnos', 'contusion'),
+    'treatment': ('treat', 'therap', 'surgery', 'hospital', 'physician', 'doctor', 'clinic', 'emergency', 'mri', 'x-ray', 'prescri', 'chiropract', 'visit'),
+    'financial': ('$', 'cost', 'bill', 'expense', 'wage', 'income', 'lost', 'paid', 'invoice', 'balance', 'estimate', 'repair'),
+    'incident': ('accident', 'collision', 'crash', 'incident', 'intersection', 'vehicle', 'occurred', 'scene', 'police'),
+}
+
+# Letter sections used when the template does not define any
+DEFAULT_SECTIONS = [
+    {'name': 'Liability', 'categories': ['incident', 'liability', 'other']},
+    {'name': 'Treatment', 'categories': ['injury', 'treatment']},
+    {'name': 'Damages', 'categories': ['financial']},
+    {'name': 'Demand', 'categories': []},
+]
+
+# Section-name keywords that claim categories for template sections
+# that do not list their own
+SECTION_KEYWORDS = {
+    'liability': ('liab', 'fault', 'negligen', 'fact', 'background', 'incident', 'accident'),
+    'incident': ('fact', 'background', 'incident', 'accident'),
+    'injury': ('injur', 'medical', 'treatment'),
+    'treatment': ('treat', 'medical', 'care'),
+    'financial': ('damage', 'special', 'expense', 'bill', 'wage', 'economic'),
+}
+
+_SPECIFIC = re.compile(r'\d')
+
+
+def _words(text: str) -> frozenset:
+    """Normalized word set of a fact's text"""
+    return frozenset(re.sub(r'[^\w\s$]', ' ', text.lower()).split())
+
+
+def fact_category(fact: Dict[str, Any]) -> str:
+    """Category of a fact, from its own category field or keyword matching"""
+    category = str(fact.get('category') or '').lower()
+    if category in CATEGORIES:
+        return category
+    text = str(fact.get('factText', '')).lower()
+    for name, keywords in CATEGORY_KEYWORDS.items():
+        if any(keyword in text for keyword in keywords):
+            return name
+    return 'other'
+
+
+def collapse_duplicates(facts: List[Dict[str, Any]], threshold: float = DRAFT_FACT_SIMILARITY) -> List[Dict[str, Any]]:
+    """
+    Collapse facts that restate each other into the most detailed copy
+    
+    Facts are embedded in one batch and compared by cosine similarity
+    (see embedding_index); facts citing different numbers are never
+    collapsed. Citations of collapsed facts are merged into the
+    kept one.
+    
+    Args:
+        facts: Facts with factText and optional citation
+        threshold: Similarity at or above which facts are collapsed
+        
+    Returns:
+        Kept facts in their original order
+    """
+    facts = [fact for fact in facts if _words(str(fact.get('factText', '')))]
+    if not facts:
+        return []
+    leaders = find_duplicates([str(fact['factText']) for fact in facts], threshold)
+    
+    kept: Dict[int, Dict[str, Any]] = {}
+    for position, fact in enumerate(facts):
+        leader = int(leaders[position])
+        if leader == position:
+            kept[position] = dict(fact)
+            continue
+        
+        existing = kept[leader]
+        citations = [c for c in (existing.get('citation'), fact.get('citation')) if c]
+        if len(_words(fact['factText'])) > len(_words(existing['factText'])):
+            # Keep the more detailed wording in the original position
+            existing['factText'] = fact['factText']
+        if citations:
+            existing['citation'] = '; '.join(dict.fromkeys(citations))
+    
+    return list(kept.values())
+
+
+def collapse_batch_facts(results: List[Dict[str, Any]], threshold: float = FACT_BATCH_SIMILARITY) -> int:
+    """
+    Drop facts that repeat a fact from an earlier PDF of the same batch
+    
+    The kept fact records where else it was found in also_cited_in
+    ({pdfId, page_reference, page_number}) so no citation is lost.
+    
+    Args:
+        results: extract_facts_batch results ({pdfId, success, facts}), modified in place
+        threshold: Similarity at or above which facts are the same fact
+        
+    Returns:
+        Number of facts dropped
+    """
+    entries = [
+        (result, fact)
+        for result in results if result.get('success')
+        for fact in result['facts'] if str(fact.get('fact_text') or '').strip()
+    ]
+    if len(entries) < 2:
+        return 0
+    leaders = find_duplicates([str(fact['fact_text']) for _, fact in entries], threshold)
+    
+    dropped = set()
+    for position, (result, fact) in enumerate(entries):
+        leader = int(leaders[position])
+        if leader == position:
+            continue
+        kept_result, kept_fact = entries[leader]
+        if kept_result is result:
+            # Repeats inside one PDF are left to extraction's own merging
+            continue
+        kept_fact.setdefault('also_cited_in', []).append({
+            'pdfId': result.get('pdfId'),
+            'page_reference': fact.get('page_reference'),
+            'page_number': fact.get('page_number'),
+        })
+        dropped.add(id(fact))
+    
+    for result in results:
+        if result.get('success'):
+            result['facts'] = [fact for fact in result['facts'] if id(fact) not in dropped]
+    count('batch_facts_collapsed', len(dropped))
+    return len(dropped)
+
+
+def _section_name(section: Any) -> str:
+    if isinstance(section, dict):
+        for key in ('name', 'title', 'heading', 'label'):
+            if section.get(key):
+                return str(section[key])
+        return ''
+    return str(section or '')
+
+
+def template_sections(template_structure: Any) -> List[Dict[str, Any]]:
+    """
+    Read letter sections and the categories each one covers from a template structure
+    
+    Sections may be plain names or objects with a name/title and an optional
+    categories list; sections without categories claim them by name.
+    
+    Args:
+        template_structure: Template structure, e.g. {sections: [...]}
+        
+    Returns:
+        List of {name, categories, query} sections (query is the name plus
+        any description, used for fact retrieval), DEFAULT_SECTIONS when the
+        template defines none
+    """
+    raw = template_structure.get('sections') if isinstance(template_structure, dict) else template_structure
+    if not isinstance(raw, list):
+        raw = []
+    
+    sections = []
+    for section in raw:
+        name = _section_name(section).strip()
+        if not name:
+            continue
+        categories = section.get('categories', section.get('category')) if isinstance(section, dict) else None
+        if isinstance(categories, str):
+            categories = [categories]
+        if categories is None:
+            lowered = name.lower()
+            categories = [
+                category for category, keywords in SECTION_KEYWORDS.items()
+                if any(keyword in lowered for keyword in keywords)
+            ]
+        description = ' '.join(
+            str(section[key]) for key in ('description', 'instructions', 'prompt')
+            if isinstance(section, dict) and section.get(key)
+        )
+        sections.append({
+            'name': name,
+            'categories': [str(c).lower() for c in categories],
+            'query': f'{name} {description}'.strip(),
+        })
+    
+    return sections or [{**section, 'query': section['name']} for section in DEFAULT_SECTIONS]
+
+
+def _fact_line(fact: Dict[str, Any]) -> str:
+    """Prompt line for one fact"""
+    citation = f" ({fact['citation']})" if fact.get('citation') else ''
+    return f"- {fact['factText']}{citation}"
+
+
+def select_draft_facts(
+    facts: List[Dict[str, Any]],
+    template_structure: Any = None,
+    budget: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Pick the facts for a draft prompt and assign them to letter sections
+    
+    Args:
+        facts: Approved facts with factText and optional citation/category
+        template_structure: Template structure defining the letter sections
+        budget: Estimated token budget for all fact lines
+            (default DRAFT_FACT_TOKEN_BUDGET)
+            
+    Returns:
+        Dictionary with sections ({name, facts, lines} in template order,
+        facts kept in their original order) and stats
+    """
+    budget = DRAFT_FACT_TOKEN_BUDGET if budget is None else budget
+    sections = template_sections(template_structure)
+    
+    owner: Dict[str, int] = {}
+    for position, section in enumerate(sections):
+        for category in section['categories']:
+            owner.setdefault(category, position)
+    
+    unique = collapse_duplicates(facts)
+    candidates: List[List[tuple]] = [[] for _ in sections]
+    if unique:
+        embedder = TextEmbedder()
+        fact_vectors = embedder.fit_transform([fact['factText'] for fact in unique])
+        # Fact x section similarity, for facts no section claims by category
+        section_scores = fact_vectors @ embedder.transform([section['query'] for section in sections]).T
+    
+    for order, fact in enumerate(unique):
+        category = fact_category(fact)
+        position = owner.get(category)
+        if position is None:
+            # Unclaimed categories go to the most similar section, else the first
+            best = int(section_scores[order].argmax())
+            position = best if section_scores[order, best] > 0 else owner.get('other', 0)
+        line = _fact_line(fact)
+        rank = (CATEGORIES.index(category), not _SPECIFIC.search(fact['factText']), order)
+        candidates[position].append((rank, order, fact, line, estimate_tokens(line)))
+    
+    # Sections that claim no categories retrieve their top-k most similar facts
+    open_sections = [position for position, section in enumerate(sections) if not section['categories']]
+    if unique and open_sections and DRAFT_SECTION_TOP_K > 0:
+        index = VectorIndex()
+        index.add(fact_vectors)
+        queries = embedder.transform([sections[position]['query'] for position in open_sections])
+        scores, ids = index.search(queries, DRAFT_SECTION_TOP_K)
+        for position, row_scores, row_ids in zip(open_sections, scores, ids):
+            present = {item[1] for item in candidates[position]}
+            for score, order in zip(row_scores.tolist(), row_ids.tolist()):
+                if order < 0 or score < DRAFT_SECTION_MIN_SIMILARITY or order in present:
+                    continue
+                fact = unique[order]
+                line = _fact_line(fact)
+                candidates[position].append(((-1, -score, order), order, fact, line, estimate_tokens(line)))
+    
+    for queue in candidates:
+        queue.sort(key=lambda item: item[0])
+    
+    # Sections take turns so a budget overrun trims every section evenly
+    chosen: List[List[tuple]] = [[] for _ in sections]
+    used = 0
+    pending = [list(reversed(queue)) for queue in candidates]
+    while any(pending):
+        for position, queue in enumerate(pending):
+            while queue:
+                item = queue.pop()
+                if used + item[4] <= budget:
+                    chosen[position].append(item)
+                    used += item[4]
+                    break
+    
+    selected = []
+    for section, items in zip(sections, chosen):
+        items.sort(key=lambda item: item[1])
+        selected.append({
+            'name': section['name'],
+            'facts': [item[2] for item in items],
+            'lines': [item[3] for item in items],
+        })
+    
+    # Retrieved facts can appear in more than one section
+    kept = len({item[1] for items in chosen for item in items})
+    stats = {
+        'facts': len(facts),
+        'collapsed': len(facts) - len(unique),
+        'dropped': len(unique) - kept,
+        'kept': kept,
+        'tokens': used,
+    }
+    count('draft_facts_collapsed', stats['collapsed'])
+    count('draft_facts_dropped', stats['dropped'])
+    if stats['collapsed'] or stats['dropped']:
+        print(f"Draft facts: kept {kept} of {len(facts)} ({stats['collapsed']} duplicates, {stats['dropped']} over budget)")
+    return {'sections': selected, 'stats': stats}
@@ -0,0 +1,301 @@
+"""
+Background job queue for long-running operations
+
+Jobs are enqueued with a priority (lower runs first, e.g. PDF size in
+bytes so small PDFs are not stuck behind large ones) and processed by a
+bounded pool of worker threads in the web process. A queued job's priority
+improves by JOB_PRIORITY_AGING_PER_SECOND for every second it waits, so a
+steady stream of small PDFs cannot starve a large one. Failed attempts are
+retried with exponential backoff and jitter. Workers start with the web
+app, which also requeues jobs whose lease expired while the service was
+down. No external broker is needed:
+- memory: in-process queue, jobs are lost when the process restarts
+- postgres: ai_jobs table claimed with SKIP LOCKED, so several processes
+  can share it and jobs held by a crashed worker are reclaimed when their
+  lease expires
+"""
+
+import heapq
+import itertools
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from typing import Dict, Any, Callable, List, Optional
+
+from src.services.metrics import count, invocation
+
+JOB_QUEUE_BACKEND = os.getenv('JOB_QUEUE_BACKEND', 'memory').lower()
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', 2))
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', 3))
+JOB_RETRY_BASE_SECONDS = float(os.getenv('JOB_RETRY_BASE_SECONDS', 2))
+# Postgres jobs still running after this long are assumed lost and reclaimed
+JOB_LEASE_SECONDS = float(os.getenv('JOB_LEASE_SECONDS', 900))
+# How often idle workers look for new or due jobs they were not woken for
+JOB_POLL_SECONDS = float(os.getenv('JOB_POLL_SECONDS', 1))
+# Priority credit per second queued; the default lets a job jump ahead of
+# fresh jobs 1 MiB smaller for every second it has waited
+JOB_PRIORITY_AGING_PER_SECOND = float(os.getenv('JOB_PRIORITY_AGING_PER_SECOND', 1024 * 1024))
+# Finished jobs kept by the memory backend for status polling
+JOB_HISTORY = int(os.getenv('JOB_HISTORY', 1000))
+
+QUEUED, RUNNING, RETRYING, SUCCEEDED, FAILED = 'queued', 'running', 'retrying', 'succeeded', 'failed'
+
+
+class MemoryJobStore:
+    """Jobs held in process memory, ready jobs in a priority heap"""
+    
+    def __init__(self, history: int = JOB_HISTORY, aging_per_second: float = JOB_PRIORITY_AGING_PER_SECOND):
+        self.history = history
+        self.aging_per_second = aging_per_second
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._ready: List[tuple] = []
+        self._delayed: List[tuple] = []
+        self._finished: List[str] = []
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+    
+    def _rank(self, job: Dict[str, Any]) -> float:
+        # priority - aging * (now - created_at) orders jobs the same way at
+        # any moment, so the heap key never has to be recomputed
+        return job['priority'] + self.aging_per_second * job['created_at']
+    
+    def add(self, job: Dict[str, Any]) -> None:
+        with self._lock:
+            self._jobs[job['id']] = job
+            heapq.heappush(self._ready, (self._rank(job), next(self._sequence), job['id']))
+    
+    def claim(self) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            now = time.time()
+            while self._delayed and self._delayed[0][0] <= now:
+                _, job_id = heapq.heappop(self._delayed)
+                job = self._jobs[job_id]
+                heapq.heappush(self._ready, (self._rank(job), next(self._sequence), job_id))
+            if not self._ready:
+                return None
+            _, _, job_id = heapq.heappop(self._ready)
+            job = self._jobs[job_id]
+            job.update(status=RUNNING, attempts=job['attempts'] + 1, started_at=now)
+            return dict(job)
+    
+    def retry(self, job_id: str, error: str, delay: float) -> None:
+        with self._lock:
+            job = self._jobs[job_id]
+            job.update(status=RETRYING, error=error)
+            heapq.heappush(self._delayed, (time.time() + delay, job_id))
+    
+    def finish(self, job_id: str, status: str, result: Optional[Dict[str, Any]], error: Optional[str]) -> None:
+        with self._lock:
+            self._jobs[job_id].update(status=status, result=result, error=error, finished_at=time.time())
+            self._finished.append(job_id)
+            while len(self._finished) > self.history:
+                self._jobs.pop(self._finished.pop(0), None)
+    
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+    
+    def recover(self, max_attempts: int) -> Dict[str, int]:
+        """Nothing survives a restart in memory, so there is nothing to recover"""
+        return {'requeued': 0, 'failed': 0}
+    
+    def wait_seconds(self) -> float:
+        """Seconds until the next delayed job is due, at most JOB_POLL_SECONDS"""
+        with self._lock:
+            if not self._delayed:
+                return JOB_POLL_SECONDS
+            return max(0.0, min(JOB_POLL_SECONDS, self._delayed[0][0] - time.time()))
+
+
+class PostgresJobStore:
+    """Jobs stored in the ai_jobs table of the application database"""
+    
+    def __init__(self, aging_per_second: float = JOB_PRIORITY_AGING_PER_SECOND):
+        self.aging_per_second = aging_per_second
+    
+    def add(self, job: Dict[str, Any]) -> None:
+        from src.services.database_service import insert_job
+        insert_job(job)
+    
+    def claim(self) -> Optional[Dict[str, Any]]:
+        from src.services.database_service import claim_job
+        return claim_job(JOB_LEASE_SECONDS, self.aging_per_second)
+    
+    def retry(self, job_id: str, error: str, delay: float) -> None:
+        from src.services.database_service import retry_job
+        retry_job(job_id, error, delay)
+    
+    def finish(self, job_id: str, status: str, result: Optional[Dict[str, Any]], error: Optional[str]) -> None:
+        from src.services.database_service import finish_job
+        finish_job(job_id, status, result, error)
+    
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        from src.services.database_service import get_job
+        return get_job(job_id)
+    
+    def recover(self, max_attempts: int) -> Dict[str, int]:
+        from src.services.database_service import recover_expired_jobs
+        return recover_expired_jobs(max_attempts)
+    
+    def wait_seconds(self) -> float:
+        return JOB_POLL_SECONDS
+
+
+def retry_delay(attempt: int, base: float = JOB_RETRY_BASE_SECONDS) -> float:
+    """Exponential backoff with jitter before retry number attempt (1-based)"""
+    delay = base * 2 ** (attempt - 1)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+class JobQueue:
+    """
+    Priority job queue processed by a bounded pool of worker threads
+    
+    Handlers take a job payload and return a Lambda-style response. A
+    5xx status or an exception is retried up to max_attempts; a 4xx status
+    fails the job immediately.
+    """
+    
+    def __init__(
+        self,
+        store,
+        handlers: Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]],
+        workers: int = JOB_WORKERS,
+        max_attempts: int = JOB_MAX_ATTEMPTS,
+    ):
+        self.store = store
+        self.handlers = handlers
+        self.workers = max(1, workers)
+        self.max_attempts = max(1, max_attempts)
+        self._wakeup = threading.Condition()
+        self._threads: List[threading.Thread] = []
+        self._start_lock = threading.Lock()
+    
+    def enqueue(self, operation: str, payload: Dict[str, Any], priority: int = 0) -> Dict[str, Any]:
+        """
+        Queue a job and return immediately
+        
+        Args:
+            operation: Name of a registered handler
+            payload: Handler payload
+            priority: Lower values run first
+            
+        Returns:
+            The queued job record
+        """
+        if operation not in self.handlers:
+            raise ValueError(f'Unknown job operation: {operation}')
+        
+        job = {
+            'id': str(uuid.uuid4()),
+            'operation': operation,
+            'payload': payload,
+            'priority': int(priority),
+            'status': QUEUED,
+            'attempts': 0,
+            'result': None,
+            'error': None,
+            'created_at': time.time(),
+            'started_at': None,
+            'finished_at': None,
+        }
+        # Workers update the stored record, so the caller gets its own copy
+        self.store.add(dict(job))
+        self.start()
+        with self._wakeup:
+            self._wakeup.notify()
+        return job
+    
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Job record without its payload, or None if unknown"""
+        job = self.store.get(job_id)
+        if job is not None:
+            job.pop('payload', None)
+        return job
+    
+    def start(self) -> None:
+        """Requeue jobs lost in a restart and start the worker threads, once"""
+        if self._threads:
+            return
+        with self._start_lock:
+            if self._threads:
+                return
+            try:
+                recovered = self.store.recover(self.max_attempts)
+                if any(recovered.values()):
+                    print(f"[job_queue] Recovered expired jobs: {recovered['requeued']} requeued, {recovered['failed']} failed")
+            except Exception as e:
+                # Workers still reclaim expired leases as they poll
+                print(f'[job_queue] Recovering expired jobs failed: {str(e)}')
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f'job-worker-{index}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+    
+    def _work(self) -> None:
+        while True:
+            try:
+                job = self.store.claim()
+            except Exception as e:
+                print(f'[job_queue] Claiming a job failed: {str(e)}')
+                job = None
+            
+            if job is None:
+                with self._wakeup:
+                    self._wakeup.wait(self.store.wait_seconds())
+                continue
+            
+            try:
+                self._run(job)
+            except Exception as e:
+                # Store failures must not kill the worker
+                print(f"[job_queue] Recording job {job['id']} failed: {str(e)}")
+    
+    def _run(self, job: Dict[str, Any]) -> None:
+        job_id = job['id']
+        print(f"[job_queue] Running {job['operation']} job {job_id} (attempt {job['attempts']})")
+        
+        with invocation(job['operation']) as timing:
+            try:
+                response = self.handlers[job['operation']](job['payload'])
+                status_code = response.get('statusCode', 500)
+                body = response.get('body')
+                result = json.loads(body) if isinstance(body, str) else body
+                error = result.get('error') if isinstance(result, dict) else None
+            except Exception as e:
+                status_code, result, error = 500, None, str(e)
+            timing['status'] = status_code
+            
+            if status_code < 400:
+                self.store.finish(job_id, SUCCEEDED, result, None)
+            elif status_code < 500 or job['attempts'] >= self.max_attempts:
+                print(f"[job_queue] Job {job_id} failed: {error}")
+                count('job_failures')
+                self.store.finish(job_id, FAILED, result, error or f'Status {status_code}')
+            else:
+                delay = retry_delay(job['attempts'])
+                print(f"[job_queue] Job {job_id} failed, retrying in {delay:.1f}s: {error}")
+                count('job_retries')
+                self.store.retry(job_id, error or f'Status {status_code}', delay)
+
+
+def build_job_store(backend: str = JOB_QUEUE_BACKEND):
+    """
+    Build a job store from configuration
+    
+    Args:
+        backend: memory or postgres
+        
+    Returns:
+        Job store
+    """
+    backend = backend.lower()
+    if backend == 'memory':
+        return MemoryJobStore()
+    if backend == 'postgres':
+        return PostgresJobStore()
+    raise ValueError(f'Unknown job queue backend: {backend}')
@@ -0,0 +1,427 @@
+"""
+Shared scheduler for Anthropic API calls
+
+Every messages call takes a slot from one process-wide scheduler before it
+is sent:
+- token buckets cap requests per minute and input tokens per minute; their
+  rates follow the anthropic-ratelimit-* limit headers and their levels the
+  remaining headers, so several processes sharing one API key stay in step
+- concurrency adapts (AIMD): it grows by one per window of successful calls
+  (unless a remaining header runs low) and halves on a 429/529
+- 429, 529, 5xx and connection errors are retried with jittered exponential
+  backoff that honors retry-after; throttling that outlasts the retries
+  raises LLMThrottledError instead of turning into an empty result
+- waiting callers are served round-robin per invocation, so one large batch
+  cannot starve a draft request queued behind it
+"""
+
+import asyncio
+import inspect
+import os
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Dict, Any, Awaitable, Callable, Hashable, Optional, TypeVar
+
+from src.services.metrics import count, invocation_key
+
+LLM_SCHEDULER = os.getenv('LLM_SCHEDULER', 'true').lower() == 'true'
+# Starting limits; replaced by the limits the API reports in its headers
+LLM_REQUESTS_PER_MINUTE = int(os.getenv('LLM_REQUESTS_PER_MINUTE', 50))
+LLM_INPUT_TOKENS_PER_MINUTE = int(os.getenv('LLM_INPUT_TOKENS_PER_MINUTE', 50000))
+LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', 16))
+LLM_MIN_CONCURRENCY = int(os.getenv('LLM_MIN_CONCURRENCY', 1))
+LLM_MAX_RETRIES = int(os.getenv('LLM_MAX_RETRIES', 5))
+LLM_RETRY_BASE_SECONDS = float(os.getenv('LLM_RETRY_BASE_SECONDS', 1))
+LLM_RETRY_MAX_SECONDS = float(os.getenv('LLM_RETRY_MAX_SECONDS', 60))
+
+# Share of a limit left in the remaining headers below which concurrency stops growing
+_LOW_REMAINING_RATIO = 0.1
+# Status codes that mean "slow down" rather than "retry elsewhere"
+_THROTTLE_STATUSES = (429, 529)
+_RETRY_STATUSES = (429, 500, 502, 503, 504, 529)
+
+T = TypeVar('T')
+
+
+class LLMThrottledError(Exception):
+    """The API kept rate limiting or reporting overload after every retry"""
+
+
+class TokenBucket:
+    """Continuously refilled bucket holding at most one minute of allowance"""
+    
+    def __init__(self, per_minute: float):
+        self.per_minute = 0.0
+        self.level = 0.0
+        self.updated = time.monotonic()
+        self.set_rate(per_minute)
+        self.level = self.per_minute
+    
+    def set_rate(self, per_minute: float) -> None:
+        self._refill()
+        self.per_minute = float(per_minute)
+        self.level = min(self.level, self.per_minute)
+    
+    def _refill(self) -> None:
+        now = time.monotonic()
+        if self.per_minute > 0:
+            self.level = min(self.per_minute, self.level + (now - self.updated) * self.per_minute / 60)
+        self.updated = now
+    
+    def wait_seconds(self, amount: float) -> float:
+        """Seconds until amount is available (0 when it is now); unlimited buckets never wait"""
+        if self.per_minute <= 0:
+            return 0.0
+        self._refill()
+        amount = min(amount, self.per_minute)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) * 60 / self.per_minute
+    
+    def take(self, amount: float) -> None:
+        if self.per_minute > 0:
+            self._refill()
+            self.level -= min(amount, self.per_minute)
+    
+    def cap(self, remaining: float) -> None:
+        """Lower the level to what the server says is left"""
+        self._refill()
+        self.level = min(self.level, remaining)
+
+
+class _Waiter:
+    __slots__ = ('tokens', 'key', 'wake')
+    
+    def __init__(self, tokens: int, key: Hashable, wake: Callable[[], None]):
+        self.tokens = tokens
+        self.key = key
+        self.wake = wake
+
+
+def _header(headers: Any, *names: str) -> Optional[float]:
+    """First numeric header among names"""
+    if headers is None:
+        return None
+    for name in names:
+        value = headers.get(name)
+        if value is not None:
+            try:
+                return float(value)
+            except ValueError:
+                pass
+    return None
+
+
+def _retry_after(headers: Any) -> Optional[float]:
+    milliseconds = _header(headers, 'retry-after-ms')
+    if milliseconds is not None:
+        return milliseconds / 1000
+    return _header(headers, 'retry-after')
+
+
+class LLMScheduler:
+    """Process-wide admission control for LLM calls, usable from threads and event loops"""
+    
+    def __init__(
+        self,
+        requests_per_minute: float = LLM_REQUESTS_PER_MINUTE,
+        input_tokens_per_minute: float = LLM_INPUT_TOKENS_PER_MINUTE,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        min_concurrency: int = LLM_MIN_CONCURRENCY,
+        max_retries: int = LLM_MAX_RETRIES,
+    ):
+        self.requests = TokenBucket(requests_per_minute)
+        self.input_tokens = TokenBucket(input_tokens_per_minute)
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_concurrency = max(1, min(min_concurrency, self.max_concurrency))
+        self.max_retries = max_retries
+        # Start in the middle so the first burst probes instead of stampeding
+        self.concurrency = float(max(self.min_concurrency, self.max_concurrency // 2))
+        self.active = 0
+        self.paused_until = 0.0
+        self.stats = {'calls': 0, 'retries': 0, 'throttled': 0, 'failed': 0, 'queued_seconds': 0.0}
+        self._queues: 'OrderedDict[Hashable, deque]' = OrderedDict()
+        self._lock = threading.Lock()
+    
+    # --- admission ---------------------------------------------------------
+    
+    def _head(self) -> Optional[_Waiter]:
+        for queue in self._queues.values():
+            return queue[0]
+        return None
+    
+    def _enqueue(self, waiter: _Waiter) -> None:
+        with self._lock:
+            self._queues.setdefault(waiter.key, deque()).append(waiter)
+            if self._head() is waiter:
+                waiter.wake()
+    
+    def _remove(self, waiter: _Waiter) -> None:
+        """Drop a waiter that gave up (e.g. a cancelled task) and wake the next one"""
+        with self._lock:
+            queue = self._queues.get(waiter.key)
+            if queue is not None and waiter in queue:
+                queue.remove(waiter)
+                if not queue:
+                    del self._queues[waiter.key]
+            self._wake_head()
+    
+    def _wake_head(self) -> None:
+        head = self._head()
+        if head is not None:
+            head.wake()
+    
+    def _attempt(self, waiter: _Waiter) -> Optional[float]:
+        """
+        Admit the waiter if it is next and capacity allows
+        
+        Returns None once admitted, otherwise seconds to wait before trying
+        again (infinity when only another waiter or a release can help).
+        """
+        with self._lock:
+            if self._head() is not waiter:
+                return float('inf')
+            now = time.monotonic()
+            if now < self.paused_until:
+                return self.paused_until - now
+            if self.active >= int(self.concurrency):
+                return float('inf')
+            wait = max(self.requests.wait_seconds(1), self.input_tokens.wait_seconds(waiter.tokens))
+            if wait > 0:
+                return wait
+            
+            self.requests.take(1)
+            self.input_tokens.take(waiter.tokens)
+            self.active += 1
+            queue = self._queues[waiter.key]
+            queue.popleft()
+            # Round-robin: the next turn goes to the following caller
+            del self._queues[waiter.key]
+            if queue:
+                self._queues[waiter.key] = queue
+            self._wake_head()
+            return None
+    
+    def acquire(self, tokens: int, key: Hashable = None) -> None:
+        """Block the calling thread until a call with this many input tokens may start"""
+        event = threading.Event()
+        waiter = _Waiter(tokens, key if key is not None else invocation_key(), event.set)
+        started = time.monotonic()
+        self._enqueue(waiter)
+        try:
+            while True:
+                event.clear()
+                wait = self._attempt(waiter)
+                if wait is None:
+                    break
+                event.wait(None if wait == float('inf') else wait)
+        except BaseException:
+            self._remove(waiter)
+            raise
+        self._record_wait(started)
+    
+    async def acquire_async(self, tokens: int, key: Hashable = None) -> None:
+        """Wait without blocking the event loop until a call may start"""
+        loop = asyncio.get_running_loop()
+        event = asyncio.Event()
+        waiter = _Waiter(tokens, key if key is not None else invocation_key(), lambda: loop.call_soon_threadsafe(event.set))
+        started = time.monotonic()
+        self._enqueue(waiter)
+        try:
+            while True:
+                event.clear()
+                wait = self._attempt(waiter)
+                if wait is None:
+                    break
+                try:
+                    await asyncio.wait_for(event.wait(), None if wait == float('inf') else wait)
+                except asyncio.TimeoutError:
+                    pass
+        except BaseException:
+            self._remove(waiter)
+            raise
+        self._record_wait(started)
+    
+    def _record_wait(self, started: float) -> None:
+        waited = time.monotonic() - started
+        with self._lock:
+            self.stats['calls'] += 1
+            self.stats['queued_seconds'] += waited
+        count('llm_queued_ms', round(waited * 1000, 2))
+    
+    # --- feedback ----------------------------------------------------------
+    
+    def _observe(self, headers: Any) -> bool:
+        """Follow the rate-limit headers; returns True when a remaining count runs low"""
+        low = False
+        for bucket, limit_names, remaining_names in (
+            (
+                self.requests,
+                ('anthropic-ratelimit-requests-limit',),
+                ('anthropic-ratelimit-requests-remaining',),
+            ),
+            (
+                self.input_tokens,
+                ('anthropic-ratelimit-input-tokens-limit', 'anthropic-ratelimit-tokens-limit'),
+                ('anthropic-ratelimit-input-tokens-remaining', 'anthropic-ratelimit-tokens-remaining'),
+            ),
+        ):
+            limit = _header(headers, *limit_names)
+            remaining = _header(headers, *remaining_names)
+            if limit and limit != bucket.per_minute:
+                bucket.set_rate(limit)
+            if remaining is not None:
+                bucket.cap(remaining)
+                if limit and remaining < limit * _LOW_REMAINING_RATIO:
+                    low = True
+        return low
+    
+    def release(self, headers: Any = None) -> None:
+        """Finish a successful call, growing concurrency unless the server is running low"""
+        with self._lock:
+            self.active -= 1
+            # Near the limit the buckets do the pacing, so hold concurrency steady
+            if not self._observe(headers):
+                # Additive increase: about one more slot per window of successful calls
+                self.concurrency = min(self.max_concurrency, self.concurrency + 1 / max(1.0, self.concurrency))
+            self._wake_head()
+    
+    def release_error(self, error: BaseException, attempt: int) -> Optional[float]:
+        """
+        Finish a failed call
+        
+        Args:
+            error: Exception raised by the call
+            attempt: Zero-based attempt number of the call
+            
+        Returns:
+            Seconds to wait before retrying, or None when the error should be raised
+        """
+        status = getattr(error, 'status_code', None)
+        response = getattr(error, 'response', None)
+        headers = getattr(response, 'headers', None)
+        retryable = status in _RETRY_STATUSES or (status is None and _is_connection_error(error))
+        
+        with self._lock:
+            self.active -= 1
+            self._observe(headers)
+            delay = None
+            if retryable and attempt < self.max_retries:
+                backoff = min(LLM_RETRY_MAX_SECONDS, LLM_RETRY_BASE_SECONDS * 2 ** attempt)
+                delay = backoff / 2 + random.uniform(0, backoff / 2)
+            if status in _THROTTLE_STATUSES:
+                self.stats['throttled'] += 1
+                # Multiplicative decrease, and every caller holds off until retry-after
+                self.concurrency = max(self.min_concurrency, self.concurrency / 2)
+                retry_after = _retry_after(headers)
+                if retry_after is not None:
+                    if delay is not None:
+                        delay = max(delay, retry_after)
+                    self.paused_until = max(self.paused_until, time.monotonic() + min(retry_after, LLM_RETRY_MAX_SECONDS))
+            if delay is not None:
+                self.stats['retries'] += 1
+            else:
+                self.stats['failed'] += 1
+            self._wake_head()
+        
+        if status in _THROTTLE_STATUSES:
+            count('llm_throttled')
+        if delay is not None:
+            count('llm_retries')
+        return delay
+    
+    # --- calls ---------------------------------------------------------------
+    
+    def call(self, request: Callable[[], T], tokens: int, key: Hashable = None) -> T:
+        """
+        Run a sync API call under the scheduler, retrying retryable errors
+        
+        Args:
+            request: Makes the call and returns a raw response (with headers and parse())
+            tokens: Estimated input tokens of the request
+            key: Caller key for fair queueing (default: current invocation)
+            
+        Returns:
+            The parsed response
+        """
+        attempt = 0
+        while True:
+            self.acquire(tokens, key)
+            try:
+                raw = request()
+            except Exception as e:
+                delay = self.release_error(e, attempt)
+                if delay is None:
+                    raise _final_error(e)
+                time.sleep(delay)
+                attempt += 1
+                continue
+            except BaseException:
+                self.release()
+                raise
+            self.release(raw.headers)
+            return raw.parse()
+    
+    async def call_async(self, request: Callable[[], Awaitable[Any]], tokens: int, key: Hashable = None) -> Any:
+        """Async version of call; request returns an awaitable raw response"""
+        attempt = 0
+        while True:
+            await self.acquire_async(tokens, key)
+            try:
+                raw = await request()
+            except Exception as e:
+                delay = self.release_error(e, attempt)
+                if delay is None:
+                    raise _final_error(e)
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            except BaseException:
+                self.release()
+                raise
+            self.release(raw.headers)
+            parsed = raw.parse()
+            # The async SDK's raw responses parse asynchronously
+            return await parsed if inspect.isawaitable(parsed) else parsed
+    
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self.stats,
+                'queued_seconds': round(self.stats['queued_seconds'], 3),
+                'active': self.active,
+                'waiting': sum(len(queue) for queue in self._queues.values()),
+                'concurrency': round(self.concurrency, 2),
+                'requests_per_minute': self.requests.per_minute,
+                'input_tokens_per_minute': self.input_tokens.per_minute,
+            }
+
+
+def _is_connection_error(error: BaseException) -> bool:
+    from anthropic import APIConnectionError
+    return isinstance(error, APIConnectionError)
+
+
+def _final_error(error: Exception) -> Exception:
+    """Error to raise once a call gives up"""
+    if getattr(error, 'status_code', None) in _THROTTLE_STATUSES:
+        throttled = LLMThrottledError(f'Anthropic API still throttling after retries: {str(error)}')
+        throttled.__cause__ = error
+        return throttled
+    return error
+
+
+_scheduler: Optional[LLMScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_llm_scheduler() -> LLMScheduler:
+    """Return the process-wide scheduler, creating it on first use"""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = LLMScheduler()
+    return _scheduler
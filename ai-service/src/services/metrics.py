@@ -0,0 +1,200 @@
+"""
+Hot-path latency instrumentation
+
+Handlers wrap each invocation in `invocation()` and each stage in
+`stage()`. Timings and counters are exported as Prometheus metrics when
+prometheus_client is installed, and can also be printed as one JSON
+timing record per invocation (the default on Lambda).
+"""
+
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, Iterator, Optional
+
+METRICS_JSON_LOG = os.getenv(
+    'METRICS_JSON_LOG',
+    'true' if os.getenv('AWS_LAMBDA_FUNCTION_NAME') else 'false',
+).lower() == 'true'
+
+# Timing record of the invocation running in the current context
+_current: contextvars.ContextVar[Optional[Dict[str, Any]]] = contextvars.ContextVar('metrics_invocation', default=None)
+
+_prometheus = None
+_prometheus_lock = threading.Lock()
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def _metrics():
+    """Create Prometheus metrics on first use; None if prometheus_client is missing"""
+    global _prometheus
+    if _prometheus is None:
+        with _prometheus_lock:
+            if _prometheus is None:
+                try:
+                    from prometheus_client import Counter, Histogram
+                except ImportError:
+                    _prometheus = False
+                    return None
+                _prometheus = {
+                    'invocation': Histogram(
+                        'ai_service_invocation_seconds', 'End-to-end handler latency',
+                        ['operation', 'status'], buckets=LATENCY_BUCKETS,
+                    ),
+                    'stage': Histogram(
+                        'ai_service_stage_seconds', 'Latency of one handler stage',
+                        ['operation', 'stage'], buckets=LATENCY_BUCKETS,
+                    ),
+                    'pdf_bytes': Histogram(
+                        'ai_service_pdf_bytes', 'Size of processed PDFs',
+                        buckets=(1e4, 1e5, 1e6, 5e6, 1e7, 5e7, 1e8, 5e8),
+                    ),
+                    'pdf_pages': Histogram(
+                        'ai_service_pdf_pages', 'Page count of processed PDFs',
+                        buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000, 2000),
+                    ),
+                    'tokens': Counter(
+                        'ai_service_llm_tokens_total', 'Anthropic tokens used',
+                        ['operation', 'kind'],
+                    ),
+                    'cache': Counter(
+                        'ai_service_cache_lookups_total', 'Cache lookups by result',
+                        ['cache', 'result'],
+                    ),
+                }
+    return _prometheus or None
+
+
+def _operation() -> str:
+    record = _current.get()
+    return record['operation'] if record else 'unknown'
+
+
+@contextmanager
+def invocation(operation: str) -> Iterator[Dict[str, Any]]:
+    """
+    Time one handler invocation
+    
+    Yields the timing record; set record['status'] to the response status code.
+    """
+    record = {
+        'operation': operation,
+        'status': 200,
+        'stages_ms': {},
+        'counters': {},
+    }
+    token = _current.set(record)
+    start = time.perf_counter()
+    try:
+        yield record
+    except Exception:
+        record['status'] = 500
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        _current.reset(token)
+        record['duration_ms'] = round(elapsed * 1000, 2)
+        
+        metrics = _metrics()
+        if metrics:
+            metrics['invocation'].labels(operation, str(record['status'])).observe(elapsed)
+        if METRICS_JSON_LOG:
+            print(json.dumps({'type': 'timing', **record}))
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time one stage of the current invocation"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        record = _current.get()
+        if record is not None:
+            stages = record['stages_ms']
+            stages[name] = round(stages.get(name, 0) + elapsed * 1000, 2)
+        
+        metrics = _metrics()
+        if metrics:
+            metrics['stage'].labels(_operation(), name).observe(elapsed)
+
+
+def invocation_key() -> Optional[int]:
+    """Identity of the current invocation, e.g. to group the work it queues"""
+    record = _current.get()
+    return id(record) if record is not None else None
+
+
+def count(name: str, value: float = 1) -> None:
+    """Add to a named counter on the current invocation record"""
+    record = _current.get()
+    if record is not None:
+        counters = record['counters']
+        counters[name] = counters.get(name, 0) + value
+
+
+def record_pdf(size_bytes: Optional[int], page_count: Optional[int]) -> None:
+    """Record the size and page count of a processed PDF"""
+    metrics = _metrics()
+    if size_bytes is not None:
+        count('pdf_bytes', size_bytes)
+        if metrics:
+            metrics['pdf_bytes'].observe(size_bytes)
+    if page_count is not None:
+        count('pdf_pages', page_count)
+        if metrics:
+            metrics['pdf_pages'].observe(page_count)
+
+
+# Metric kind -> Anthropic usage field
+TOKEN_KINDS = (
+    ('prompt', 'input_tokens'),
+    ('completion', 'output_tokens'),
+    ('cache_read', 'cache_read_input_tokens'),
+    ('cache_write', 'cache_creation_input_tokens'),
+)
+
+
+def usage_dict(usage: Any) -> Dict[str, int]:
+    """Token counts from an Anthropic usage object, including prompt cache reads and writes"""
+    return {attr: getattr(usage, attr, None) or 0 for _, attr in TOKEN_KINDS}
+
+
+def record_tokens(usage: Any) -> None:
+    """Record prompt, completion and prompt-cache tokens from an Anthropic usage object"""
+    if usage is None:
+        return
+    metrics = _metrics()
+    for kind, attr in TOKEN_KINDS:
+        tokens = getattr(usage, attr, None) or 0
+        count(f'{kind}_tokens', tokens)
+        if metrics and tokens:
+            metrics['tokens'].labels(_operation(), kind).inc(tokens)
+
+
+def invocation_usage() -> Dict[str, int]:
+    """Tokens recorded so far by the current invocation, keyed like Anthropic usage"""
+    record = _current.get()
+    counters = record['counters'] if record else {}
+    return {attr: counters.get(f'{kind}_tokens', 0) for kind, attr in TOKEN_KINDS}
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    """Record one cache lookup"""
+    count(f'{cache}_hits' if hit else f'{cache}_misses')
+    metrics = _metrics()
+    if metrics:
+        metrics['cache'].labels(cache, 'hit' if hit else 'miss').inc()
+
+
+def render_prometheus() -> Optional[tuple]:
+    """Return (body, content type) in Prometheus text format, or None if unavailable"""
+    if not _metrics():
+        return None
+    from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+    return generate_latest(), CONTENT_TYPE_LATEST
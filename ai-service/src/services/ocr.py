@@ -0,0 +1,273 @@
+"""
+OCR fallback for scanned PDF pages
+
+Pages whose text layer yields fewer than OCR_MIN_CHARS characters (scanned
+ER records, faxed bills) are rasterized with PDFium at OCR_DPI and read by
+a local Tesseract binary. Only those pages are rendered, in a process pool,
+and results are cached by page content digest so a page scanned into
+several uploads is OCRed once.
+
+OCR_DPI trades speed for accuracy: render and OCR time grow with the pixel
+count, so 300 DPI costs roughly twice 200 DPI; 150 is enough for clean
+typed records.
+"""
+
+import io
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Union
+
+from src.services.cache_service import build_cache
+from src.services.metrics import count
+from src.services.page_hash import page_digest
+from src.services.pdf_engines import is_available, open_pdf_reader
+
+# auto enables OCR when the tesseract binary and pypdfium2 are installed
+PDF_OCR = os.getenv('PDF_OCR', 'auto').lower()
+OCR_TESSERACT_CMD = os.getenv('OCR_TESSERACT_CMD', 'tesseract')
+OCR_LANGUAGE = os.getenv('OCR_LANGUAGE', 'eng')
+OCR_DPI = int(os.getenv('OCR_DPI', 200))
+# Tesseract page segmentation mode; 3 is automatic layout analysis
+OCR_PAGE_SEGMENTATION = int(os.getenv('OCR_PAGE_SEGMENTATION', 3))
+# Pages with less extracted text than this are OCRed
+OCR_MIN_CHARS = int(os.getenv('OCR_MIN_CHARS', 20))
+OCR_WORKERS = int(os.getenv('OCR_WORKERS', os.cpu_count() or 1))
+OCR_TIMEOUT_SECONDS = float(os.getenv('OCR_TIMEOUT_SECONDS', 120))
+
+OCR_CACHE_BACKEND = os.getenv('OCR_CACHE_BACKEND', 'memory')
+OCR_CACHE_MAX_BYTES = int(os.getenv('OCR_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+OCR_CACHE_DIR = os.getenv(
+    'OCR_CACHE_DIR',
+    os.path.join(tempfile.gettempdir(), 'demand-letter-ocr-cache'),
+)
+OCR_CACHE_TABLE = 'pdf_ocr_cache'
+
+_cache = None
+_cache_built = False
+_warned_unavailable = False
+
+# PDF bytes or path and the PDFium document held by each pool worker
+_worker_pdf_source: Optional[Union[bytes, str]] = None
+_worker_document = None
+
+
+def get_ocr_cache():
+    """Return the configured OCR cache, building it on first use"""
+    global _cache, _cache_built
+    if not _cache_built:
+        _cache = build_cache(
+            'ocr_cache',
+            OCR_CACHE_BACKEND,
+            OCR_CACHE_MAX_BYTES,
+            OCR_CACHE_DIR,
+            OCR_CACHE_TABLE,
+        )
+        _cache_built = True
+    return _cache
+
+
+def get_ocr_cache_stats() -> Dict[str, Any]:
+    """Return hit/miss counters for the OCR cache"""
+    cache = get_ocr_cache()
+    if cache is None:
+        return {'backend': 'none'}
+    return {'backend': OCR_CACHE_BACKEND, **cache.stats.as_dict()}
+
+
+@lru_cache(maxsize=1)
+def tesseract_version() -> Optional[str]:
+    """Installed Tesseract version, or None when it is not installed"""
+    if shutil.which(OCR_TESSERACT_CMD) is None:
+        return None
+    try:
+        output = subprocess.run(
+            [OCR_TESSERACT_CMD, '--version'], capture_output=True, text=True, timeout=10
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    # Older releases print the version to stderr
+    lines = (output.stdout or output.stderr).split()
+    return lines[1] if len(lines) > 1 else 'unknown'
+
+
+def _missing_components() -> List[str]:
+    """What is missing to OCR here: the tesseract binary and/or pypdfium2"""
+    missing = []
+    if tesseract_version() is None:
+        missing.append(f'tesseract ({OCR_TESSERACT_CMD})')
+    if not is_available('pdfium'):
+        missing.append('pypdfium2')
+    return missing
+
+
+def ocr_available() -> bool:
+    """Whether pages can be rasterized and OCRed here"""
+    return not _missing_components()
+
+
+def ocr_enabled() -> bool:
+    """Whether extraction should OCR text-less pages"""
+    global _warned_unavailable
+    if PDF_OCR == 'false':
+        return False
+    if ocr_available():
+        return True
+    if PDF_OCR == 'true' and not _warned_unavailable:
+        print(f"[ocr] WARNING: PDF_OCR=true but {' and '.join(_missing_components())} not installed, skipping OCR")
+        _warned_unavailable = True
+    return False
+
+
+def report_skipped_pages(pages: int) -> None:
+    """Warn that pages without a text layer were left empty because OCR is unavailable"""
+    if pages and PDF_OCR != 'false':
+        print(
+            f"[ocr] WARNING: {pages} pages have no text layer and were not OCRed: "
+            f"{' and '.join(_missing_components())} not installed"
+        )
+        count('ocr_skipped_pages', pages)
+
+
+def ocr_version() -> Optional[str]:
+    """Tag for OCR output under the current settings, None when OCR is off"""
+    if not ocr_enabled():
+        return None
+    return f'tesseract-{tesseract_version()}:{OCR_LANGUAGE}:psm{OCR_PAGE_SEGMENTATION}:{OCR_DPI}dpi'
+
+
+def needs_ocr(text: str) -> bool:
+    """Whether extracted page text is too short to be a real text layer"""
+    return len(text.strip()) < OCR_MIN_CHARS
+
+
+def _init_worker(pdf_source: Union[bytes, str]) -> None:
+    """Store the PDF buffer or path in a pool worker so it is sent once per process"""
+    global _worker_pdf_source, _worker_document
+    _worker_pdf_source = pdf_source
+    _worker_document = None
+
+
+def _ocr_page(index: int) -> Dict[str, Any]:
+    """Pool task: rasterize one page of the worker's PDF and OCR it"""
+    global _worker_document
+    import pypdfium2
+    
+    if _worker_document is None:
+        _worker_document = pypdfium2.PdfDocument(_worker_pdf_source)
+    
+    start = time.perf_counter()
+    page = _worker_document[index]
+    try:
+        bitmap = page.render(scale=OCR_DPI / 72, grayscale=True)
+        image = bitmap.to_pil()
+    finally:
+        page.close()
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG', compress_level=1)
+    rendered = time.perf_counter()
+    
+    output = subprocess.run(
+        [
+            OCR_TESSERACT_CMD, 'stdin', 'stdout',
+            '-l', OCR_LANGUAGE,
+            '--psm', str(OCR_PAGE_SEGMENTATION),
+            '--dpi', str(OCR_DPI),
+        ],
+        input=buffer.getvalue(),
+        capture_output=True,
+        timeout=OCR_TIMEOUT_SECONDS,
+        # One thread per page; the pool provides the parallelism
+        env={**os.environ, 'OMP_THREAD_LIMIT': '1'},
+    )
+    if output.returncode != 0:
+        raise RuntimeError(output.stderr.decode(errors='replace').strip() or f'tesseract exited {output.returncode}')
+    done = time.perf_counter()
+    
+    return {
+        'text': output.stdout.decode(errors='replace').strip(),
+        'render_ms': round((rendered - start) * 1000, 1),
+        'ocr_ms': round((done - rendered) * 1000, 1),
+    }
+
+
+def ocr_pages(
+    pdf_source: Union[bytes, str],
+    indexes: List[int],
+    workers: Optional[int] = None,
+    reader: Any = None,
+) -> Dict[int, Dict[str, Any]]:
+    """
+    OCR the given pages of a PDF
+    
+    Args:
+        pdf_source: PDF bytes, or a file path each worker re-opens
+        indexes: Zero-based page indexes to OCR
+        workers: Worker processes (default OCR_WORKERS)
+        reader: Open pypdf reader over the same PDF, to skip re-parsing it
+        
+    Returns:
+        Zero-based index -> {text, cached, render_ms, ocr_ms}; pages that
+        failed to OCR are left out
+    """
+    if not indexes:
+        return {}
+    
+    reader = reader or open_pdf_reader(pdf_source)
+    shared: Dict[Any, bytes] = {}
+    tag = ocr_version()
+    keys = {index: f'{tag}:{page_digest(reader.pages[index], shared).hex()}' for index in indexes}
+    
+    cache = get_ocr_cache()
+    results: Dict[int, Dict[str, Any]] = {}
+    missing = []
+    for index in indexes:
+        entry = cache.get(keys[index]) if cache is not None else None
+        if entry is not None:
+            results[index] = {'text': entry['text'], 'cached': True, 'render_ms': 0.0, 'ocr_ms': 0.0}
+        else:
+            missing.append(index)
+    
+    workers = min(workers or OCR_WORKERS, len(missing))
+    if workers > 1:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(pdf_source,),
+        ) as executor:
+            futures = {index: executor.submit(_ocr_page, index) for index in missing}
+            outcomes = {}
+            for index, future in futures.items():
+                try:
+                    outcomes[index] = future.result()
+                except Exception as e:
+                    outcomes[index] = e
+    else:
+        _init_worker(pdf_source)
+        outcomes = {}
+        try:
+            for index in missing:
+                try:
+                    outcomes[index] = _ocr_page(index)
+                except Exception as e:
+                    outcomes[index] = e
+        finally:
+            if _worker_document is not None:
+                _worker_document.close()
+            _init_worker(None)
+    
+    for index, outcome in outcomes.items():
+        if isinstance(outcome, Exception):
+            print(f'[ocr] Page {index + 1} failed: {str(outcome)}')
+            count('ocr_failures')
+            continue
+        results[index] = {**outcome, 'cached': False}
+        if cache is not None:
+            cache.set(keys[index], {'text': outcome['text']})
+    
+    count('ocr_pages', len(missing))
+    return results
@@ -0,0 +1,116 @@
+"""
+Content digests of PDF pages
+
+A page's digest covers its geometry, raw content streams and the fonts,
+images and form XObjects it draws with, hashed still encoded so no stream
+is decompressed. Two pages with the same digest render the same, so the
+digest keys per-page work such as incremental extraction and OCR.
+"""
+
+import hashlib
+from typing import Any, Dict
+
+from pypdf.generic import ArrayObject, DictionaryObject, IndirectObject, StreamObject
+
+# Form XObjects can nest; deeper resources are rare and not worth the walk
+_MAX_RESOURCE_DEPTH = 3
+# Nesting followed when serializing font and page attributes
+_MAX_VALUE_DEPTH = 8
+
+
+def _stream_bytes(stream: StreamObject) -> bytes:
+    """Raw stream bytes; hashing them still encoded skips decompression"""
+    data = getattr(stream, '_data', None)
+    return data if data is not None else stream.get_data()
+
+
+def _serialize(value: Any, depth: int = 0) -> str:
+    """
+    Stable text form of a PDF value
+    
+    Indirect references are resolved rather than printed: their repr names
+    the reader object, so it differs each time the same file is opened.
+    """
+    if depth > _MAX_VALUE_DEPTH:
+        return '...'
+    if isinstance(value, IndirectObject):
+        value = value.get_object()
+    if isinstance(value, StreamObject):
+        return 'stream:' + hashlib.sha256(_stream_bytes(value)).hexdigest()
+    if isinstance(value, DictionaryObject):
+        items = (f'{key}={_serialize(value.raw_get(key), depth + 1)}' for key in sorted(value))
+        return '<<' + ' '.join(items) + '>>'
+    if isinstance(value, ArrayObject):
+        return '[' + ' '.join(_serialize(item, depth + 1) for item in value) + ']'
+    return repr(value)
+
+
+def _object_digest(ref: Any, shared: Dict[Any, bytes], depth: int) -> bytes:
+    """Digest of a font or XObject, memoized per indirect object since pages share them"""
+    key = (ref.idnum, ref.generation) if isinstance(ref, IndirectObject) else None
+    if key is not None and key in shared:
+        return shared[key]
+    
+    obj = ref.get_object()
+    digest = hashlib.sha256()
+    if isinstance(obj, DictionaryObject):
+        for name in ('/Subtype', '/BaseFont', '/Encoding', '/FirstChar', '/Widths', '/Width', '/Height'):
+            digest.update(_serialize(obj.get(name)).encode())
+        to_unicode = obj.get('/ToUnicode')
+        if to_unicode is not None:
+            digest.update(_stream_bytes(to_unicode.get_object()))
+        if isinstance(obj, StreamObject):
+            # Image bytes matter too: a scanned page's text only exists in its image
+            digest.update(_stream_bytes(obj))
+            if obj.get('/Subtype') != '/Image':
+                digest.update(_resources_digest(obj.get('/Resources'), shared, depth + 1))
+    
+    value = digest.digest()
+    if key is not None:
+        shared[key] = value
+    return value
+
+
+def _resources_digest(resources: Any, shared: Dict[Any, bytes], depth: int = 0) -> bytes:
+    """Digest of the fonts and XObjects in a resource dictionary"""
+    if resources is None or depth > _MAX_RESOURCE_DEPTH:
+        return b''
+    resources = resources.get_object()
+    digest = hashlib.sha256()
+    for category in ('/Font', '/XObject'):
+        entries = resources.get(category)
+        if entries is None:
+            continue
+        entries = entries.get_object()
+        for name in sorted(entries):
+            digest.update(name.encode())
+            digest.update(_object_digest(entries.raw_get(name), shared, depth))
+    return digest.digest()
+
+
+def page_digest(page: Any, shared: Dict[Any, bytes]) -> bytes:
+    """
+    Digest of one pypdf page
+    
+    Args:
+        page: pypdf page object
+        shared: Memo of digests of objects shared between pages, reused
+            across the pages of one document
+            
+    Returns:
+        SHA-256 digest bytes
+    """
+    digest = hashlib.sha256()
+    # The properties resolve boxes and rotation inherited from the page tree
+    for value in (page.mediabox, page.cropbox, page.rotation):
+        digest.update(_serialize(value).encode())
+    
+    contents = page.get('/Contents')
+    if contents is not None:
+        contents = contents.get_object()
+        streams = contents if isinstance(contents, ArrayObject) else [contents]
+        for stream in streams:
+            digest.update(_stream_bytes(stream.get_object()))
+    
+    digest.update(_resources_digest(page.get('/Resources'), shared))
+    return digest.digest()
@@ -0,0 +1,233 @@
+"""
+Pluggable PDF text extraction engines
+
+Each engine opens a PDF source and returns a document exposing page_count,
+page_text(index) and close(). Available engines:
+- pypdf: pure Python, always installed
+- pdfplumber: layout-preserving text, keeps table columns in medical bills
+- pdfium: pypdfium2 (C-backed PDFium), much faster when installed
+
+pypdf is the default. "auto" is opt-in and picks an engine per document
+from cheap heuristics, see choose_engine.
+"""
+
+import importlib.util
+import io
+import os
+import re
+import textwrap
+from importlib import metadata
+from typing import Any, BinaryIO, List, Optional, Union
+
+import pypdf
+
+PDF_EXTRACT_ENGINE = os.getenv('PDF_EXTRACT_ENGINE', 'pypdf').lower()
+# auto uses pdfplumber only for short documents that look tabular
+PDF_LAYOUT_MAX_PAGES = int(os.getenv('PDF_LAYOUT_MAX_PAGES', 10))
+PDF_LAYOUT_MIN_TABULAR_RATIO = float(os.getenv('PDF_LAYOUT_MIN_TABULAR_RATIO', 0.3))
+
+# Bump when the auto heuristics change so cached results are not reused
+AUTO_SELECTION_VERSION = 1
+
+PdfSource = Union[bytes, str, BinaryIO, pypdf.PdfReader]
+
+_AMOUNT = re.compile(r'\$\s?\d[\d,]*(\.\d{2})?')
+_NUMBER = re.compile(r'\b\d[\d,./-]*\b')
+
+
+def open_pdf_reader(source: PdfSource) -> pypdf.PdfReader:
+    """
+    Open a PDF reader without copying the source into memory again
+    
+    Args:
+        source: PDF bytes, file path, binary file object or an open reader
+        
+    Returns:
+        PDF reader over the source
+    """
+    if isinstance(source, pypdf.PdfReader):
+        return source
+    if isinstance(source, (bytes, bytearray)):
+        return pypdf.PdfReader(io.BytesIO(source))
+    # pypdf reads paths and file objects lazily
+    return pypdf.PdfReader(source)
+
+
+class PypdfDocument:
+    """pypdf reader wrapped in the engine document interface"""
+    
+    engine = 'pypdf'
+    
+    def __init__(self, source: PdfSource):
+        self.reader = open_pdf_reader(source)
+        self.page_count = len(self.reader.pages)
+    
+    def page_text(self, index: int) -> str:
+        return self.reader.pages[index].extract_text()
+    
+    def close(self) -> None:
+        pass
+
+
+class PdfplumberDocument:
+    """pdfplumber document extracting text with its layout preserved"""
+    
+    engine = 'pdfplumber'
+    
+    def __init__(self, source: PdfSource):
+        import pdfplumber
+        if isinstance(source, (bytes, bytearray)):
+            source = io.BytesIO(source)
+        self.pdf = pdfplumber.open(source)
+        self.page_count = len(self.pdf.pages)
+    
+    def page_text(self, index: int) -> str:
+        page = self.pdf.pages[index]
+        try:
+            text = page.extract_text(layout=True)
+        finally:
+            # Drop the page's parsed objects so long documents stay bounded
+            page.close()
+        # Layout mode pads every line to the page width and keeps the margin
+        lines = [line.rstrip() for line in text.splitlines()]
+        return textwrap.dedent('\n'.join(lines)).strip('\n')
+    
+    def close(self) -> None:
+        self.pdf.close()
+
+
+class PdfiumDocument:
+    """PDFium document via pypdfium2"""
+    
+    engine = 'pdfium'
+    
+    def __init__(self, source: PdfSource):
+        import pypdfium2
+        self.pdf = pypdfium2.PdfDocument(source)
+        self.page_count = len(self.pdf)
+    
+    def page_text(self, index: int) -> str:
+        page = self.pdf[index]
+        try:
+            text_page = page.get_textpage()
+            try:
+                # get_text_range keeps text running past the page box
+                text = text_page.get_text_range()
+            finally:
+                text_page.close()
+        finally:
+            page.close()
+        return text.replace('\r\n', '\n')
+    
+    def close(self) -> None:
+        self.pdf.close()
+
+
+# Engine name -> (document class, distribution providing it)
+ENGINES = {
+    'pypdf': (PypdfDocument, 'pypdf'),
+    'pdfplumber': (PdfplumberDocument, 'pdfplumber'),
+    'pdfium': (PdfiumDocument, 'pypdfium2'),
+}
+
+_MODULES = {'pypdf': 'pypdf', 'pdfplumber': 'pdfplumber', 'pdfium': 'pypdfium2'}
+
+
+def is_available(engine: str) -> bool:
+    """Whether an engine's library is installed, without importing it"""
+    return engine in ENGINES and importlib.util.find_spec(_MODULES[engine]) is not None
+
+
+def available_engines() -> List[str]:
+    """Names of the installed engines"""
+    return [engine for engine in ENGINES if is_available(engine)]
+
+
+def engine_version(engine: str) -> str:
+    """Engine name plus its library version, e.g. pypdf-4.0.1"""
+    return f'{engine}-{metadata.version(ENGINES[engine][1])}'
+
+
+def extractor_version(engine: Optional[str] = None) -> str:
+    """
+    Version tag for extraction output produced by an engine setting
+    
+    For auto this covers every installed engine, since any of them may be
+    chosen for a given document.
+    """
+    engine = (engine or PDF_EXTRACT_ENGINE).lower()
+    if engine == 'auto':
+        versions = '+'.join(engine_version(name) for name in available_engines())
+        return f'auto{AUTO_SELECTION_VERSION}:{versions}'
+    return engine_version(engine)
+
+
+def fast_engine() -> str:
+    """The fastest installed engine"""
+    return 'pdfium' if is_available('pdfium') else 'pypdf'
+
+
+def tabular_ratio(text: str) -> float:
+    """Share of non-empty lines that look like table rows (amounts or several numbers)"""
+    lines = [line for line in text.splitlines() if line.strip()]
+    if not lines:
+        return 0.0
+    rows = sum(1 for line in lines if _AMOUNT.search(line) or len(_NUMBER.findall(line)) >= 3)
+    return rows / len(lines)
+
+
+def choose_engine(document: Any) -> str:
+    """
+    Pick an engine for a document opened with the fast engine
+    
+    Long documents always use the fast engine. Short ones whose first pages
+    are mostly table rows (bills, ledgers) use pdfplumber so columns stay
+    aligned; pages with almost no text gain nothing from layout analysis.
+    """
+    if document.page_count > PDF_LAYOUT_MAX_PAGES or not is_available('pdfplumber'):
+        return document.engine
+    
+    sample = '\n'.join(document.page_text(index) for index in range(min(2, document.page_count)))
+    if len(sample.strip()) < 40:
+        return document.engine
+    if tabular_ratio(sample) >= PDF_LAYOUT_MIN_TABULAR_RATIO:
+        return 'pdfplumber'
+    return document.engine
+
+
+def _rewind(source: Any) -> None:
+    if hasattr(source, 'seek'):
+        source.seek(0)
+
+
+def open_document(source: PdfSource, engine: Optional[str] = None):
+    """
+    Open a PDF with the named engine, resolving auto per document
+    
+    Args:
+        source: PDF bytes, file path or binary file object (a pypdf
+            PdfReader is accepted for the pypdf engine)
+        engine: pypdf, pdfplumber, pdfium or auto (default PDF_EXTRACT_ENGINE)
+        
+    Returns:
+        Document with engine, page_count, page_text(index) and close()
+    """
+    engine = (engine or PDF_EXTRACT_ENGINE).lower()
+    if isinstance(source, pypdf.PdfReader):
+        engine = 'pypdf'
+    
+    if engine == 'auto':
+        document = ENGINES[fast_engine()][0](source)
+        chosen = choose_engine(document)
+        if chosen == document.engine:
+            return document
+        document.close()
+        _rewind(source)
+        engine = chosen
+    
+    if engine not in ENGINES:
+        raise ValueError(f'Unknown PDF engine: {engine}')
+    if not is_available(engine):
+        raise ValueError(f'PDF engine {engine} is not installed')
+    return ENGINES[engine][0](source)
+
@@ -2,48 +2,254 @@
 PDF Text Extraction Service
 """
 
-import io
-from typing import Dict, Any
-import pypdf
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, Iterator, List, Optional, Tuple, Union
 
+from src.services.ocr import needs_ocr, ocr_enabled, ocr_pages, report_skipped_pages
+from src.services.pdf_engines import PdfSource, open_document
 
-def extract_text_from_pdf(pdf_bytes: bytes) -> Dict[str, Any]:
+# Parallel extraction settings (opt-in, see extract_text_from_pdf)
+PDF_PARALLEL_EXTRACTION = os.getenv('PDF_PARALLEL_EXTRACTION', 'false').lower() == 'true'
+PDF_EXTRACT_WORKERS = int(os.getenv('PDF_EXTRACT_WORKERS', os.cpu_count() or 1))
+PDF_PARALLEL_MIN_PAGES = int(os.getenv('PDF_PARALLEL_MIN_PAGES', 50))
+
+# PDF bytes or file path and engine held by each pool worker, set once by _init_worker
+_worker_pdf_source: Optional[Union[bytes, str]] = None
+_worker_engine: Optional[str] = None
+
+
+def iter_pdf_pages(
+    source: Any,
+    start: int = 0,
+    end: Optional[int] = None,
+    engine: Optional[str] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Yield non-empty page text one page at a time
+    
+    Only the current page's text is held by the generator, so callers that
+    stream records onward keep memory bounded regardless of page count.
+    
+    Args:
+        source: PDF bytes, file path, binary file object, an open reader or
+            a document from open_document
+        start: Zero-based index of the first page
+        end: Zero-based index one past the last page (default: last page)
+        engine: Extraction engine when source is not already open
+        
+    Yields:
+        {page, text} records with 1-based page numbers
+    """
+    owned = not hasattr(source, 'page_text')
+    document = open_document(source, engine) if owned else source
+    try:
+        if end is None:
+            end = document.page_count
+    
+        for index in range(start, end):
+            text = document.page_text(index)
+            if text.strip():
+                yield {
+                    'page': index + 1,
+                    'text': text.strip(),
+                }
+    finally:
+        if owned:
+            document.close()
+
+
+def _init_worker(pdf_source: Union[bytes, str], engine: str) -> None:
+    """Store the PDF buffer or path in a pool worker so it is sent once per process"""
+    global _worker_pdf_source, _worker_engine
+    _worker_pdf_source = pdf_source
+    _worker_engine = engine
+
+
+def _extract_page_range(start: int, end: int) -> List[Dict[str, Any]]:
+    """Pool task: re-open the shared PDF buffer or file and extract one page range"""
+    return list(iter_pdf_pages(_worker_pdf_source, start, end, engine=_worker_engine))
+
+
+def _shareable_source(source: PdfSource) -> Union[bytes, str]:
+    """Return bytes or a file path that pool workers can re-open independently"""
+    if isinstance(source, (bytes, str)):
+        return source
+    if isinstance(source, bytearray):
+        return bytes(source)
+    # Named temp files (e.g. large S3 downloads) are re-opened by path
+    name = getattr(source, 'name', None)
+    if isinstance(name, str) and os.path.isfile(name):
+        source.flush()
+        return name
+    source.seek(0)
+    return source.read()
+
+
+def _extract_pages_parallel(
+    pdf_source: Union[bytes, str],
+    page_count: int,
+    max_workers: int,
+    engine: str,
+) -> List[Dict[str, Any]]:
+    """
+    Shard page ranges across a process pool and merge results in page order
+    
+    Args:
+        pdf_source: PDF bytes, or a file path each worker re-opens
+        page_count: Number of pages in the PDF
+        max_workers: Number of worker processes
+        engine: Resolved engine name each worker opens the PDF with
+        
+    Returns:
+        List of {page, text} records ordered by page number
+    """
+    # A few shards per worker keeps the pool busy when some pages are slower
+    shard_count = min(page_count, max_workers * 4)
+    shard_size = -(-page_count // shard_count)
+    ranges = [
+        (start, min(start + shard_size, page_count))
+        for start in range(0, page_count, shard_size)
+    ]
+    
+    with ProcessPoolExecutor(
+        max_workers=max_workers,
+        initializer=_init_worker,
+        initargs=(pdf_source, engine),
+    ) as executor:
+        futures = [executor.submit(_extract_page_range, start, end) for start, end in ranges]
+        # Futures are consumed in submission order, so pages stay ordered
+        pages = []
+        for future in futures:
+            pages.extend(future.result())
+    
+    return pages
+
+
+def ocr_missing_pages(
+    pdf_source: PdfSource,
+    page_count: int,
+    pages: List[Dict[str, Any]],
+    reader: Any = None,
+    indexes: Optional[List[int]] = None,
+) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """
+    OCR the pages whose text layer is missing or nearly empty
+    
+    Args:
+        pdf_source: PDF bytes, file path or binary file object
+        page_count: Number of pages in the PDF
+        pages: {page, text} records from the text layer
+        reader: Open pypdf reader over the same PDF, if any
+        indexes: Zero-based pages to check (default: every page)
+        
+    Returns:
+        Tuple of page records in page order with OCRed pages marked
+        ocr=True, and OCR stats (None when no page needed OCR)
+    """
+    texts = {page['page']: page['text'] for page in pages}
+    candidates = range(page_count) if indexes is None else indexes
+    indexes = [index for index in candidates if needs_ocr(texts.get(index + 1, ''))]
+    if not indexes:
+        return pages, None
+    
+    start = time.perf_counter()
+    results = ocr_pages(_shareable_source(pdf_source), indexes, reader=reader)
+    
+    by_page = {page['page']: page for page in pages}
+    for index, result in results.items():
+        if len(result['text']) > len(texts.get(index + 1, '')):
+            by_page[index + 1] = {'page': index + 1, 'text': result['text'], 'ocr': True}
+    
+    stats = {
+        'pages': len(indexes),
+        'recognized': sum(1 for result in results.values() if result['text']),
+        'cached': sum(1 for result in results.values() if result['cached']),
+        'seconds': round(time.perf_counter() - start, 3),
+        # Per-page render and OCR milliseconds of pages OCRed this time
+        'page_ms': {
+            index + 1: {'render': result['render_ms'], 'ocr': result['ocr_ms']}
+            for index, result in results.items() if not result['cached']
+        },
+    }
+    return [by_page[number] for number in sorted(by_page)], stats
+
+
+def extract_text_from_pdf(
+    pdf_bytes: PdfSource,
+    parallel: Optional[bool] = None,
+    max_workers: Optional[int] = None,
+    min_pages: Optional[int] = None,
+    engine: Optional[str] = None,
+) -> Dict[str, Any]:
     """
     Extract text from PDF bytes
     
     Args:
-        pdf_bytes: PDF file content as bytes
+        pdf_bytes: PDF file content as bytes, or a file path / binary file object
+            read in place without copying it into memory
+        parallel: Extract page ranges in a process pool (default PDF_PARALLEL_EXTRACTION)
+        max_workers: Worker processes for parallel mode (default PDF_EXTRACT_WORKERS)
+        min_pages: PDFs with fewer pages run serially (default PDF_PARALLEL_MIN_PAGES)
+        engine: pypdf, pdfplumber, pdfium or auto (default PDF_EXTRACT_ENGINE)
         
     Returns:
-        Dictionary with extracted text and metadata
+        Dictionary with extracted text and metadata, including the engine used
+        and, when scanned pages were OCRed, ocr stats
     """
     try:
-        # Create a PDF reader from bytes
-        pdf_file = io.BytesIO(pdf_bytes)
-        pdf_reader = pypdf.PdfReader(pdf_file)
+        # Open the PDF from bytes, path or file object with the chosen engine
+        document = open_document(pdf_bytes, engine)
+    except Exception as e:
+        return {
+            'success': False,
+            'error': str(e),
+            'text': '',
+            'page_count': 0,
+            'pages': [],
+        }
         
+    try:
         # Get page count
-        page_count = len(pdf_reader.pages)
+        page_count = document.page_count
+        
+        if parallel is None:
+            parallel = PDF_PARALLEL_EXTRACTION
+        workers = max_workers or PDF_EXTRACT_WORKERS
+        threshold = PDF_PARALLEL_MIN_PAGES if min_pages is None else min_pages
         
         # Extract text from all pages
-        extracted_text = []
-        for page_num, page in enumerate(pdf_reader.pages, start=1):
-            text = page.extract_text()
-            if text.strip():
-                extracted_text.append({
-                    'page': page_num,
-                    'text': text.strip(),
-                })
+        if parallel and workers > 1 and page_count >= threshold:
+            extracted_text = _extract_pages_parallel(
+                _shareable_source(pdf_bytes), page_count, workers, document.engine
+            )
+        else:
+            extracted_text = list(iter_pdf_pages(document))
+        
+        # Scanned pages have no text layer; OCR just those
+        ocr_stats = None
+        if ocr_enabled():
+            extracted_text, ocr_stats = ocr_missing_pages(
+                pdf_bytes, page_count, extracted_text, reader=getattr(document, 'reader', None)
+            )
+        else:
+            with_text = sum(1 for page in extracted_text if not needs_ocr(page['text']))
+            report_skipped_pages(page_count - with_text)
         
         # Combine all text
         full_text = '\n\n'.join([page['text'] for page in extracted_text])
         
-        return {
+        result = {
             'success': True,
             'text': full_text,
             'page_count': page_count,
             'pages': extracted_text,
+            'engine': document.engine,
         }
+        if ocr_stats is not None:
+            result['ocr'] = ocr_stats
+        return result
     
     except Exception as e:
         return {
@@ -53,22 +259,29 @@ def extract_text_from_pdf(pdf_bytes: bytes) -> Dict[str, Any]:
             'page_count': 0,
             'pages': [],
         }
+    finally:
+        document.close()
 
 
-def extract_text_from_file_path(file_path: str) -> Dict[str, Any]:
+def extract_text_from_file_path(
+    file_path: str,
+    parallel: Optional[bool] = None,
+    engine: Optional[str] = None,
+) -> Dict[str, Any]:
     """
     Extract text from PDF file path
     
     Args:
         file_path: Path to PDF file
+        parallel: Extract page ranges in a process pool (default PDF_PARALLEL_EXTRACTION)
+        engine: pypdf, pdfplumber, pdfium or auto (default PDF_EXTRACT_ENGINE)
         
     Returns:
         Dictionary with extracted text and metadata
     """
     try:
         with open(file_path, 'rb') as file:
-            pdf_bytes = file.read()
-            return extract_text_from_pdf(pdf_bytes)
+            return extract_text_from_pdf(file, parallel=parallel, engine=engine)
     
     except FileNotFoundError:
         return {
@@ -86,4 +299,3 @@ def extract_text_from_file_path(file_path: str) -> Dict[str, Any]:
             'page_count': 0,
             'pages': [],
         }
-
@@ -4,17 +4,58 @@ S3 Service for downloading files
 
 import boto3
 import os
-from typing import Optional
-
-s3_client = boto3.client(
-    's3',
-    region_name=os.getenv('AWS_REGION', 'us-east-1'),
-    aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
-    aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
-)
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Optional
 
 BUCKET_NAME = os.getenv('S3_BUCKET_NAME', 'demand-letters-dev')
 
+# Objects at or above this size are fetched with parallel ranged GETs
+S3_RANGED_THRESHOLD_BYTES = int(os.getenv('S3_RANGED_THRESHOLD_BYTES', 32 * 1024 * 1024))
+S3_RANGE_PART_BYTES = int(os.getenv('S3_RANGE_PART_BYTES', 8 * 1024 * 1024))
+S3_RANGE_CONCURRENCY = int(os.getenv('S3_RANGE_CONCURRENCY', 8))
+# Streamed downloads stay in memory up to this size, then spill to disk
+S3_SPOOL_MAX_MEMORY_BYTES = int(os.getenv('S3_SPOOL_MAX_MEMORY_BYTES', 16 * 1024 * 1024))
+S3_STREAM_CHUNK_BYTES = 1024 * 1024
+
+_s3_client = None
+
+
+def get_s3_client():
+    """
+    Return the S3 client, creating it on first use
+    
+    Created lazily so local stand-ins (moto, S3_ENDPOINT_URL) are picked up
+    when they are configured after import.
+    """
+    global _s3_client
+    if _s3_client is None:
+        _s3_client = boto3.client(
+            's3',
+            region_name=os.getenv('AWS_REGION', 'us-east-1'),
+            aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
+            aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
+            endpoint_url=os.getenv('S3_ENDPOINT_URL') or None,
+        )
+    return _s3_client
+
+
+def get_object_size(s3_key: str) -> Optional[int]:
+    """
+    Size of an S3 object from a HEAD request
+    
+    Args:
+        s3_key: S3 object key
+        
+    Returns:
+        Size in bytes or None if error
+    """
+    try:
+        return get_s3_client().head_object(Bucket=BUCKET_NAME, Key=s3_key)['ContentLength']
+    except Exception as e:
+        print(f"Error reading S3 object size: {str(e)}")
+        return None
+
 
 def download_from_s3(s3_key: str) -> Optional[bytes]:
     """
@@ -27,9 +68,68 @@ def download_from_s3(s3_key: str) -> Optional[bytes]:
         File content as bytes or None if error
     """
     try:
-        response = s3_client.get_object(Bucket=BUCKET_NAME, Key=s3_key)
+        response = get_s3_client().get_object(Bucket=BUCKET_NAME, Key=s3_key)
         return response['Body'].read()
     except Exception as e:
         print(f"Error downloading from S3: {str(e)}")
         return None
 
+
+def _download_ranges(s3_key: str, size: int, file: BinaryIO) -> None:
+    """Fetch an object with parallel ranged GETs, writing each part at its offset"""
+    client = get_s3_client()
+    fd = file.fileno()
+    
+    def fetch(start: int) -> None:
+        end = min(start + S3_RANGE_PART_BYTES, size) - 1
+        response = client.get_object(Bucket=BUCKET_NAME, Key=s3_key, Range=f'bytes={start}-{end}')
+        offset = start
+        for chunk in response['Body'].iter_chunks(S3_STREAM_CHUNK_BYTES):
+            # pwrite leaves the shared file position untouched, so parts can
+            # be written concurrently
+            os.pwrite(fd, chunk, offset)
+            offset += len(chunk)
+    
+    with ThreadPoolExecutor(max_workers=S3_RANGE_CONCURRENCY) as executor:
+        # list() re-raises the first part failure
+        list(executor.map(fetch, range(0, size, S3_RANGE_PART_BYTES)))
+
+
+def download_from_s3_to_file(s3_key: str) -> Optional[BinaryIO]:
+    """
+    Download file from S3 into a temporary file without buffering it in memory
+    
+    Small objects are streamed into a SpooledTemporaryFile; objects of at
+    least S3_RANGED_THRESHOLD_BYTES are fetched with parallel ranged GETs
+    into a named temporary file that other processes can re-open by path.
+    The caller owns the returned file and must close it, which deletes it.
+    
+    Args:
+        s3_key: S3 object key
+        
+    Returns:
+        Readable file object positioned at the start, or None if error
+    """
+    file = None
+    try:
+        client = get_s3_client()
+        size = client.head_object(Bucket=BUCKET_NAME, Key=s3_key)['ContentLength']
+        
+        if size >= S3_RANGED_THRESHOLD_BYTES and hasattr(os, 'pwrite'):
+            file = tempfile.NamedTemporaryFile(suffix='.pdf')
+            file.truncate(size)
+            _download_ranges(s3_key, size, file)
+        else:
+            file = tempfile.SpooledTemporaryFile(max_size=S3_SPOOL_MAX_MEMORY_BYTES)
+            response = client.get_object(Bucket=BUCKET_NAME, Key=s3_key)
+            for chunk in response['Body'].iter_chunks(S3_STREAM_CHUNK_BYTES):
+                file.write(chunk)
+        
+        file.seek(0)
+        return file
+    
+    except Exception as e:
+        print(f"Error downloading from S3: {str(e)}")
+        if file is not None:
+            file.close()
+        return None
@@ -0,0 +1,119 @@
+"""
+Full-text search over extracted PDF pages and facts
+
+Page text is indexed as it is stored: every pdf_pages row written by
+extract_text carries a tsvector in a GIN-indexed column, and the backend
+does the same for facts. A search reads matching rows from the index,
+ranks them, keeps a bounded number of the best and only builds snippets
+for the hits it returns, so latency depends on the number of matches
+rather than on how many PDFs are stored.
+"""
+
+import html
+import os
+import time
+from typing import Dict, Any, List, Optional
+
+from src.services.database_service import backfill_search_vectors, search_facts, search_pdf_pages
+from src.services.metrics import stage
+
+SEARCH_DEFAULT_LIMIT = int(os.getenv('SEARCH_DEFAULT_LIMIT', 20))
+SEARCH_MAX_LIMIT = int(os.getenv('SEARCH_MAX_LIMIT', 100))
+# Best matching rows kept per scope; broader queries report truncated results
+SEARCH_RANK_CANDIDATES = int(os.getenv('SEARCH_RANK_CANDIDATES', 2000))
+SEARCH_SNIPPET_WORDS = int(os.getenv('SEARCH_SNIPPET_WORDS', 35))
+SEARCH_SNIPPET_FRAGMENTS = int(os.getenv('SEARCH_SNIPPET_FRAGMENTS', 2))
+
+SCOPES = ('pages', 'facts', 'all')
+
+# ts_headline marks matches with these, then snippets are HTML-escaped and
+# the markers swapped for <mark> tags, so page text can never inject markup
+_START, _STOP = '\x01', '\x02'
+
+
+def headline_options(words: int = SEARCH_SNIPPET_WORDS, fragments: int = SEARCH_SNIPPET_FRAGMENTS) -> str:
+    """ts_headline options for snippets of about words words"""
+    return (
+        f'StartSel="{_START}", StopSel="{_STOP}", MaxWords={words}, MinWords={max(1, words // 3)}, '
+        f'MaxFragments={fragments}, FragmentDelimiter=" ... "'
+    )
+
+
+def render_snippet(snippet: Optional[str]) -> str:
+    """HTML snippet with matched words wrapped in <mark>"""
+    escaped = html.escape(' '.join((snippet or '').split()))
+    return escaped.replace(_START, '<mark>').replace(_STOP, '</mark>')
+
+
+def _page_hit(hit: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        'pdfId': hit['pdf_id'],
+        'documentId': hit['document_id'],
+        'filename': hit['filename'],
+        'pageNumber': hit['page_number'],
+        'rank': round(hit['rank'], 6),
+        'snippet': render_snippet(hit['snippet']),
+    }
+
+
+def _fact_hit(hit: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        'factId': hit['fact_id'],
+        'documentId': hit['document_id'],
+        'pdfId': hit['pdf_id'],
+        'pageNumber': hit['page_number'],
+        'status': hit['status'],
+        'citation': hit['citation'],
+        'rank': round(hit['rank'], 6),
+        'snippet': render_snippet(hit['snippet']),
+    }
+
+
+def search(
+    query: str,
+    scope: str = 'all',
+    document_ids: Optional[List[str]] = None,
+    limit: Optional[int] = None,
+    offset: int = 0,
+) -> Dict[str, Any]:
+    """
+    Search page text and facts
+    
+    Args:
+        query: Web-search style query, e.g. '"lumbar strain" -chiropractor'
+        scope: pages, facts or all
+        document_ids: Restrict hits to these documents
+        limit: Hits per scope (default SEARCH_DEFAULT_LIMIT, at most SEARCH_MAX_LIMIT)
+        offset: Hits skipped per scope
+        
+    Returns:
+        Dictionary with {hits, matched, truncated} per searched scope and tookMs
+    """
+    if scope not in SCOPES:
+        raise ValueError(f'Unknown search scope: {scope}')
+    limit = max(1, min(SEARCH_MAX_LIMIT, limit or SEARCH_DEFAULT_LIMIT))
+    offset = max(0, offset)
+    options = headline_options()
+    
+    start = time.perf_counter()
+    result: Dict[str, Any] = {'query': query, 'scope': scope}
+    searches = (('pages', search_pdf_pages, _page_hit), ('facts', search_facts, _fact_hit))
+    for name, run, shape in searches:
+        if scope not in (name, 'all'):
+            continue
+        with stage(f'search_{name}'):
+            found = run(query, document_ids or None, limit, offset, SEARCH_RANK_CANDIDATES, options)
+        result[name] = {
+            'hits': [shape(hit) for hit in found['hits']],
+            'matched': found['matched'],
+            # Only the best SEARCH_RANK_CANDIDATES matches are kept
+            'truncated': found['matched'] >= SEARCH_RANK_CANDIDATES,
+        }
+    result['tookMs'] = round((time.perf_counter() - start) * 1000, 2)
+    return result
+
+
+def reindex(batch_size: int = 1000) -> Dict[str, int]:
+    """Index page and fact rows stored before search existed"""
+    with stage('reindex'):
+        return backfill_search_vectors(batch_size)
@@ -0,0 +1,11 @@
+"""
+Token estimates for prompt budgeting
+"""
+
+# Rough chars-per-token ratio for English prose; avoids a tokenizer dependency
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the token count of text"""
+    return len(text) // CHARS_PER_TOKEN + 1
@@ -0,0 +1,143 @@
+"""
+Shared pytest fixtures for the AI service
+
+Tests run without S3, Postgres or Anthropic. Tests that need Postgres use
+the database fixture and are skipped unless TEST_DATABASE_URL is set; with
+it set, sql_cursor renders SQL with a real psycopg2 cursor instead of the
+local renderer.
+"""
+
+import os
+import stat
+import sys
+import uuid
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+from psycopg2.extensions import adapt
+
+SERVICE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(SERVICE_DIR))
+
+SCHEMA_SQL = Path(__file__).resolve().parent / 'schema.sql'
+
+
+def _quote(value) -> str:
+    return adapt(value).getquoted().decode()
+
+
+class RenderingCursor:
+    """
+    Cursor that renders statements instead of running them
+    
+    mogrify binds parameters the way psycopg2 does: Python %-formatting of
+    quoted values, so a template with the wrong number of placeholders
+    fails here just as it would against Postgres.
+    """
+    
+    connection = SimpleNamespace(encoding='UTF8')
+    
+    def __init__(self, real_cursor=None):
+        self.real_cursor = real_cursor
+        self.statements = []
+    
+    def mogrify(self, query, args=None) -> bytes:
+        if self.real_cursor is not None:
+            return self.real_cursor.mogrify(query, args)
+        if isinstance(query, bytes):
+            query = query.decode()
+        if args is None:
+            return query.encode()
+        if isinstance(args, dict):
+            return (query % {key: _quote(value) for key, value in args.items()}).encode()
+        return (query % tuple(_quote(value) for value in args)).encode()
+    
+    def execute(self, query, args=None) -> None:
+        rendered = self.mogrify(query, args) if args is not None else query
+        self.statements.append(rendered.decode() if isinstance(rendered, bytes) else rendered)
+    
+    def fetchone(self):
+        return None
+    
+    def fetchall(self) -> list:
+        return []
+
+
+@pytest.fixture
+def sql_cursor():
+    """Cursor recording rendered SQL, backed by Postgres when TEST_DATABASE_URL is set"""
+    url = os.getenv('TEST_DATABASE_URL')
+    if not url:
+        yield RenderingCursor()
+        return
+    import psycopg2
+    conn = psycopg2.connect(url)
+    try:
+        with conn.cursor() as real_cursor:
+            cursor = RenderingCursor(real_cursor)
+            cursor.connection = conn
+            yield cursor
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+@pytest.fixture
+def database(monkeypatch):
+    """
+    Point the service at empty tables in a throwaway schema of TEST_DATABASE_URL
+    
+    Yields an autocommit connection on that schema for seeding and checks.
+    """
+    url = os.getenv('TEST_DATABASE_URL')
+    if not url:
+        pytest.skip('TEST_DATABASE_URL is not set')
+    import psycopg2
+    from src.services import database_service
+    
+    schema = f'test_{uuid.uuid4().hex[:12]}'
+    conn = psycopg2.connect(url)
+    conn.autocommit = True
+    with conn.cursor() as cursor:
+        cursor.execute(f'CREATE SCHEMA {schema}')
+        cursor.execute(f'SET search_path TO {schema}')
+        cursor.execute(SCHEMA_SQL.read_text())
+    separator = '&' if '?' in url else '?'
+    monkeypatch.setenv('DATABASE_URL', f'{url}{separator}options=-csearch_path%3D{schema}')
+    database_service.close_pool()
+    try:
+        yield conn
+    finally:
+        database_service.close_pool()
+        with conn.cursor() as cursor:
+            cursor.execute(f'DROP SCHEMA {schema} CASCADE')
+        conn.close()
+
+
+FAKE_TESSERACT = f'''#!{sys.executable}
+import sys
+if '--version' in sys.argv:
+    print('tesseract 5.3.0')
+else:
+    sys.stdin.buffer.read()
+    print('Emergency department discharge summary')
+'''
+
+
+@pytest.fixture
+def fake_tesseract(tmp_path, monkeypatch):
+    """Point OCR at a stand-in tesseract binary and a fresh cache"""
+    from src.services import ocr
+    
+    command = tmp_path / 'tesseract'
+    command.write_text(FAKE_TESSERACT)
+    command.chmod(command.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setattr(ocr, 'OCR_TESSERACT_CMD', str(command))
+    monkeypatch.setattr(ocr, 'PDF_OCR', 'auto')
+    monkeypatch.setattr(ocr, 'OCR_CACHE_BACKEND', 'memory')
+    monkeypatch.setattr(ocr, '_cache', None)
+    monkeypatch.setattr(ocr, '_cache_built', False)
+    ocr.tesseract_version.cache_clear()
+    yield command
+    ocr.tesseract_version.cache_clear()
@@ -0,0 +1,72 @@
+"""Hand-built PDFs for tests that need specific object layouts"""
+
+from typing import List
+
+
+def build_pdf(objects: List[bytes]) -> bytes:
+    """
+    Assemble a PDF from object bodies
+    
+    Object n (1-based) is objects[n - 1]; object 1 must be the catalog.
+    """
+    out = bytearray(b'%PDF-1.4\n')
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b'%d 0 obj\n' % number + body + b'\nendobj\n'
+    xref = len(out)
+    out += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    for offset in offsets:
+        out += b'%010d 00000 n \n' % offset
+    out += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def _stream(data: bytes) -> bytes:
+    return b'<< /Length %d >>\nstream\n' % len(data) + data + b'\nendstream'
+
+
+def text_pdf(texts: List[str]) -> bytes:
+    """PDF with one page per text; an empty text makes a page without a text layer"""
+    # 1 catalog, 2 pages, 3 font, then a content stream and a page object per page
+    kids = b' '.join(b'%d 0 R' % (5 + 2 * index) for index in range(len(texts)))
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        b'<< /Type /Pages /Kids [%s] /Count %d >>' % (kids, len(texts)),
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>',
+    ]
+    for index, text in enumerate(texts):
+        content = b'BT /F1 12 Tf 72 720 Td (%s) Tj ET' % text.encode('latin-1') if text else b''
+        objects.append(_stream(content))
+        objects.append(
+            b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] '
+            b'/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>' % (4 + 2 * index)
+        )
+    return build_pdf(objects)
+
+
+def indirect_objects_pdf(pages: int = 2) -> bytes:
+    """
+    PDF whose geometry, font widths and encoding are indirect references,
+    as most real-world producers write them
+    """
+    # 1 catalog, 2 pages, 3 media box, 4 font, 5 widths, 6 encoding,
+    # then a content stream and a page object per page
+    kids = b' '.join(b'%d 0 R' % (9 + 2 * index) for index in range(pages))
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        b'<< /Type /Pages /Kids [%s] /Count %d /MediaBox 3 0 R >>' % (kids, pages),
+        b'[0 0 612 792]',
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /FirstChar 32 /Widths 5 0 R /Encoding 6 0 R >>',
+        b'[' + b' '.join(b'556' for _ in range(95)) + b']',
+        b'<< /Type /Encoding /BaseEncoding /WinAnsiEncoding /Differences [32 /space] >>',
+        b'<< /Font << /F1 4 0 R >> >>',
+    ]
+    for index in range(pages):
+        content = b'BT /F1 12 Tf 72 720 Td (Page %d of the medical records) Tj ET' % (index + 1)
+        objects.append(_stream(content))
+        objects.append(
+            b'<< /Type /Page /Parent 2 0 R /Resources 7 0 R /Contents %d 0 R /CropBox 3 0 R >>'
+            % (8 + 2 * index)
+        )
+    return build_pdf(objects)
@@ -0,0 +1,61 @@
+-- Tables the AI service reads and writes, as created by the backend's
+-- Prisma schema (backend/prisma/schema.prisma) without the foreign keys
+-- to tables the service never touches
+
+CREATE TABLE pdfs (
+    id TEXT PRIMARY KEY,
+    document_id TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    s3_key TEXT NOT NULL,
+    file_size_bytes BIGINT NOT NULL DEFAULT 0,
+    mime_type TEXT NOT NULL DEFAULT 'application/pdf',
+    extracted_text TEXT,
+    page_count INTEGER,
+    uploaded_by TEXT NOT NULL DEFAULT 'user-1',
+    created_at TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE pdf_extraction_cache (
+    cache_key TEXT PRIMARY KEY,
+    value JSONB NOT NULL,
+    size_bytes INTEGER NOT NULL,
+    created_at TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    expires_at TIMESTAMP(3)
+);
+
+CREATE TABLE fact_extraction_cache (
+    cache_key TEXT PRIMARY KEY,
+    value JSONB NOT NULL,
+    size_bytes INTEGER NOT NULL,
+    created_at TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    expires_at TIMESTAMP(3)
+);
+
+CREATE TABLE pdf_pages (
+    pdf_id TEXT NOT NULL,
+    page_number INTEGER NOT NULL,
+    fingerprint TEXT NOT NULL,
+    text TEXT NOT NULL,
+    search_vector TSVECTOR,
+    updated_at TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (pdf_id, page_number)
+);
+
+CREATE INDEX pdf_pages_search_vector_idx ON pdf_pages USING GIN (search_vector);
+
+CREATE TABLE facts (
+    id TEXT PRIMARY KEY,
+    document_id TEXT NOT NULL,
+    pdf_id TEXT,
+    fact_text TEXT NOT NULL,
+    citation TEXT,
+    page_number INTEGER,
+    status TEXT NOT NULL DEFAULT 'pending',
+    original_text TEXT,
+    reviewed_by TEXT,
+    reviewed_at TIMESTAMP(3),
+    created_at TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    search_vector TSVECTOR
+);
+
+CREATE INDEX facts_search_vector_idx ON facts USING GIN (search_vector);
@@ -0,0 +1,284 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from src.services import anthropic_service, metrics
+from src.services.tokens import CHARS_PER_TOKEN
+
+
+class FakeMessages:
+    """messages.create stand-in that records requests and reports prompt cache usage"""
+    
+    def __init__(self, text='[]', usage=None):
+        self.requests = []
+        self.text = text
+        self.usage = usage or SimpleNamespace(
+            input_tokens=120, output_tokens=40, cache_read_input_tokens=2100, cache_creation_input_tokens=0,
+        )
+    
+    def _message(self, request):
+        self.requests.append(request)
+        return SimpleNamespace(
+            content=[SimpleNamespace(type='text', text=self.text)],
+            usage=self.usage,
+            stop_reason='end_turn',
+        )
+    
+    def create(self, **request):
+        return self._message(request)
+
+
+class ScriptedAsyncMessages:
+    """Async messages.create stand-in answering each request with respond(request)"""
+    
+    def __init__(self, respond):
+        self.requests = []
+        self.respond = respond
+    
+    async def create(self, **request):
+        self.requests.append(request)
+        return SimpleNamespace(
+            content=[SimpleNamespace(type='text', text=self.respond(request))],
+            usage=SimpleNamespace(input_tokens=10, output_tokens=10),
+            stop_reason='end_turn',
+        )
+
+
+@pytest.fixture
+def fake_client(monkeypatch):
+    messages = FakeMessages(text='[{"fact_text": "Rear-ended on I-5", "category": "incident", "page_reference": "1"}]')
+    monkeypatch.setattr(anthropic_service, 'LLM_SCHEDULER', False)
+    monkeypatch.setattr(anthropic_service, 'get_client', lambda: SimpleNamespace(messages=messages))
+    monkeypatch.setattr(anthropic_service, 'get_cached_facts', lambda key: None)
+    monkeypatch.setattr(anthropic_service, 'store_cached_facts', lambda key, facts: None)
+    return messages
+
+
+@pytest.fixture
+def scripted_client(monkeypatch):
+    monkeypatch.setattr(anthropic_service, 'LLM_SCHEDULER', False)
+    
+    def install(respond):
+        messages = ScriptedAsyncMessages(respond)
+        monkeypatch.setattr(anthropic_service, 'get_async_client', lambda: SimpleNamespace(messages=messages))
+        return messages
+    
+    return install
+
+
+def _long(tokens):
+    return 'x' * (tokens * CHARS_PER_TOKEN)
+
+
+def test_short_prefixes_are_sent_without_breakpoints(monkeypatch):
+    monkeypatch.setattr(anthropic_service, 'PROMPT_CACHE_MIN_TOKENS', 0)
+    monkeypatch.setenv('ANTHROPIC_MODEL', 'claude-haiku-4-5-20251001')
+    
+    system = anthropic_service.build_demand_letter_system({'firmName': 'Smith & Lee'})
+    
+    assert [block['type'] for block in system] == ['text', 'text']
+    assert not any('cache_control' in block for block in system)
+
+
+def test_breakpoints_follow_the_model_minimum():
+    assert anthropic_service.prompt_cache_min_tokens('claude-haiku-4-5-20251001') == 4096
+    assert anthropic_service.prompt_cache_min_tokens('claude-3-5-haiku-latest') == 2048
+    assert anthropic_service.prompt_cache_min_tokens('claude-sonnet-4-5') == 1024
+    
+    sonnet = anthropic_service._system_blocks([_long(1100)], 'claude-sonnet-4-5')
+    haiku = anthropic_service._system_blocks([_long(1100)], 'claude-haiku-4-5-20251001')
+    
+    assert sonnet[0]['cache_control'] == {'type': 'ephemeral'}
+    assert 'cache_control' not in haiku[0]
+
+
+def test_long_templates_are_cached_with_the_instructions_on_the_default_model(monkeypatch):
+    monkeypatch.setattr(anthropic_service, 'PROMPT_CACHE_MIN_TOKENS', 0)
+    monkeypatch.setenv('ANTHROPIC_MODEL', 'claude-haiku-4-5-20251001')
+    template = _long(4200)
+    
+    system = anthropic_service.build_demand_letter_system({'firmName': 'Smith & Lee'}, template_content=template)
+    prompt = anthropic_service.build_demand_letter_prompt([], {'firmName': 'Smith & Lee'}, {}, template)
+    
+    assert system[0]['text'].startswith(anthropic_service.DRAFT_SYSTEM_PROMPT)
+    assert system[0]['text'].endswith(template)
+    assert system[0]['cache_control'] == {'type': 'ephemeral'}
+    assert system[1]['cache_control'] == {'type': 'ephemeral'}
+    # Only the per-letter prompt varies between letters drafted from the template
+    assert template not in prompt
+    
+    short = anthropic_service.build_demand_letter_system(None, template_content='Standard PI letter')
+    assert 'cache_control' not in short[0]
+
+
+def test_section_requests_share_the_cached_template(scripted_client, monkeypatch):
+    monkeypatch.setattr(anthropic_service, 'DRAFT_CONSISTENCY_PASS', False)
+    monkeypatch.setattr(anthropic_service, 'PROMPT_CACHE_MIN_TOKENS', 0)
+    monkeypatch.setenv('ANTHROPIC_MODEL', 'claude-haiku-4-5-20251001')
+    template = _long(4200)
+    
+    def respond(request):
+        if anthropic_service.DRAFT_FRAME_SYSTEM_PROMPT in _system_text(request):
+            return anthropic_service.DRAFT_SECTIONS_MARKER
+        return '<div class="section"></div>'
+    
+    messages = scripted_client(respond)
+    facts = [
+        {'factText': 'The defendant ran a red light on May 3, 2024', 'category': 'liability'},
+        {'factText': 'MRI showed a herniated disc', 'category': 'medical'},
+    ]
+    
+    asyncio.run(anthropic_service.generate_demand_letter_sections(facts, {}, template, None))
+    
+    assert len(messages.requests) >= 3
+    for request in messages.requests:
+        assert request['system'][0]['text'].endswith(template)
+        assert request['system'][0]['cache_control'] == {'type': 'ephemeral'}
+        assert template not in request['messages'][0]['content']
+
+
+def test_breakpoint_goes_on_the_block_that_reaches_the_minimum():
+    system = anthropic_service._system_blocks([_long(700), _long(700), _long(10)], 'claude-sonnet-4-5')
+    
+    assert ['cache_control' in block for block in system] == [False, True, True]
+    assert [block['text'] for block in system] == [_long(700), _long(700), _long(10)]
+
+
+def test_prompt_caching_off_sends_no_breakpoints(monkeypatch):
+    monkeypatch.setattr(anthropic_service, 'PROMPT_CACHING', False)
+    
+    system = anthropic_service._system_blocks([_long(3000)], 'claude-sonnet-4-5')
+    
+    assert 'cache_control' not in system[0]
+
+
+def test_fact_extraction_sends_the_cached_layout(fake_client, monkeypatch):
+    monkeypatch.setattr(anthropic_service, 'PROMPT_CACHE_MIN_TOKENS', 10)
+    
+    facts = anthropic_service.extract_facts_from_text('Police report text', 'report.pdf')
+    
+    assert facts[0]['category'] == 'incident'
+    request = fake_client.requests[0]
+    assert request['system'] == [{
+        'type': 'text',
+        'text': anthropic_service.FACT_EXTRACTION_SYSTEM_PROMPT,
+        'cache_control': {'type': 'ephemeral'},
+    }]
+    # Per-document text stays out of the cached prefix
+    assert 'Police report text' in request['messages'][0]['content']
+    assert 'Police report text' not in request['system'][0]['text']
+
+
+def test_cache_read_and_write_tokens_are_reported(fake_client):
+    fake_client.usage = SimpleNamespace(
+        input_tokens=100, output_tokens=50, cache_read_input_tokens=0, cache_creation_input_tokens=2200,
+    )
+    with metrics.invocation('extract_facts') as record:
+        anthropic_service.extract_facts_from_text('First document', 'a.pdf')
+        fake_client.usage = SimpleNamespace(
+            input_tokens=90, output_tokens=45, cache_read_input_tokens=2200, cache_creation_input_tokens=0,
+        )
+        anthropic_service.extract_facts_from_text('Second document', 'b.pdf')
+        usage = metrics.invocation_usage()
+    
+    assert record['counters']['cache_write_tokens'] == 2200
+    assert record['counters']['cache_read_tokens'] == 2200
+    assert usage == {
+        'input_tokens': 190,
+        'output_tokens': 95,
+        'cache_read_input_tokens': 2200,
+        'cache_creation_input_tokens': 2200,
+    }
+
+
+def test_usage_dict_defaults_missing_cache_fields_to_zero():
+    usage = metrics.usage_dict(SimpleNamespace(input_tokens=10, output_tokens=5, cache_read_input_tokens=None))
+    
+    assert usage == {
+        'input_tokens': 10,
+        'output_tokens': 5,
+        'cache_read_input_tokens': 0,
+        'cache_creation_input_tokens': 0,
+    }
+
+
+def _system_text(request):
+    return ''.join(block['text'] for block in request['system'])
+
+
+def test_frame_is_written_with_its_own_instructions(scripted_client, monkeypatch):
+    monkeypatch.setattr(anthropic_service, 'DRAFT_CONSISTENCY_PASS', False)
+    
+    def respond(request):
+        system = _system_text(request)
+        if anthropic_service.DRAFT_FRAME_SYSTEM_PROMPT in system:
+            return f'<p>Dear adjuster,</p>\n{anthropic_service.DRAFT_SECTIONS_MARKER}\n<p>Sincerely,</p>'
+        heading = request['messages'][0]['content'].split('<h2>')[1].split('</h2>')[0]
+        return f'<div class="section"><h2>{heading}</h2></div>'
+    
+    messages = scripted_client(respond)
+    facts = [{'factText': 'The defendant ran a red light on May 3, 2024', 'category': 'liability'}]
+    
+    draft = asyncio.run(anthropic_service.generate_demand_letter_sections(facts, {}, '', {'firmName': 'Smith & Lee'}))
+    
+    frame_requests = [r for r in messages.requests if anthropic_service.DRAFT_FRAME_SYSTEM_PROMPT in _system_text(r)]
+    assert len(frame_requests) == 1
+    assert 'Smith & Lee' in _system_text(frame_requests[0])
+    assert not any(anthropic_service.DRAFT_SYSTEM_PROMPT in _system_text(r) for r in messages.requests)
+    assert draft.startswith('<p>Dear adjuster,</p>\n<div class="section"><h2>I. LIABILITY</h2></div>')
+    assert draft.endswith('<p>Sincerely,</p>')
+
+
+def _consistency(scripted_client, parts, corrections):
+    scripted_client(lambda request: json.dumps(corrections))
+    return asyncio.run(anthropic_service.check_draft_consistency(parts))
+
+
+def test_corrections_stay_in_their_part(scripted_client):
+    parts = [
+        ('I. LIABILITY', '<p>Ms. Jones was struck on May 3.</p>'),
+        ('II. TREATMENT', '<p>Ms. Jones was treated on May 4.</p>'),
+    ]
+    
+    texts = _consistency(scripted_client, parts, [
+        {'part': 'II. TREATMENT', 'find': 'Ms. Jones', 'replace': 'Ms. Jonas'},
+    ])
+    
+    assert texts == ['<p>Ms. Jones was struck on May 3.</p>', '<p>Ms. Jonas was treated on May 4.</p>']
+
+
+def test_ambiguous_corrections_are_skipped(scripted_client):
+    parts = [
+        ('I. LIABILITY', '<p>Ms. Jones was struck. Ms. Jones was injured.</p>'),
+        ('II. TREATMENT', '<p>Ms. Jones was treated on May 4.</p>'),
+    ]
+    
+    texts = _consistency(scripted_client, parts, [
+        # Occurs twice inside the named part
+        {'part': 'I. LIABILITY', 'find': 'Ms. Jones', 'replace': 'Ms. Jonas'},
+        # No part, and the text occurs in both parts
+        {'find': 'Ms. Jones was', 'replace': 'Ms. Jonas was'},
+        # No part, but the text is unique in the letter
+        {'find': 'May 4', 'replace': 'May 5'},
+        # Text not in the named part
+        {'part': 'I. LIABILITY', 'find': 'treated', 'replace': 'seen'},
+    ])
+    
+    assert texts == [
+        '<p>Ms. Jones was struck. Ms. Jones was injured.</p>',
+        '<p>Ms. Jones was treated on May 5.</p>',
+    ]
+
+
+def test_consistency_prompt_names_every_part(scripted_client):
+    messages = scripted_client(lambda request: '[]')
+    parts = [('OPENING', '<p>Dear adjuster,</p>'), ('I. LIABILITY', '<p>Fault.</p>')]
+    
+    texts = asyncio.run(anthropic_service.check_draft_consistency(parts))
+    
+    prompt = messages.requests[0]['messages'][0]['content']
+    assert '=== PART: OPENING\n<p>Dear adjuster,</p>' in prompt
+    assert '=== PART: I. LIABILITY\n<p>Fault.</p>' in prompt
+    assert texts == ['<p>Dear adjuster,</p>', '<p>Fault.</p>']
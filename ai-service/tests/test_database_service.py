@@ -0,0 +1,281 @@
+import psycopg2
+import pytest
+
+from src.services import database_service
+from src.services.database_service import _upsert_pdf_pages
+
+
+class Dropped:
+    """Failure that also closes the connection, as a lost server connection does"""
+    
+    def __init__(self, error):
+        self.error = error
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        return False
+    
+    def execute(self, query, args=None):
+        self.conn.executed.append(query)
+        if self.conn.failures:
+            failure = self.conn.failures.pop(0)
+            if isinstance(failure, Dropped):
+                self.conn.closed = 2
+                raise failure.error
+            raise failure
+
+
+class FakeConnection:
+    """Connection whose statements raise the queued failures in order"""
+    
+    def __init__(self, *failures, commit_error=None):
+        self.failures = list(failures)
+        self.commit_error = commit_error
+        self.executed = []
+        self.closed = 0
+        self.commits = 0
+        self.rollbacks = 0
+    
+    def cursor(self):
+        return FakeCursor(self)
+    
+    def commit(self):
+        if self.commit_error:
+            self.closed = 2
+            raise self.commit_error
+        self.commits += 1
+    
+    def rollback(self):
+        self.rollbacks += 1
+
+
+class FakePool:
+    def __init__(self, *connections):
+        self.idle = list(connections)
+        self.returned = []
+        self.discarded = []
+    
+    def getconn(self):
+        return self.idle.pop(0)
+    
+    def putconn(self, conn, close=False):
+        if close:
+            conn.closed = 1
+            self.discarded.append(conn)
+        else:
+            self.returned.append(conn)
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    """Install a fake pool holding the given connections"""
+    monkeypatch.setattr(database_service, 'DB_POOL_PING_AFTER_SECONDS', float('inf'))
+    monkeypatch.setattr(database_service, '_last_used', {})
+    
+    def install(*connections):
+        fake = FakePool(*connections)
+        monkeypatch.setattr(database_service, '_get_pool', lambda: fake)
+        return fake
+    
+    return install
+
+
+def _update(cursor):
+    cursor.execute('UPDATE pdfs SET page_count = 1')
+    return 'done'
+
+
+def test_work_commits_and_returns_the_connection(pool):
+    conn = FakeConnection()
+    fake = pool(conn)
+    
+    assert database_service.run_with_reconnect(_update) == 'done'
+    assert conn.commits == 1
+    assert fake.returned == [conn] and fake.discarded == []
+
+
+def test_dropped_connections_are_replaced_and_retried(pool):
+    dropped = FakeConnection(Dropped(psycopg2.OperationalError('server closed the connection unexpectedly')))
+    fresh = FakeConnection()
+    fake = pool(dropped, fresh)
+    
+    assert database_service.run_with_reconnect(_update) == 'done'
+    assert fake.discarded == [dropped]
+    assert fake.returned == [fresh]
+    assert fresh.commits == 1
+
+
+def test_a_second_failure_is_raised(pool):
+    fake = pool(
+        FakeConnection(Dropped(psycopg2.OperationalError('connection reset'))),
+        FakeConnection(Dropped(psycopg2.InterfaceError('connection already closed'))),
+    )
+    
+    with pytest.raises(psycopg2.InterfaceError):
+        database_service.run_with_reconnect(_update)
+    assert len(fake.discarded) == 2
+
+
+def test_errors_in_work_roll_back_without_retrying(pool):
+    conn = FakeConnection(ValueError('bad row'))
+    fake = pool(conn, FakeConnection())
+    
+    with pytest.raises(ValueError):
+        database_service.run_with_reconnect(_update)
+    assert conn.rollbacks == 1 and conn.commits == 0
+    assert fake.returned == [conn]
+    assert len(fake.idle) == 1
+
+
+def test_query_errors_keep_the_connection(pool):
+    # Deadlocks and serialization failures are OperationalErrors on a live connection
+    conn = FakeConnection(psycopg2.extensions.TransactionRollbackError('deadlock detected'))
+    fake = pool(conn, FakeConnection())
+    
+    with pytest.raises(psycopg2.extensions.TransactionRollbackError):
+        database_service.run_with_reconnect(_update)
+    assert conn.rollbacks == 1
+    assert fake.returned == [conn] and fake.discarded == []
+    assert len(fake.idle) == 1
+
+
+def test_failed_commits_are_not_retried(pool):
+    # The commit may have been applied before the connection was lost
+    conn = FakeConnection(commit_error=psycopg2.OperationalError('server closed the connection unexpectedly'))
+    fake = pool(conn, FakeConnection())
+    
+    with pytest.raises(psycopg2.OperationalError):
+        database_service.run_with_reconnect(_update)
+    assert fake.discarded == [conn]
+    assert len(fake.idle) == 1
+
+
+def test_stale_connections_are_pinged_before_reuse(pool, monkeypatch):
+    monkeypatch.setattr(database_service, 'DB_POOL_PING_AFTER_SECONDS', 0)
+    closed = FakeConnection()
+    closed.closed = 1
+    unreachable = FakeConnection(psycopg2.OperationalError('no route to host'))
+    healthy = FakeConnection()
+    fake = pool(closed, unreachable, healthy)
+    
+    assert database_service.run_with_reconnect(_update) == 'done'
+    assert fake.discarded == [closed, unreachable]
+    assert healthy.executed == ['SELECT 1', 'UPDATE pdfs SET page_count = 1']
+
+
+def _seed_pdfs(conn, count):
+    with conn.cursor() as cursor:
+        for number in range(count):
+            cursor.execute(
+                "INSERT INTO pdfs (id, document_id, filename, s3_key) VALUES (%s, 'doc-1', %s, %s)",
+                (f'pdf-{number}', f'{number}.pdf', f'case/{number}.pdf'),
+            )
+
+
+def _stored(conn):
+    with conn.cursor() as cursor:
+        cursor.execute('SELECT id, extracted_text, page_count FROM pdfs ORDER BY id')
+        return cursor.fetchall()
+
+
+def test_bulk_update_writes_every_page_of_rows(database):
+    _seed_pdfs(database, 5)
+    updates = [
+        {'pdf_id': f'pdf-{number}', 'extracted_text': f'Text {number}', 'page_count': number + 1}
+        for number in range(5)
+    ]
+    updates.append({'pdf_id': 'pdf-missing', 'extracted_text': 'Lost', 'page_count': 1})
+    
+    assert database_service.update_pdfs_extracted_text(updates, page_size=2) == 5
+    assert _stored(database) == [(f'pdf-{number}', f'Text {number}', number + 1) for number in range(5)]
+
+
+def test_bulk_update_reports_errors(database):
+    assert database_service.update_pdfs_extracted_text([{'pdf_id': 'pdf-0', 'extracted_text': 'x', 'page_count': 'many'}]) == -1
+
+
+def test_appended_chunks_build_the_text_in_order(database):
+    _seed_pdfs(database, 1)
+    database_service.update_pdf_extracted_text('pdf-0', 'Old text', 3)
+    
+    assert database_service.append_pdf_extracted_text('pdf-0', 'Page 1', reset=True)
+    assert database_service.append_pdf_extracted_text('pdf-0', '\n\nPage 2')
+    assert database_service.append_pdf_extracted_text('pdf-0', '\n\nPage 3', page_count=3)
+    
+    assert _stored(database) == [('pdf-0', 'Page 1\n\nPage 2\n\nPage 3', 3)]
+
+
+def test_work_lost_with_its_connection_is_applied_once(database):
+    _seed_pdfs(database, 1)
+    attempts = []
+    
+    def append(cursor):
+        cursor.execute("UPDATE pdfs SET extracted_text = COALESCE(extracted_text, '') || 'chunk' WHERE id = 'pdf-0'")
+        attempts.append(len(attempts) + 1)
+        if len(attempts) == 1:
+            # Drop the connection before the append is committed
+            cursor.execute('SELECT pg_terminate_backend(pg_backend_pid())')
+    
+    database_service.run_with_reconnect(append)
+    
+    assert attempts == [1, 2]
+    assert _stored(database) == [('pdf-0', 'chunk', None)]
+
+
+def test_cache_entries_expire(database):
+    database_service.put_cache_entry('fact_extraction_cache', 'key-1', {'facts': [1]})
+    database_service.put_cache_entry('fact_extraction_cache', 'key-1', {'facts': [2]}, ttl_seconds=3600)
+    database_service.put_cache_entry('fact_extraction_cache', 'key-2', {'facts': [3]}, ttl_seconds=-1)
+    
+    assert database_service.get_cache_entry('fact_extraction_cache', 'key-1') == {'facts': [2]}
+    assert database_service.get_cache_entry('fact_extraction_cache', 'key-2') is None
+    assert database_service.get_cache_entry('fact_extraction_cache', 'key-3') is None
+
+
+def test_upsert_pdf_pages_binds_every_placeholder(sql_cursor):
+    rows = [
+        {'page_number': 1, 'fingerprint': 'abc', 'text': "Patient's MRI showed a herniated disc"},
+        {'page_number': 2, 'fingerprint': 'def', 'text': ''},
+    ]
+    
+    _upsert_pdf_pages(sql_cursor, 'pdf-1', rows, page_size=500)
+    
+    assert len(sql_cursor.statements) == 1
+    statement = sql_cursor.statements[0]
+    assert "('pdf-1', 1, 'abc', 'Patient''s MRI showed a herniated disc', " \
+        "to_tsvector('english'::regconfig, 'Patient''s MRI showed a herniated disc'))" in statement
+    assert "('pdf-1', 2, 'def', '', to_tsvector('english'::regconfig, ''))" in statement
+    assert 'ON CONFLICT (pdf_id, page_number) DO UPDATE' in statement
+
+
+def test_upsert_pdf_pages_passes_config_as_parameter(sql_cursor, monkeypatch):
+    monkeypatch.setattr(database_service, 'SEARCH_TEXT_CONFIG', "simple'); DROP TABLE pdfs; --")
+    
+    _upsert_pdf_pages(sql_cursor, 'pdf-1', [{'page_number': 1, 'fingerprint': '', 'text': 'x'}], page_size=500)
+    
+    assert "to_tsvector('simple''); DROP TABLE pdfs; --'::regconfig, 'x')" in sql_cursor.statements[0]
+
+
+def test_upsert_pdf_pages_splits_large_batches(sql_cursor):
+    rows = [{'page_number': number, 'fingerprint': '', 'text': f'page {number}'} for number in range(1, 6)]
+    
+    _upsert_pdf_pages(sql_cursor, 'pdf-1', rows, page_size=2)
+    
+    assert len(sql_cursor.statements) == 3
+    assert "'page 5'" in sql_cursor.statements[2]
+
+
+def test_stored_page_rows_are_searchable(database):
+    rows = [{'page_number': number, 'fingerprint': '', 'text': f'Lumbar strain, visit {number}'} for number in (1, 2, 3)]
+    
+    assert database_service.store_pdf_page_rows('pdf-1', rows, page_size=2)
+    with database.cursor() as cursor:
+        cursor.execute("SELECT page_number FROM pdf_pages WHERE search_vector @@ to_tsquery('english', 'strain') ORDER BY 1")
+        assert cursor.fetchall() == [(1,), (2,), (3,)]
@@ -0,0 +1,91 @@
+import math
+
+import numpy as np
+
+from src.services import embedding_index
+from src.services.fact_selection import collapse_batch_facts
+
+
+def _unit(angle):
+    return [math.cos(math.radians(angle)), math.sin(math.radians(angle))]
+
+
+def _random_vectors(count, dim=64, seed=1):
+    vectors = np.random.default_rng(seed).standard_normal((count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def test_brute_force_search_returns_the_top_k():
+    vectors = _random_vectors(200)
+    index = embedding_index.VectorIndex(64, ann=False)
+    index.add(vectors)
+    
+    scores, ids = index.search(vectors[:5], 3)
+    
+    expected = np.argsort(-(vectors[:5] @ vectors.T), axis=1)[:, :3]
+    assert ids.tolist() == expected.tolist()
+    assert np.allclose(scores[:, 0], 1.0)
+
+
+def test_searches_pad_missing_results():
+    index = embedding_index.VectorIndex(64, ann=False)
+    index.add(_random_vectors(2))
+    
+    scores, ids = index.search(_random_vectors(1, seed=2), 4)
+    
+    assert ids[0, 2:].tolist() == [-1, -1]
+    assert np.isneginf(scores[0, 2:]).all()
+
+
+def test_lsh_finds_stored_vectors_and_near_copies():
+    vectors = _random_vectors(500)
+    copies = vectors[:20] + 0.05 * _random_vectors(20, seed=3)
+    index = embedding_index.VectorIndex(64, ann=True, tables=8, bits=6)
+    index.add(np.vstack([vectors, copies / np.linalg.norm(copies, axis=1, keepdims=True)]))
+    
+    _, ids = index.search(vectors[:20], 1)
+    later, earlier, _ = index.similar_pairs(0.95)
+    
+    assert ids[:, 0].tolist() == list(range(20))
+    assert sorted(zip(later.tolist(), earlier.tolist())) == [(500 + n, n) for n in range(20)]
+
+
+def test_duplicates_join_kept_vectors_only():
+    # b is close to a and c is close to b, but c is far from a
+    vectors = np.array([_unit(0), _unit(30), _unit(60)], dtype=np.float32)
+    
+    leaders = embedding_index.duplicate_leaders(vectors, threshold=math.cos(math.radians(40)))
+    
+    assert leaders.tolist() == [0, 0, 2]
+
+
+def test_texts_citing_different_numbers_are_not_duplicates():
+    texts = [
+        'Medical bills from Mercy Hospital total $8,632',
+        'Medical bills from Mercy Hospital total $13,082',
+        'Medical bills from Mercy Hospital total $8,632.',
+    ]
+    
+    assert embedding_index.find_duplicates(texts, threshold=0.5).tolist() == [0, 1, 0]
+
+
+def test_batch_duplicates_are_kept_once_with_their_other_sources():
+    repeated = 'Client was rear-ended by the defendant on May 3, 2024'
+    results = [
+        {'pdfId': 'pdf-police', 'success': True, 'facts': [
+            {'fact_text': repeated, 'page_reference': '2', 'page_number': 2},
+            {'fact_text': 'Defendant was cited for failure to yield', 'page_reference': '3', 'page_number': 3},
+        ]},
+        {'pdfId': 'pdf-failed', 'success': False, 'error': 'Timed out'},
+        {'pdfId': 'pdf-records', 'success': True, 'facts': [
+            {'fact_text': repeated, 'page_reference': '1', 'page_number': 1},
+            {'fact_text': 'Diagnosed with a lumbar strain', 'page_reference': '4', 'page_number': 4},
+            {'fact_text': 'Diagnosed with a lumbar strain', 'page_reference': '6', 'page_number': 6},
+        ]},
+    ]
+    
+    assert collapse_batch_facts(results) == 1
+    
+    assert results[0]['facts'][0]['also_cited_in'] == [{'pdfId': 'pdf-records', 'page_reference': '1', 'page_number': 1}]
+    # Repeats within one PDF are left alone
+    assert [fact['page_number'] for fact in results[2]['facts']] == [4, 6]
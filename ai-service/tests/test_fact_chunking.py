@@ -0,0 +1,106 @@
+import asyncio
+import re
+
+from src.services import fact_chunking
+from src.services.fact_chunking import CHARS_PER_TOKEN
+
+
+def _page(number, words):
+    return {'page': number, 'text': ' '.join(f'p{number}w{index}' for index in range(words))}
+
+
+def test_small_documents_fit_one_window():
+    windows = fact_chunking.chunk_pages([_page(1, 10), _page(2, 10)], max_tokens=1000, overlap_tokens=0)
+    
+    assert len(windows) == 1
+    assert windows[0]['first_page'] == 1 and windows[0]['last_page'] == 2
+    assert windows[0]['text'].startswith('--- Page 1 ---\n\np1w0')
+    assert '--- Page 2 ---\n\np2w0' in windows[0]['text']
+
+
+def test_windows_stay_within_budget_and_overlap():
+    # Each page is ~300 chars, so a 200-token (800 char) window holds two pages
+    pages = [_page(number, 50) for number in range(1, 8)]
+    
+    windows = fact_chunking.chunk_pages(pages, max_tokens=200, overlap_tokens=20)
+    
+    assert len(windows) > 1
+    for window in windows:
+        segments = [part for part in window['text'].split('\n\n') if not re.fullmatch(r'--- Page \d+ ---', part)]
+        assert sum(len(segment) for segment in segments) <= 200 * CHARS_PER_TOKEN
+    for previous, window in zip(windows, windows[1:]):
+        # The next window starts with the tail of the previous one
+        tail = previous['text'][-20 * CHARS_PER_TOKEN:]
+        assert window['text'].split('\n\n')[1] == tail
+        assert window['first_page'] == previous['last_page']
+    assert windows[-1]['last_page'] == 7
+    assert all(f'p{number}w49' in ''.join(w['text'] for w in windows) for number in range(1, 8))
+
+
+def test_long_pages_are_split_on_whitespace():
+    windows = fact_chunking.chunk_pages([_page(4, 400)], max_tokens=100, overlap_tokens=0)
+    
+    assert len(windows) > 1
+    assert all(window['first_page'] == window['last_page'] == 4 for window in windows)
+    words = [word for window in windows for word in window['text'].split('\n\n', 1)[1].split()]
+    assert words == [f'p4w{index}' for index in range(400)]
+
+
+def test_unpaged_text_has_no_page_range():
+    windows = fact_chunking.chunk_pages([{'page': None, 'text': 'Plain text'}], max_tokens=100)
+    
+    assert windows == [{'text': 'Plain text', 'first_page': None, 'last_page': None}]
+
+
+def test_merge_ties_facts_to_pages_and_drops_duplicates():
+    windows = [
+        {'text': '', 'first_page': 1, 'last_page': 3},
+        {'text': '', 'first_page': 3, 'last_page': 3},
+        {'text': '', 'first_page': 4, 'last_page': 6},
+    ]
+    results = [
+        [
+            {'fact_text': 'Client was rear-ended.', 'page_reference': 'unknown'},
+            {'fact_text': 'ER visit on May 3', 'page_reference': 'page 2'},
+        ],
+        # Same fact with different punctuation and case, pinned to one page
+        [{'fact_text': 'client was rear ended', 'page_reference': 'page 9'}],
+        [
+            {'fact_text': 'MRI showed a herniated disc', 'page_reference': 'p. 12'},
+            {'fact_text': ''},
+            'not a fact',
+        ],
+    ]
+    
+    facts = fact_chunking.merge_facts(results, windows)
+    
+    assert facts == [
+        {'fact_text': 'client was rear ended', 'page_reference': 'page 3', 'page_number': 3},
+        {'fact_text': 'ER visit on May 3', 'page_reference': 'page 2', 'page_number': 2},
+        {'fact_text': 'MRI showed a herniated disc', 'page_reference': 'pages 4-6', 'page_number': None},
+    ]
+
+
+def test_chunked_extraction_maps_windows_concurrently(monkeypatch):
+    in_flight = {'now': 0, 'max': 0}
+    
+    async def extract(text, document_filename):
+        in_flight['now'] += 1
+        in_flight['max'] = max(in_flight['max'], in_flight['now'])
+        await asyncio.sleep(0.01)
+        in_flight['now'] -= 1
+        # Windows after the first start with the overlap from the previous page
+        last_page = re.findall(r'--- Page (\d+) ---', text)[-1]
+        return [
+            {'fact_text': 'Shared fact', 'page_reference': ''},
+            {'fact_text': f'Fact from page {last_page}', 'page_reference': f'page {last_page}'},
+        ]
+    
+    monkeypatch.setattr(fact_chunking, 'extract_facts_from_text_async', extract)
+    pages = [_page(number, 150) for number in range(1, 7)]
+    
+    facts = asyncio.run(fact_chunking.extract_facts_chunked(pages, 'records.pdf', max_tokens=250, concurrency=2))
+    
+    assert in_flight['max'] == 2
+    assert [fact['fact_text'] for fact in facts] == ['Shared fact'] + [f'Fact from page {n}' for n in range(1, 7)]
+    assert [fact['page_number'] for fact in facts[1:]] == list(range(1, 7))
@@ -0,0 +1,149 @@
+from src.services import fact_selection
+from src.services.anthropic_service import build_demand_letter_prompt
+from src.services.tokens import estimate_tokens
+
+TEMPLATE = {'sections': [
+    {'name': 'Liability', 'categories': ['liability', 'incident']},
+    {'name': 'Treatment', 'categories': ['injury', 'treatment']},
+    {'name': 'Damages', 'categories': ['financial']},
+]}
+
+# In original order; each section ranks its liability/injury facts before
+# incident/treatment ones, and facts citing numbers before vague ones
+FACTS = [
+    {'factText': 'Collision occurred at 4:15 pm on Route 9', 'category': 'incident'},
+    {'factText': 'Client attended 24 physical therapy sessions', 'category': 'treatment'},
+    {'factText': 'Defendant was cited for failure to yield', 'category': 'liability'},
+    {'factText': 'Client missed work for several weeks', 'category': 'financial'},
+    {'factText': 'Client reports ongoing neck pain', 'category': 'injury'},
+    {'factText': 'Defendant ran a red light at Main and 5th', 'category': 'liability'},
+    {'factText': 'Lost wages of $6,200', 'category': 'financial'},
+    {'factText': 'Client diagnosed with a C5 disc herniation', 'category': 'injury'},
+    {'factText': 'Weather was clear and roads were dry', 'category': 'incident'},
+    {'factText': 'Medical bills total $18,450', 'category': 'financial'},
+    {'factText': 'Client saw an orthopedic surgeon', 'category': 'treatment'},
+]
+
+
+def _texts(selection):
+    return {section['name']: [fact['factText'] for fact in section['facts']] for section in selection['sections']}
+
+
+def _tokens(*texts):
+    return sum(estimate_tokens(f'- {text}') for text in texts)
+
+
+def test_facts_within_budget_are_all_kept_in_order():
+    selection = fact_selection.select_draft_facts(FACTS, TEMPLATE, budget=10_000)
+    
+    assert _texts(selection) == {
+        'Liability': [FACTS[0]['factText'], FACTS[2]['factText'], FACTS[5]['factText'], FACTS[8]['factText']],
+        'Treatment': [FACTS[1]['factText'], FACTS[4]['factText'], FACTS[7]['factText'], FACTS[10]['factText']],
+        'Damages': [FACTS[3]['factText'], FACTS[6]['factText'], FACTS[9]['factText']],
+    }
+    assert selection['stats'] == {'facts': 11, 'collapsed': 0, 'dropped': 0, 'kept': 11, 'tokens': _tokens(*(f['factText'] for f in FACTS))}
+    assert selection['sections'][0]['lines'][0] == '- Collision occurred at 4:15 pm on Route 9'
+
+
+def test_budget_overrun_trims_every_section_evenly():
+    # Room for exactly the two best facts of each section
+    best = [
+        'Defendant ran a red light at Main and 5th', 'Defendant was cited for failure to yield',
+        'Client diagnosed with a C5 disc herniation', 'Client reports ongoing neck pain',
+        'Lost wages of $6,200', 'Medical bills total $18,450',
+    ]
+    budget = _tokens(*best)
+    
+    selection = fact_selection.select_draft_facts(FACTS, TEMPLATE, budget=budget)
+    
+    assert _texts(selection) == {
+        'Liability': ['Defendant was cited for failure to yield', 'Defendant ran a red light at Main and 5th'],
+        'Treatment': ['Client reports ongoing neck pain', 'Client diagnosed with a C5 disc herniation'],
+        'Damages': ['Lost wages of $6,200', 'Medical bills total $18,450'],
+    }
+    assert selection['stats']['tokens'] == budget
+    assert selection['stats']['dropped'] == 5
+
+
+def test_a_tiny_budget_still_keeps_each_sections_best_fact():
+    budget = _tokens('Defendant ran a red light at Main and 5th', 'Client diagnosed with a C5 disc herniation', 'Lost wages of $6,200')
+    
+    selection = fact_selection.select_draft_facts(FACTS, TEMPLATE, budget=budget)
+    
+    assert _texts(selection) == {
+        'Liability': ['Defendant ran a red light at Main and 5th'],
+        'Treatment': ['Client diagnosed with a C5 disc herniation'],
+        'Damages': ['Lost wages of $6,200'],
+    }
+
+
+def test_template_sections_claim_categories_by_name():
+    sections = fact_selection.template_sections({'sections': [
+        'Statement of Facts', {'title': 'Medical Treatment'}, {'name': 'Special Damages'}, {'name': 'Demand', 'categories': []},
+    ]})
+    
+    assert sections == [
+        {'name': 'Statement of Facts', 'categories': ['liability', 'incident'], 'query': 'Statement of Facts'},
+        {'name': 'Medical Treatment', 'categories': ['injury', 'treatment'], 'query': 'Medical Treatment'},
+        {'name': 'Special Damages', 'categories': ['financial'], 'query': 'Special Damages'},
+        {'name': 'Demand', 'categories': [], 'query': 'Demand'},
+    ]
+    assert [section['name'] for section in fact_selection.template_sections({})] == ['Liability', 'Treatment', 'Damages', 'Demand']
+
+
+def test_uncategorized_facts_are_classified_by_keywords():
+    assert fact_selection.fact_category({'factText': 'MRI of the lumbar spine on June 2'}) == 'treatment'
+    assert fact_selection.fact_category({'factText': 'Repair estimate of $4,300'}) == 'financial'
+    assert fact_selection.fact_category({'factText': 'Client is a school teacher'}) == 'other'
+    assert fact_selection.fact_category({'factText': 'Anything', 'category': 'Liability'}) == 'liability'
+
+
+def test_restated_facts_collapse_into_the_most_detailed_copy():
+    facts = [
+        {'factText': 'Client was rear-ended by the defendant on May 3, 2024', 'citation': 'police.pdf, page 2'},
+        {'factText': 'Client was treated at Mercy Hospital on May 3, 2024'},
+        {'factText': 'The client was rear-ended by the defendant driver on May 3, 2024.', 'citation': 'statement.pdf, page 1'},
+        # Similar wording, but different amounts are different facts
+        {'factText': 'Medical bills total $18,450'},
+        {'factText': 'Medical bills total $18,540'},
+    ]
+    
+    kept = fact_selection.collapse_duplicates(facts, threshold=0.6)
+    
+    assert kept == [
+        {
+            'factText': 'The client was rear-ended by the defendant driver on May 3, 2024.',
+            'citation': 'police.pdf, page 2; statement.pdf, page 1',
+        },
+        facts[1],
+        facts[3],
+        facts[4],
+    ]
+
+
+def test_open_sections_retrieve_similar_facts():
+    template = {'sections': [
+        {'name': 'Liability', 'categories': ['liability']},
+        {'name': 'Damages', 'categories': ['financial']},
+        {'name': 'Future Care', 'categories': [], 'description': 'physical therapy and surgery recommended'},
+    ]}
+    facts = [
+        {'factText': 'Defendant ran a red light at Main and 5th', 'category': 'liability'},
+        {'factText': 'Medical bills total $18,450', 'category': 'financial'},
+        {'factText': 'Surgery recommended for the C5 disc herniation', 'category': 'treatment'},
+    ]
+    
+    selection = fact_selection.select_draft_facts(facts, template, budget=10_000)
+    
+    assert _texts(selection)['Future Care'][0] == 'Surgery recommended for the C5 disc herniation'
+    assert selection['stats']['kept'] == 3
+
+
+def test_draft_prompt_lists_facts_by_section():
+    prompt = build_demand_letter_prompt(FACTS[:3], template_structure=TEMPLATE, template_content='Standard PI letter')
+    
+    assert 'Follow the template above.' in prompt
+    assert 'Standard PI letter' not in prompt
+    assert 'in order: Liability, Treatment, Damages.' in prompt
+    assert 'LIABILITY:\n- Collision occurred at 4:15 pm on Route 9\n- Defendant was cited for failure to yield' in prompt
+    assert 'DAMAGES:\n- (no specific facts)' in prompt
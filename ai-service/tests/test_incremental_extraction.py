@@ -0,0 +1,64 @@
+import io
+
+import pytest
+
+from pdf_builder import indirect_objects_pdf, text_pdf
+from src.services import ocr
+from src.services.incremental_extraction import extract_text_incremental, page_fingerprints
+from src.services.pdf_engines import is_available
+
+
+def test_fingerprints_are_stable_across_reopens():
+    pdf_bytes = indirect_objects_pdf()
+    
+    first = page_fingerprints(pdf_bytes, 'pypdf')
+    second = page_fingerprints(io.BytesIO(pdf_bytes), 'pypdf')
+    
+    assert first == second
+    assert first[0] != first[1]
+
+
+def test_fingerprints_follow_resolved_font_widths():
+    pdf_bytes = indirect_objects_pdf()
+    # Same length, so the xref offsets stay valid
+    narrower = pdf_bytes.replace(b'556 556', b'500 556', 1)
+    assert narrower != pdf_bytes
+    
+    assert page_fingerprints(pdf_bytes, 'pypdf') != page_fingerprints(narrower, 'pypdf')
+
+
+def test_unchanged_pages_are_reused_on_reextraction():
+    pdf_bytes = indirect_objects_pdf(pages=3)
+    first = extract_text_incremental([], io.BytesIO(pdf_bytes), engine='pypdf')
+    assert first['success']
+    stored = first['page_changes']['rows']
+    
+    second = extract_text_incremental(stored, io.BytesIO(pdf_bytes), engine='pypdf')
+    
+    assert second['success']
+    assert second['extracted_pages'] == 0
+    assert second['reused_pages'] == 3
+    assert second['page_changes']['rows'] == []
+    assert second['text'] == first['text']
+
+
+@pytest.mark.skipif(not is_available('pdfium'), reason='pypdfium2 is not installed')
+def test_pages_stored_without_ocr_are_ocred_once_ocr_is_on(fake_tesseract, monkeypatch):
+    pdf_bytes = text_pdf(['Page 1 of the medical records', ''])
+    monkeypatch.setattr(ocr, 'PDF_OCR', 'false')
+    first = extract_text_incremental([], io.BytesIO(pdf_bytes), engine='pypdf')
+    stored = first['page_changes']['rows']
+    assert [row['text'] for row in stored] == ['Page 1 of the medical records', '']
+    
+    monkeypatch.setattr(ocr, 'PDF_OCR', 'auto')
+    second = extract_text_incremental(stored, io.BytesIO(pdf_bytes), engine='pypdf')
+    
+    assert second['success']
+    assert second['ocr']['pages'] == 1
+    assert [row['text'] for row in second['page_changes']['rows']] == [
+        'Page 1 of the medical records', 'Emergency department discharge summary',
+    ]
+    
+    # Stored OCR text is reused while the OCR settings stay the same
+    third = extract_text_incremental(second['page_changes']['rows'], io.BytesIO(pdf_bytes), engine='pypdf')
+    assert third['reused_pages'] == 2 and third['page_changes']['rows'] == []
@@ -0,0 +1,140 @@
+import json
+import time
+
+import pytest
+
+from src.services import database_service, job_queue
+from src.services.job_queue import FAILED, RETRYING, SUCCEEDED, JobQueue, MemoryJobStore
+
+
+def _response(status: int, body: dict) -> dict:
+    return {'statusCode': status, 'body': json.dumps(body)}
+
+
+def _run_next(queue: JobQueue) -> dict:
+    """Claim and run one job on the calling thread"""
+    job = queue.store.claim()
+    assert job is not None
+    queue._run(job)
+    return queue.store.get(job['id'])
+
+
+@pytest.fixture(autouse=True)
+def immediate_retries(monkeypatch):
+    monkeypatch.setattr(job_queue, 'retry_delay', lambda attempt: 0.0)
+
+
+def test_server_errors_are_retried_until_success():
+    outcomes = [_response(500, {'error': 'database unavailable'}), _response(200, {'success': True})]
+    queue = JobQueue(MemoryJobStore(), {'extract_text': lambda payload: outcomes.pop(0)}, max_attempts=3)
+    queue.store.add(_new_job('extract_text'))
+    
+    failed = _run_next(queue)
+    assert failed['status'] == RETRYING
+    assert failed['error'] == 'database unavailable'
+    
+    done = _run_next(queue)
+    assert done['status'] == SUCCEEDED
+    assert done['attempts'] == 2
+    assert done['result'] == {'success': True}
+
+
+def test_client_errors_fail_without_retrying():
+    calls = []
+    
+    def handler(payload):
+        calls.append(payload)
+        return _response(400, {'error': 'Missing pdfId or s3Key'})
+    
+    queue = JobQueue(MemoryJobStore(), {'extract_text': handler}, max_attempts=3)
+    queue.store.add(_new_job('extract_text'))
+    
+    done = _run_next(queue)
+    
+    assert done['status'] == FAILED
+    assert done['error'] == 'Missing pdfId or s3Key'
+    assert len(calls) == 1
+    assert queue.store.claim() is None
+
+
+def test_exceptions_fail_after_max_attempts():
+    def handler(payload):
+        raise RuntimeError('pdf engine crashed')
+    
+    queue = JobQueue(MemoryJobStore(), {'extract_text': handler}, max_attempts=2)
+    queue.store.add(_new_job('extract_text'))
+    
+    assert _run_next(queue)['status'] == RETRYING
+    done = _run_next(queue)
+    
+    assert done['status'] == FAILED
+    assert done['attempts'] == 2
+    assert done['error'] == 'pdf engine crashed'
+
+
+def test_waiting_jobs_age_past_smaller_new_ones():
+    store = MemoryJobStore(aging_per_second=1000)
+    now = time.time()
+    store.add(_new_job('extract_text', priority=50_000, created_at=now - 60))
+    store.add(_new_job('extract_text', priority=100, created_at=now))
+    store.add(_new_job('extract_text', priority=80_000, created_at=now - 60))
+    
+    # 50 kB queued a minute ago ranks as 50000 - 60000 < 100
+    assert [store.claim()['priority'] for _ in range(3)] == [50_000, 100, 80_000]
+
+
+def test_without_aging_smallest_runs_first():
+    store = MemoryJobStore(aging_per_second=0)
+    now = time.time()
+    store.add(_new_job('extract_text', priority=50_000, created_at=now - 60))
+    store.add(_new_job('extract_text', priority=100, created_at=now))
+    
+    assert store.claim()['priority'] == 100
+
+
+def test_start_recovers_expired_jobs_once(monkeypatch):
+    recovered = []
+    
+    class Store(MemoryJobStore):
+        def recover(self, max_attempts):
+            recovered.append(max_attempts)
+            return {'requeued': 1, 'failed': 0}
+    
+    queue = JobQueue(Store(), {}, workers=1, max_attempts=4)
+    queue.start()
+    queue.start()
+    
+    assert recovered == [4]
+    assert len(queue._threads) == 1
+
+
+def test_recover_expired_jobs_sql(sql_cursor, monkeypatch):
+    monkeypatch.setattr(database_service, 'run_with_reconnect', lambda work: work(sql_cursor))
+    
+    assert database_service.recover_expired_jobs(3) == {'requeued': 0, 'failed': 0}
+    statement = sql_cursor.statements[0]
+    assert "WHEN attempts >= 3 THEN 'failed' ELSE 'retrying'" in statement
+    assert "WHERE status = 'running' AND locked_until < NOW()" in statement
+
+
+def test_claim_job_sql_orders_by_aged_priority(sql_cursor, monkeypatch):
+    monkeypatch.setattr(database_service, 'run_with_reconnect', lambda work: work(sql_cursor))
+    
+    assert database_service.claim_job(900, 1048576) is None
+    assert 'ORDER BY priority + 1048576 * EXTRACT(EPOCH FROM created_at), created_at' in sql_cursor.statements[0]
+
+
+def _new_job(operation: str, priority: int = 0, created_at: float = None) -> dict:
+    return {
+        'id': f'job-{time.perf_counter_ns()}',
+        'operation': operation,
+        'payload': {},
+        'priority': priority,
+        'status': 'queued',
+        'attempts': 0,
+        'result': None,
+        'error': None,
+        'created_at': time.time() if created_at is None else created_at,
+        'started_at': None,
+        'finished_at': None,
+    }
@@ -0,0 +1,298 @@
+import asyncio
+import io
+import json
+import threading
+
+import pytest
+
+import lambda_handler
+from pdf_builder import indirect_objects_pdf, text_pdf
+from src.services import database_service, fact_chunking, incremental_extraction, s3_service
+
+
+@pytest.fixture
+def stored(monkeypatch):
+    """Serve a hand-built PDF from 'S3' and record page writes instead of hitting Postgres"""
+    writes = {'save_pdf_pages': [], 'ok': True}
+    monkeypatch.setattr(s3_service, 'download_from_s3_to_file', lambda key: io.BytesIO(indirect_objects_pdf()))
+    monkeypatch.setattr(incremental_extraction, 'PDF_INCREMENTAL_EXTRACTION', True)
+    monkeypatch.setattr(database_service, 'get_pdf_pages', lambda pdf_id: [])
+    
+    def save_pdf_pages(pdf_id, page_count, rows, append_text=None):
+        writes['save_pdf_pages'].append((pdf_id, page_count, rows))
+        return writes['ok']
+    
+    monkeypatch.setattr(database_service, 'save_pdf_pages', save_pdf_pages)
+    return writes
+
+
+def test_extract_text_returns_counts_without_text(stored):
+    response = lambda_handler.handle_extract_text({'pdfId': 'pdf-1', 's3Key': 'case/records.pdf'})
+    
+    assert response['statusCode'] == 200
+    body = json.loads(response['body'])
+    assert 'text' not in body
+    assert body['pdfId'] == 'pdf-1'
+    assert body['page_count'] == 2
+    assert body['pages_with_text'] == 2
+    assert [row['page_number'] for row in stored['save_pdf_pages'][0][2]] == [1, 2]
+
+
+def test_extract_text_fails_when_pages_are_not_stored(stored):
+    stored['ok'] = False
+    
+    response = lambda_handler.handle_extract_text({'pdfId': 'pdf-1', 's3Key': 'case/records.pdf'})
+    
+    assert response['statusCode'] == 500
+    assert 'Failed to store' in json.loads(response['body'])['error']
+
+
+def test_extract_text_requires_pdf_id_and_key():
+    response = lambda_handler.handle_extract_text({'pdfId': 'pdf-1'})
+    
+    assert response['statusCode'] == 400
+
+
+def test_streamed_text_reports_failed_writes(monkeypatch):
+    monkeypatch.setattr(database_service, 'clear_pdf_pages', lambda pdf_id: True)
+    monkeypatch.setattr(database_service, 'append_pdf_extracted_text', lambda *args, **kwargs: True)
+    monkeypatch.setattr(database_service, 'store_pdf_page_rows', lambda pdf_id, rows: False)
+    
+    records = [json.loads(line) for line in lambda_handler._stream_pdf_pages('pdf-1', io.BytesIO(indirect_objects_pdf()))]
+    
+    assert records[-1]['event'] == 'error'
+    assert 'Failed to store' in records[-1]['error']
+
+
+@pytest.fixture
+def page_range(monkeypatch):
+    """Serve a 250-page PDF whose even pages are stored, recording the ranges read"""
+    reads = []
+    
+    def get_pdf_page_range(pdf_id, first_page, last_page):
+        reads.append((first_page, last_page))
+        if pdf_id != 'pdf-1':
+            return None
+        pages = [
+            {'page': number, 'text': f'Page {number}'}
+            for number in range(first_page, min(last_page, 250) + 1) if number % 2 == 0
+        ]
+        return {'page_count': 250, 'stored_pages': 125, 'pages': pages}
+    
+    monkeypatch.setattr(database_service, 'get_pdf_page_range', get_pdf_page_range)
+    return reads
+
+
+def _get_pages(payload):
+    response = lambda_handler.handle_get_pages(payload)
+    return response['statusCode'], json.loads(response['body'])
+
+
+def test_page_ranges_are_capped_with_a_cursor(page_range):
+    status, body = _get_pages({'pdfId': 'pdf-1'})
+    
+    assert status == 200
+    assert page_range == [(1, lambda_handler.PAGE_FETCH_MAX_PAGES)]
+    assert body['startPage'] == 1 and body['endPage'] == 100
+    assert body['pages'][0] == {'page': 2, 'text': 'Page 2'}
+    assert len(body['pages']) == 50
+    assert body['nextPage'] == 101
+
+
+def test_the_last_range_has_no_next_page(page_range):
+    status, body = _get_pages({'pdfId': 'pdf-1', 'startPage': 201, 'endPage': 900})
+    
+    assert status == 200
+    assert page_range == [(201, 300)]
+    assert body['pages'][-1] == {'page': 250, 'text': 'Page 250'}
+    assert body['nextPage'] is None
+
+
+@pytest.mark.parametrize('payload, status', [
+    ({}, 400),
+    ({'pdfId': 'pdf-1', 'startPage': 5, 'endPage': 4}, 400),
+    ({'pdfId': 'pdf-missing'}, 404),
+])
+def test_bad_page_requests(page_range, payload, status):
+    assert _get_pages(payload)[0] == status
+
+
+def test_page_range_reads_stored_pages(database):
+    with database.cursor() as cursor:
+        cursor.execute("INSERT INTO pdfs (id, document_id, filename, s3_key, page_count) VALUES ('pdf-1', 'doc-1', 'a.pdf', 'a', 4)")
+        cursor.executemany(
+            "INSERT INTO pdf_pages (pdf_id, page_number, fingerprint, text) VALUES ('pdf-1', %s, '', %s)",
+            [(1, 'First'), (3, 'Third'), (4, 'Fourth')],
+        )
+    
+    assert database_service.get_pdf_page_range('pdf-1', 2, 3) == {
+        'page_count': 4,
+        'stored_pages': 3,
+        'pages': [{'page': 3, 'text': 'Third'}],
+    }
+    assert database_service.get_pdf_page_range('pdf-missing', 1, 3) is None
+
+
+def test_batch_items_read_their_stored_pages(monkeypatch):
+    monkeypatch.setattr(database_service, 'get_pdf_pages', lambda pdf_id: [
+        {'page_number': 1, 'fingerprint': '', 'text': 'Rear-ended on I-5'},
+        {'page_number': 2, 'fingerprint': '', 'text': ''},
+        {'page_number': 3, 'fingerprint': '', 'text': 'Lumbar strain'},
+    ])
+    chunked = []
+    
+    async def extract_facts_chunked(pages, filename):
+        chunked.append((pages, filename))
+        return [{'fact_text': 'Rear-ended on I-5', 'page_number': 1}]
+    
+    monkeypatch.setattr(fact_chunking, 'extract_facts_chunked', extract_facts_chunked)
+    
+    result = asyncio.run(lambda_handler._extract_facts_for_item({'pdfId': 'pdf-1', 'pdfFilename': 'police.pdf'}))
+    
+    assert result == {'pdfId': 'pdf-1', 'success': True, 'facts': [{'fact_text': 'Rear-ended on I-5', 'page_number': 1}]}
+    assert chunked == [([{'page': 1, 'text': 'Rear-ended on I-5'}, {'page': 3, 'text': 'Lumbar strain'}], 'police.pdf')]
+
+
+def test_batch_items_without_pages_or_keys_fail(monkeypatch):
+    monkeypatch.setattr(database_service, 'get_pdf_pages', lambda pdf_id: [])
+    
+    result = asyncio.run(lambda_handler._extract_facts_for_item({'pdfId': 'pdf-1'}))
+    
+    assert result == {'pdfId': 'pdf-1', 'success': False, 'error': 'No extracted pages, pdfText or s3Key'}
+
+
+@pytest.fixture
+def case(monkeypatch):
+    """
+    Stub the stores behind process_case: 'S3' serves one PDF per key,
+    pdf-stored already has page records and page writes are recorded
+    """
+    case = {'stored': [], 'downloads': [], 'on_download': {}, 'ok': True}
+    pdfs = {
+        'case/police.pdf': text_pdf(['Police report page 1', 'Police report page 2']),
+        'case/records.pdf': text_pdf(['Records page 1', '', 'Records page 3']),
+    }
+    
+    def download_from_s3_to_file(key):
+        case['downloads'].append(key)
+        case['on_download'].get(key, lambda: None)()
+        return io.BytesIO(pdfs[key]) if key in pdfs else None
+    
+    def get_pdf_pages(pdf_id):
+        if pdf_id != 'pdf-stored':
+            return []
+        return [{'page_number': 1, 'fingerprint': 'f1', 'text': 'Stored page 1'}]
+    
+    def save_pdf_pages(pdf_id, page_count, rows, append_text=None):
+        case['stored'].append((pdf_id, page_count))
+        return case['ok']
+    
+    async def extract_facts_chunked(pages, filename):
+        return [{'fact_text': f'{filename} says {page["text"]}', 'page_number': page['page']} for page in pages]
+    
+    monkeypatch.setattr(s3_service, 'download_from_s3_to_file', download_from_s3_to_file)
+    monkeypatch.setattr(database_service, 'get_pdf_pages', get_pdf_pages)
+    monkeypatch.setattr(database_service, 'save_pdf_pages', save_pdf_pages)
+    monkeypatch.setattr(database_service, 'clear_pdf_pages', lambda pdf_id: True)
+    monkeypatch.setattr(database_service, 'store_pdf_page_rows', lambda pdf_id, rows: True)
+    monkeypatch.setattr(database_service, 'update_pdf_extracted_text', lambda pdf_id, text, page_count: True)
+    monkeypatch.setattr(fact_chunking, 'extract_facts_chunked', extract_facts_chunked)
+    return case
+
+
+CASE = {
+    'documentId': 'doc-1',
+    'pdfs': [
+        {'pdfId': 'pdf-police', 's3Key': 'case/police.pdf', 'pdfFilename': 'police.pdf'},
+        {'pdfId': 'pdf-stored', 's3Key': 'case/stored.pdf', 'pdfFilename': 'stored.pdf'},
+    ],
+    's3Keys': ['case/records.pdf', 'case/missing.pdf'],
+}
+
+
+async def _stream(payload):
+    event = {'operation': 'process_case', 'payload': payload}
+    return [json.loads(line) async for line in lambda_handler.lambda_stream_handler(event)]
+
+
+def test_case_stream_reports_each_stage_then_each_pdf(case):
+    events = asyncio.run(_stream(CASE))
+    
+    assert events[0] == {'event': 'start', 'documentId': 'doc-1', 'total': 4}
+    assert events[-1]['event'] == 'done'
+    assert (events[-1]['succeeded'], events[-1]['failed']) == (3, 1)
+    
+    progress = {}
+    for event in events[1:-1]:
+        progress.setdefault(event['s3Key'], []).append(event['stage'] if event['event'] == 'stage' else 'item')
+    assert progress == {
+        'case/police.pdf': ['download', 'extract', 'facts', 'item'],
+        'case/stored.pdf': ['load_pages', 'facts', 'item'],
+        'case/records.pdf': ['download', 'extract', 'facts', 'item'],
+        'case/missing.pdf': ['item'],
+    }
+    
+    items = {event['s3Key']: event for event in events if event['event'] == 'item'}
+    assert [fact['fact_text'] for fact in items['case/stored.pdf']['facts']] == ['stored.pdf says Stored page 1']
+    assert [fact['page_number'] for fact in items['case/records.pdf']['facts']] == [1, 3]
+    assert items['case/missing.pdf'] == {
+        'event': 'item', 'pdfId': None, 's3Key': 'case/missing.pdf', 'success': False,
+        'stage': 'download', 'error': 'Failed to download PDF from S3',
+    }
+    # Stored pages are reused, and only PDFs with a record store their pages
+    assert 'case/stored.pdf' not in case['downloads']
+    assert case['stored'] == [('pdf-police', 2)]
+    # Page text never leaves the service
+    assert not any('text' in event for event in events)
+
+
+def test_case_pdfs_whose_pages_are_not_stored_fail_at_extract(case):
+    case['ok'] = False
+    
+    events = asyncio.run(_stream({'pdfs': [{'pdfId': 'pdf-police', 's3Key': 'case/police.pdf'}]}))
+    
+    item = next(event for event in events if event['event'] == 'item')
+    assert (item['success'], item['stage']) == (False, 'extract')
+    assert 'Failed to store' in item['error']
+
+
+def test_facts_are_extracted_while_later_pdfs_download(case, monkeypatch):
+    monkeypatch.setattr(lambda_handler, 'CASE_DOWNLOAD_CONCURRENCY', 1)
+    facts_started = threading.Event()
+    # The second download only finishes once the first PDF reached fact extraction
+    case['on_download']['case/records.pdf'] = lambda: facts_started.wait(timeout=5)
+    extract_facts_chunked = fact_chunking.extract_facts_chunked
+    
+    async def tracking(pages, filename):
+        facts_started.set()
+        return await extract_facts_chunked(pages, filename)
+    
+    monkeypatch.setattr(fact_chunking, 'extract_facts_chunked', tracking)
+    
+    events = asyncio.run(_stream({'s3Keys': ['case/police.pdf', 'case/records.pdf']}))
+    
+    order = [(event['s3Key'], event['stage']) for event in events if event['event'] == 'stage']
+    assert order.index(('case/police.pdf', 'facts')) < order.index(('case/records.pdf', 'download'))
+
+
+def test_case_response_collapses_facts_and_sums_stages(case, monkeypatch):
+    async def extract_facts_chunked(pages, filename):
+        return [{'fact_text': 'Client was rear-ended on May 3, 2024', 'page_number': pages[0]['page']}]
+    
+    monkeypatch.setattr(fact_chunking, 'extract_facts_chunked', extract_facts_chunked)
+    
+    response = asyncio.run(lambda_handler.handle_process_case(CASE))
+    
+    assert response['statusCode'] == 200
+    body = json.loads(response['body'])
+    assert (body['succeeded'], body['failed'], body['collapsed']) == (3, 1, 2)
+    assert {name: stats['count'] for name, stats in body['stages'].items()} == {
+        'download': 2, 'extract': 2, 'load_pages': 1, 'facts': 3,
+    }
+
+
+def test_cases_without_pdfs_are_rejected():
+    response = asyncio.run(lambda_handler.handle_process_case({'documentId': 'doc-1'}))
+    
+    assert response['statusCode'] == 400
+    assert asyncio.run(_stream({})) == [{'event': 'error', 'error': 'Missing pdfs or s3Keys'}]
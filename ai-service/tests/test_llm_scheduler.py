@@ -0,0 +1,195 @@
+from types import SimpleNamespace
+
+import pytest
+
+from src.services import llm_scheduler
+from src.services.llm_scheduler import LLMScheduler, LLMThrottledError, TokenBucket
+
+
+class FakeClock:
+    """time stand-in whose sleep advances monotonic instead of blocking"""
+    
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+    
+    def monotonic(self):
+        return self.now
+    
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class APIError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(f'status {status_code}')
+        self.status_code = status_code
+        self.response = SimpleNamespace(headers=headers or {})
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(llm_scheduler, 'time', clock)
+    # Backoff at the top of its jitter range makes delays predictable
+    monkeypatch.setattr(llm_scheduler.random, 'uniform', lambda low, high: high)
+    return clock
+
+
+def _raw(headers=None, value='ok'):
+    return SimpleNamespace(headers=headers or {}, parse=lambda: value)
+
+
+def test_bucket_starts_full_and_refills_over_time(clock):
+    bucket = TokenBucket(60)
+    
+    assert bucket.wait_seconds(60) == 0
+    bucket.take(60)
+    assert bucket.wait_seconds(1) == pytest.approx(1.0)
+    clock.now += 30
+    assert bucket.wait_seconds(30) == 0
+    assert bucket.wait_seconds(31) == pytest.approx(1.0)
+    clock.now += 120
+    # Never holds more than one minute of allowance
+    assert bucket.level <= 60 and bucket.wait_seconds(60) == 0
+
+
+def test_bucket_follows_server_limits(clock):
+    bucket = TokenBucket(1000)
+    
+    bucket.cap(100)
+    assert bucket.wait_seconds(400) == pytest.approx(300 * 60 / 1000)
+    bucket.set_rate(50)
+    assert bucket.per_minute == 50 and bucket.level == 50
+    # Requests larger than a minute of allowance wait for a full bucket, not forever
+    assert bucket.wait_seconds(10_000) == 0
+
+
+def test_token_budget_paces_admission(clock):
+    scheduler = LLMScheduler(requests_per_minute=100, input_tokens_per_minute=6000, max_concurrency=4)
+    
+    scheduler.acquire(6000, key='a')
+    scheduler.release()
+    waiter = llm_scheduler._Waiter(3000, 'a', lambda: None)
+    scheduler._enqueue(waiter)
+    
+    assert scheduler._attempt(waiter) == pytest.approx(30.0)
+    clock.now += 30
+    assert scheduler._attempt(waiter) is None
+
+
+def test_throttling_honors_retry_after(clock):
+    scheduler = LLMScheduler(max_concurrency=8, max_retries=3)
+    scheduler.acquire(10, key='a')
+    
+    delay = scheduler.release_error(APIError(429, {'retry-after': '7'}), attempt=0)
+    
+    assert delay == 7
+    assert scheduler.concurrency == 2
+    assert scheduler.paused_until == clock.now + 7
+    waiter = llm_scheduler._Waiter(10, 'a', lambda: None)
+    scheduler._enqueue(waiter)
+    assert scheduler._attempt(waiter) == 7
+    clock.now += 7
+    assert scheduler._attempt(waiter) is None
+
+
+def test_retry_after_ms_takes_precedence(clock):
+    scheduler = LLMScheduler(max_retries=3)
+    scheduler.acquire(10, key='a')
+    
+    delay = scheduler.release_error(APIError(529, {'retry-after-ms': '2500', 'retry-after': '9'}), attempt=0)
+    
+    assert delay == 2.5
+
+
+def test_backoff_grows_when_retry_after_is_shorter(clock):
+    scheduler = LLMScheduler(max_retries=5)
+    scheduler.acquire(10, key='a')
+    
+    delay = scheduler.release_error(APIError(429, {'retry-after': '1'}), attempt=3)
+    
+    assert delay == llm_scheduler.LLM_RETRY_BASE_SECONDS * 2 ** 3
+
+
+def test_calls_retry_until_the_api_recovers(clock):
+    scheduler = LLMScheduler(max_retries=3)
+    responses = [APIError(529, {'retry-after': '2'}), APIError(503), _raw(value='message')]
+    
+    def request():
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+    
+    assert scheduler.call(request, 100, key='a') == 'message'
+    assert clock.sleeps == [2, llm_scheduler.LLM_RETRY_BASE_SECONDS * 2]
+    assert scheduler.stats['retries'] == 2 and scheduler.stats['throttled'] == 1
+    assert scheduler.active == 0
+
+
+def test_persistent_throttling_raises(clock):
+    scheduler = LLMScheduler(max_retries=2)
+    
+    def request():
+        raise APIError(429)
+    
+    with pytest.raises(LLMThrottledError):
+        scheduler.call(request, 100, key='a')
+    assert len(clock.sleeps) == 2
+    assert scheduler.active == 0
+
+
+def test_client_errors_are_not_retried(clock):
+    scheduler = LLMScheduler(max_retries=3)
+    
+    def request():
+        raise APIError(400)
+    
+    with pytest.raises(APIError):
+        scheduler.call(request, 100, key='a')
+    assert clock.sleeps == []
+    assert scheduler.stats['failed'] == 1
+
+
+def test_rate_limit_headers_set_the_buckets(clock):
+    scheduler = LLMScheduler(requests_per_minute=50, input_tokens_per_minute=50000, max_concurrency=8)
+    start = scheduler.concurrency
+    
+    scheduler.call(lambda: _raw({
+        'anthropic-ratelimit-requests-limit': '4000',
+        'anthropic-ratelimit-requests-remaining': '3999',
+        'anthropic-ratelimit-input-tokens-limit': '400000',
+        'anthropic-ratelimit-input-tokens-remaining': '390000',
+    }), 100, key='a')
+    assert scheduler.requests.per_minute == 4000
+    assert scheduler.input_tokens.per_minute == 400000
+    assert scheduler.concurrency > start
+    
+    grown = scheduler.concurrency
+    scheduler.call(lambda: _raw({
+        'anthropic-ratelimit-input-tokens-limit': '400000',
+        'anthropic-ratelimit-input-tokens-remaining': '1000',
+    }), 100, key='a')
+    # Running low holds concurrency and drains the local bucket to match
+    assert scheduler.concurrency == grown
+    assert scheduler.input_tokens.level == 1000
+
+
+def test_waiters_are_served_round_robin(clock):
+    scheduler = LLMScheduler(requests_per_minute=0, input_tokens_per_minute=0, max_concurrency=1)
+    batch = [llm_scheduler._Waiter(10, 'batch', lambda: None) for _ in range(3)]
+    draft = llm_scheduler._Waiter(10, 'draft', lambda: None)
+    for waiter in batch:
+        scheduler._enqueue(waiter)
+    scheduler._enqueue(draft)
+    
+    order = []
+    for _ in range(4):
+        waiter = next(w for w in batch + [draft] if w not in order and scheduler._head() is w)
+        assert scheduler._attempt(waiter) is None
+        order.append(waiter)
+        scheduler.release()
+    
+    assert order == [batch[0], draft, batch[1], batch[2]]
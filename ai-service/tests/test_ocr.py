@@ -0,0 +1,45 @@
+import pytest
+
+from pdf_builder import indirect_objects_pdf
+from src.services import ocr
+from src.services.pdf_engines import is_available
+
+pytestmark = pytest.mark.skipif(not is_available('pdfium'), reason='pypdfium2 is not installed')
+
+
+def test_ocr_pages_recognizes_and_caches_across_readers(fake_tesseract):
+    pdf_bytes = indirect_objects_pdf()
+    
+    first = ocr.ocr_pages(pdf_bytes, [0, 1], workers=1)
+    # A fresh reader over the same bytes must produce the same cache keys
+    second = ocr.ocr_pages(pdf_bytes, [0, 1], workers=1)
+    
+    assert first[0]['text'] == 'Emergency department discharge summary'
+    assert not first[0]['cached'] and not first[1]['cached']
+    assert second[0]['cached'] and second[1]['cached']
+    assert second[0]['text'] == first[0]['text']
+
+
+def test_ocr_version_reflects_settings(fake_tesseract):
+    assert ocr.ocr_enabled()
+    assert ocr.ocr_version().startswith('tesseract-5.3.0:')
+
+
+def test_needs_ocr_uses_min_chars():
+    assert ocr.needs_ocr('  \n ')
+    assert not ocr.needs_ocr('Patient presented with neck pain after the collision')
+
+
+def test_skipped_pages_are_reported_when_tesseract_is_missing(monkeypatch, capsys):
+    monkeypatch.setattr(ocr, 'OCR_TESSERACT_CMD', 'no-such-tesseract')
+    monkeypatch.setattr(ocr, 'PDF_OCR', 'auto')
+    ocr.tesseract_version.cache_clear()
+    try:
+        assert not ocr.ocr_enabled()
+        ocr.report_skipped_pages(3)
+    finally:
+        ocr.tesseract_version.cache_clear()
+    
+    output = capsys.readouterr().out
+    assert '3 pages have no text layer and were not OCRed' in output
+    assert 'tesseract (no-such-tesseract)' in output
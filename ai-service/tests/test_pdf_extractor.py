@@ -0,0 +1,62 @@
+import tempfile
+
+from pdf_builder import text_pdf
+from src.services import pdf_extractor
+
+
+def _records(count, blank=()):
+    return text_pdf(['' if number in blank else f'Page {number} of the medical records' for number in range(1, count + 1)])
+
+
+def test_parallel_extraction_matches_serial():
+    pdf = _records(23, blank={7})
+    
+    serial = pdf_extractor.extract_text_from_pdf(pdf, parallel=False)
+    parallel = pdf_extractor.extract_text_from_pdf(pdf, parallel=True, max_workers=3, min_pages=1)
+    
+    assert serial['success'] and serial['page_count'] == 23
+    # Pages without text are skipped but keep their numbering
+    assert [page['page'] for page in serial['pages']] == [number for number in range(1, 24) if number != 7]
+    assert parallel == serial
+
+
+def test_parallel_extraction_from_a_file_path_matches_serial(tmp_path, monkeypatch):
+    path = tmp_path / 'records.pdf'
+    path.write_bytes(_records(9))
+    
+    serial = pdf_extractor.extract_text_from_file_path(str(path), parallel=False)
+    monkeypatch.setattr(pdf_extractor, 'PDF_PARALLEL_MIN_PAGES', 1)
+    monkeypatch.setattr(pdf_extractor, 'PDF_EXTRACT_WORKERS', 2)
+    parallel = pdf_extractor.extract_text_from_file_path(str(path), parallel=True)
+    
+    assert serial['page_count'] == 9
+    assert parallel == serial
+
+
+def test_short_pdfs_stay_serial(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError('parallel extraction used below min_pages')
+    
+    monkeypatch.setattr(pdf_extractor, '_extract_pages_parallel', fail)
+    
+    result = pdf_extractor.extract_text_from_pdf(_records(3), parallel=True, max_workers=4, min_pages=4)
+    
+    assert result['success']
+    assert result['text'] == '\n\n'.join(f'Page {number} of the medical records' for number in range(1, 4))
+
+
+def test_files_are_extracted_in_place(tmp_path):
+    pdf = _records(12, blank={3})
+    path = tmp_path / 'records.pdf'
+    path.write_bytes(pdf)
+    expected = pdf_extractor.extract_text_from_pdf(pdf, parallel=False)
+    
+    # Workers re-open a named file by path and a spooled one from a copy of its bytes
+    with open(path, 'rb') as named:
+        assert pdf_extractor.extract_text_from_pdf(named, parallel=True, max_workers=2, min_pages=1) == expected
+    with tempfile.SpooledTemporaryFile() as spooled:
+        spooled.write(pdf)
+        spooled.seek(0)
+        assert pdf_extractor.extract_text_from_pdf(spooled, parallel=True, max_workers=2, min_pages=1) == expected
+        spooled.seek(0)
+        assert pdf_extractor.extract_text_from_pdf(spooled, parallel=False) == expected
@@ -0,0 +1,172 @@
+import json
+
+import pytest
+
+import lambda_handler
+from src.services import search_service
+
+PAGES = [
+    ('pdf-police', 1, 'The defendant ran a red light and struck the plaintiff.'),
+    ('pdf-police', 2, 'Witness statements put speed at > 40 mph & "reckless" driving'),
+    ('pdf-records', 1, 'Patient complains of back pain.'),
+    ('pdf-records', 2, 'Assessment: lumbar strain. Lumbar strain treated with physical therapy.'),
+    ('pdf-records', 3, 'Follow-up for lumbar strain, improving.'),
+    ('pdf-other', 1, 'Unrelated lumbar strain claim.'),
+]
+
+
+def _seed(conn):
+    """Two documents: a police report and medical records, plus facts"""
+    with conn.cursor() as cursor:
+        cursor.executemany(
+            'INSERT INTO pdfs (id, document_id, filename, s3_key) VALUES (%s, %s, %s, %s)',
+            [
+                ('pdf-police', 'doc-1', 'police.pdf', 'case/police.pdf'),
+                ('pdf-records', 'doc-1', 'records.pdf', 'case/records.pdf'),
+                ('pdf-other', 'doc-2', 'other.pdf', 'case/other.pdf'),
+            ],
+        )
+        cursor.executemany(
+            """
+            INSERT INTO facts (id, document_id, pdf_id, fact_text, citation, page_number, search_vector)
+            VALUES (%s, %s, %s, %s, %s, %s, to_tsvector('english', %s))
+            """,
+            [
+                ('fact-1', 'doc-1', 'pdf-records', 'Diagnosed with a lumbar strain', 'records.pdf, page 2', 2, 'Diagnosed with a lumbar strain'),
+                ('fact-2', 'doc-1', 'pdf-police', 'Defendant ran a red light', 'police.pdf, page 1', 1, 'Defendant ran a red light'),
+            ],
+        )
+        cursor.executemany(
+            """
+            INSERT INTO pdf_pages (pdf_id, page_number, fingerprint, text, search_vector)
+            VALUES (%s, %s, '', %s, to_tsvector('english', %s))
+            """,
+            [(pdf_id, number, text, text) for pdf_id, number, text in PAGES],
+        )
+
+
+def _pages(result):
+    return [(hit['pdfId'], hit['pageNumber']) for hit in result['pages']['hits']]
+
+
+def test_snippets_are_escaped_with_marked_matches():
+    snippet = f'Witness {search_service._START}statements{search_service._STOP}  <b>attached</b>'
+    
+    assert search_service.render_snippet(snippet) == 'Witness <mark>statements</mark> &lt;b&gt;attached&lt;/b&gt;'
+    assert search_service.render_snippet(None) == ''
+
+
+def test_unknown_scopes_are_rejected():
+    with pytest.raises(ValueError):
+        search_service.search('strain', scope='emails')
+
+
+def test_pages_are_ranked_and_snippeted(database):
+    _seed(database)
+    
+    result = search_service.search('"lumbar strain"', scope='pages', document_ids=['doc-1'])
+    
+    assert _pages(result) == [('pdf-records', 2), ('pdf-records', 3)]
+    assert result['pages']['matched'] == 2
+    assert not result['pages']['truncated']
+    first = result['pages']['hits'][0]
+    assert first['documentId'] == 'doc-1' and first['filename'] == 'records.pdf'
+    assert '<mark>lumbar</mark> <mark>strain</mark>' in first['snippet'].lower()
+    assert 'facts' not in result
+
+
+def test_page_results_are_paginated(database):
+    _seed(database)
+    
+    everything = _pages(search_service.search('lumbar strain', scope='pages'))
+    pages = [_pages(search_service.search('lumbar strain', scope='pages', limit=1, offset=offset)) for offset in range(4)]
+    
+    assert len(everything) == 3
+    assert [hit for page in pages for hit in page] == everything
+    assert pages[3] == []
+
+
+def test_page_markup_never_reaches_the_snippet(database):
+    _seed(database)
+    
+    result = search_service.search('witness', scope='pages')
+    
+    assert result['pages']['hits'][0]['snippet'] == (
+        '<mark>Witness</mark> statements put speed at &gt; 40 mph &amp; &quot;reckless&quot; driving'
+    )
+
+
+def test_facts_are_searched_with_their_citations(database):
+    _seed(database)
+    
+    result = search_service.search('red light', scope='all')
+    
+    assert [hit['factId'] for hit in result['facts']['hits']] == ['fact-2']
+    assert result['facts']['hits'][0]['citation'] == 'police.pdf, page 1'
+    assert _pages(result) == [('pdf-police', 1)]
+
+
+def test_reindex_backfills_rows_stored_without_vectors(database):
+    with database.cursor() as cursor:
+        cursor.execute("INSERT INTO pdf_pages (pdf_id, page_number, fingerprint, text) VALUES ('pdf-1', 1, '', 'Cervical sprain')")
+        cursor.execute("INSERT INTO facts (id, document_id, fact_text) VALUES ('fact-1', 'doc-1', 'Cervical sprain diagnosed')")
+    
+    assert search_service.reindex(batch_size=1) == {'pdf_pages': 1, 'facts': 1}
+    assert search_service.search('cervical', scope='all')['pages']['matched'] == 1
+    assert search_service.search('cervical', scope='facts')['facts']['matched'] == 1
+
+
+def test_handler_requires_a_query():
+    response = lambda_handler.handle_search({'query': '  '})
+    
+    assert response['statusCode'] == 400
+    assert json.loads(response['body']) == {'error': 'Missing query'}
+
+
+def _seed_many(conn, weak):
+    """weak pages mentioning a strain once, then one page about it at length"""
+    strong = 'Lumbar strain. Lumbar strain worsened; lumbar strain treated again.'
+    with conn.cursor() as cursor:
+        cursor.execute("INSERT INTO pdfs (id, document_id, filename, s3_key) VALUES ('pdf-1', 'doc-1', 'records.pdf', 'r')")
+        cursor.executemany(
+            """
+            INSERT INTO pdf_pages (pdf_id, page_number, fingerprint, text, search_vector)
+            VALUES ('pdf-1', %s, '', %s, to_tsvector('english', %s))
+            """,
+            [(number, text, text) for number, text in [
+                *((number, f'Visit {number}: lumbar strain noted in passing among many other findings') for number in range(1, weak + 1)),
+                (weak + 1, strong),
+            ]],
+        )
+        cursor.executemany(
+            "INSERT INTO facts (id, document_id, fact_text, search_vector) VALUES (%s, 'doc-1', %s, to_tsvector('english', %s))",
+            [(f'fact-{number:02}', text, text) for number, text in [
+                *((number, f'Lumbar strain noted at visit {number} among many other findings') for number in range(1, weak + 1)),
+                (weak + 1, strong),
+            ]],
+        )
+
+
+def test_the_best_matches_are_kept_when_matches_exceed_candidates(database, monkeypatch):
+    monkeypatch.setattr(search_service, 'SEARCH_RANK_CANDIDATES', 5)
+    _seed_many(database, weak=30)
+    
+    result = search_service.search('lumbar strain', scope='all', limit=3)
+    
+    assert result['pages']['hits'][0]['pageNumber'] == 31
+    assert result['facts']['hits'][0]['factId'] == 'fact-31'
+    assert result['pages']['matched'] == result['facts']['matched'] == 5
+    assert result['pages']['truncated'] and result['facts']['truncated']
+
+
+def test_pages_of_truncated_results_never_overlap(database, monkeypatch):
+    monkeypatch.setattr(search_service, 'SEARCH_RANK_CANDIDATES', 7)
+    _seed_many(database, weak=20)
+    
+    pages = [search_service.search('lumbar strain', scope='all', limit=2, offset=offset) for offset in range(0, 8, 2)]
+    
+    page_hits = [hit['pageNumber'] for result in pages for hit in result['pages']['hits']]
+    fact_hits = [hit['factId'] for result in pages for hit in result['facts']['hits']]
+    # Equal ranks fall back to page number and fact id order
+    assert page_hits == [21, 1, 2, 3, 4, 5, 6]
+    assert fact_hits == ['fact-21', 'fact-01', 'fact-02', 'fact-03', 'fact-04', 'fact-05', 'fact-06']
@@ -194,19 +194,21 @@ class DocumentController {
       // Trigger text extraction in background
       const aiServiceUrl = process.env.AI_SERVICE_URL || 'http://localhost:8000'
       
-      console.log(`[uploadPdf] Triggering text extraction for PDF ${pdf.id} at ${aiServiceUrl}/invoke`)
+      console.log(`[uploadPdf] Queueing text extraction for PDF ${pdf.id} at ${aiServiceUrl}/jobs`)
       
-      // Don't await - fire and forget
-      axios.post(`${aiServiceUrl}/invoke`, {
+      // Don't await - the AI service queues the job and returns its id right away.
+      // The file size lets its worker pool run small PDFs first.
+      axios.post(`${aiServiceUrl}/jobs`, {
         operation: 'extract_text',
         payload: {
           pdfId: pdf.id,
           s3Key: pdf.s3Key,
+          sizeBytes: file.size,
         },
-      }).then(() => {
-        console.log(`[uploadPdf] Text extraction triggered successfully for PDF ${pdf.id}`)
+      }).then((response) => {
+        console.log(`[uploadPdf] Text extraction queued for PDF ${pdf.id} as job ${response.data.job_id}`)
       }).catch((error) => {
-        console.error(`[uploadPdf] Error triggering text extraction for PDF ${pdf.id}:`, error.message)
+        console.error(`[uploadPdf] Error queueing text extraction for PDF ${pdf.id}:`, error.message)
         if (error.response) {
           console.error(`[uploadPdf] Response status: ${error.response.status}`)
           console.error(`[uploadPdf] Response data:`, error.response.data)
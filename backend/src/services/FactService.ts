@@ -21,8 +21,8 @@ class FactService {
    * 
    * Flow:
    * 1. Fetch all PDFs with extracted text from database
-   * 2. For each PDF, call AI service via HTTP POST to /invoke
-   * 3. AI service calls Claude API to extract structured facts
+   * 2. Send all PDFs to the AI service in one HTTP POST to /invoke (extract_facts_batch)
+   * 3. AI service calls Claude API concurrently to extract structured facts per PDF
    * 4. Parse returned JSON and save facts to database with status='pending'
    * 5. Log audit event for compliance
    * 
@@ -33,7 +33,6 @@ class FactService {
    * 
    * TODO [PRODUCTION]:
    * - Add retry logic with exponential backoff for AI service failures
-   * - Implement parallel processing instead of sequential (Promise.all)
    * - Add progress tracking for documents with many PDFs (WebSocket updates)
    * - Implement circuit breaker pattern if AI service is down
    * - Add timeout handling (currently waits indefinitely)
@@ -44,14 +43,15 @@ class FactService {
    * @throws Error if no PDFs found for document
    */
   async extractFactsFromDocument(documentId: string, userId: string) {
-    // Fetch all PDFs that have been uploaded and have extracted text
-    // Note: extractedText is populated by separate PDF text extraction step
+    // Fetch all PDFs that have been uploaded
+    // Note: the separate PDF text extraction step stores the text per page in
+    // pdf_pages; the AI service reads it from there by pdfId
     const pdfs = await prisma.pdf.findMany({
       where: { documentId },
       select: {
         id: true,
         filename: true,
-        extractedText: true, // Populated by pypdf in AI service
+        s3Key: true,
       },
     })
 
@@ -63,57 +63,83 @@ class FactService {
     const aiServiceUrl = process.env.AI_SERVICE_URL || 'http://localhost:8000'
     const allFacts = []
 
-    // Process each PDF sequentially
-    // TODO [PRODUCTION]: Use Promise.all() for parallel processing
-    for (const pdf of pdfs) {
-      if (!pdf.extractedText) {
-        // TODO [PRODUCTION]: Use structured logger instead of console.log
-        console.log(`Skipping ${pdf.filename} - no extracted text`)
+    // One /invoke call with operation='process_case' replaces a round trip per PDF
+    // AI service pipelines download, extraction and Anthropic Claude calls across PDFs;
+    // PDFs whose text extraction has not finished yet are extracted on the way
+    // Expects JSON response: { results: [{ pdfId, success, facts | error }] }
+    let results: any[] = []
+    try {
+      const response = await axios.post(`${aiServiceUrl}/invoke`, {
+        operation: 'process_case',
+        payload: {
+          documentId,
+          pdfs: pdfs.map((pdf) => ({
+            // Page text stays in the database; s3Key covers PDFs without page records
+            pdfId: pdf.id,
+            s3Key: pdf.s3Key,
+            pdfFilename: pdf.filename,
+          })),
+        },
+      })
+
+      // Parse response - AI service returns Lambda-style response format
+      // response.data.body contains JSON string with per-PDF results
+      results = response.data.body ? JSON.parse(response.data.body).results : []
+    } catch (error: any) {
+      // TODO [PRODUCTION]: Use Sentry for error tracking instead of console.error
+      console.error(`Error extracting facts for document ${documentId}:`, error.message)
+    }
+
+    const pdfsById = new Map(pdfs.map((pdf) => [pdf.id, pdf]))
+
+    for (const result of results) {
+      const pdf = pdfsById.get(result.pdfId)
+      if (!pdf) {
         continue
       }
 
-      try {
-        // Call AI service /invoke endpoint with operation='extract_facts'
-        // AI service will call Anthropic Claude API to extract structured facts
-        // Expects JSON response: { facts: [{ fact_text, category, page_reference }] }
-        const response = await axios.post(`${aiServiceUrl}/invoke`, {
-          operation: 'extract_facts',
-          payload: {
+      if (!result.success) {
+        // TODO [PRODUCTION]: Use Sentry for error tracking instead of console.error
+        // TODO [PRODUCTION]: Don't silently continue - notify user of failures
+        console.error(`Error extracting facts from ${pdf.filename}:`, result.error)
+        // Currently continues with the remaining PDFs if one fails
+        continue
+      }
+
+      // Save each fact to database with status='pending'
+      // Attorney will review and approve/edit/reject each fact before draft generation
+      for (const fact of result.facts) {
+        const created = await prisma.fact.create({
+          data: {
             documentId,
-            pdfText: pdf.extractedText,
-            pdfFilename: pdf.filename,
+            pdfId: pdf.id,
+            // Handle different field naming from AI service (snake_case vs camelCase)
+            factText: fact.fact_text || fact.factText || 'Unknown fact',
+            // Citation includes PDF filename and page reference for attorney verification,
+            // plus the other PDFs the AI service found the same fact in
+            citation: [
+              `${pdf.filename}, ${fact.page_reference || 'page unknown'}`,
+              ...(fact.also_cited_in || [])
+                .filter((other: any) => pdfsById.has(other.pdfId))
+                .map((other: any) => `${pdfsById.get(other.pdfId)!.filename}, ${other.page_reference || 'page unknown'}`),
+            ].join('; '),
+            // Set when the AI service could tie the fact to a real PDF page
+            pageNumber: fact.page_number ?? null,
+            status: 'pending', // Requires human approval before use in draft
           },
         })
-
-        // Parse response - AI service returns Lambda-style response format
-        // response.data.body contains JSON string with facts array
-        const facts = response.data.body ? JSON.parse(response.data.body).facts : []
-
-        // Save each fact to database with status='pending'
-        // Attorney will review and approve/edit/reject each fact before draft generation
-        for (const fact of facts) {
-          const created = await prisma.fact.create({
-            data: {
-              documentId,
-              pdfId: pdf.id,
-              // Handle different field naming from AI service (snake_case vs camelCase)
-              factText: fact.fact_text || fact.factText || 'Unknown fact',
-              // Citation includes PDF filename and page reference for attorney verification
-              citation: `${pdf.filename}, ${fact.page_reference || 'page unknown'}`,
-              status: 'pending', // Requires human approval before use in draft
-            },
-          })
-          allFacts.push(created)
-        }
-      } catch (error: any) {
-        // TODO [PRODUCTION]: Use Sentry for error tracking instead of console.error
-        // TODO [PRODUCTION]: Don't silently continue - notify user of failures
-        console.error(`Error extracting facts from ${pdf.filename}:`, error.message)
-        // Currently continues to next PDF if one fails
-        // Consider: Should we fail fast or continue processing?
+        allFacts.push(created)
       }
     }
 
+    // Index the new facts for full-text search (the search_vector column
+    // is not writable through the Prisma client)
+    await prisma.$executeRaw`
+      UPDATE facts
+      SET search_vector = to_tsvector('english', fact_text)
+      WHERE document_id = ${documentId} AND search_vector IS NULL
+    `
+
     // Create audit log for compliance tracking
     // All fact extractions are logged with metadata
     await prisma.auditLog.create({
@@ -209,6 +235,13 @@ class FactService {
       },
     })
 
+    if (data.factText !== undefined) {
+      // Keep the full-text search index in step with edited wording
+      await prisma.$executeRaw`
+        UPDATE facts SET search_vector = to_tsvector('english', fact_text) WHERE id = ${id}
+      `
+    }
+
     return fact
   }
 
@@ -47,11 +47,8 @@ def _write_paragraph(c: canvas.Canvas, text: str, width: float, height: float) -
     c._current_y = y  # type: ignore[attr-defined]
 
 
-def build_samples() -> None:
-    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
-
-    samples = {
-        "accident_intake_packet.pdf": """
+SAMPLES = {
+    "accident_intake_packet.pdf": """
 ACME LAW GROUP – CLIENT INTAKE
 ================================
 
@@ -95,7 +92,7 @@ CLIENT GOALS
 
 Prepared by: Intake Specialist Jamie Chen
 """,
-        "medical_summary.pdf": """
+    "medical_summary.pdf": """
 PATIENT MEDICAL SUMMARY
 =======================
 Patient: Taylor Johnson
@@ -132,7 +129,7 @@ FUNCTIONAL IMPACT
 - Sleep disruption due to pain flare-ups.
 - Needs ergonomic accommodations for desk work.
 """,
-        "demand_letter_reference.pdf": """
+    "demand_letter_reference.pdf": """
 DEMAND LETTER REFERENCE – DRAFT EXCERPT
 =======================================
 
@@ -163,18 +160,55 @@ Prepared by: Attorney Morgan Ellis
 Law Firm: ACME Law Group
 Contact: 555-0123 | mellis@acmelaw.com
 """,
-    }
+}
 
+
+def write_pdf(output_path: Path, content: str, title: str) -> None:
+    """Render text to a LETTER-sized PDF, paginating as needed."""
+    width, height = LETTER
+    c = canvas.Canvas(str(output_path), pagesize=LETTER)
+    c.setTitle(title)
+    c.setAuthor("Demand Letter Generator – Sample Data")
+    c.setFont("Helvetica", 12)
+    _write_paragraph(c, content.strip(), width, height)
+    c.save()
+
+
+def build_synthetic_pdf(output_path: Path, page_count: int, lines_per_page: int | None = None) -> None:
+    """
+    Write a PDF with exactly `page_count` pages of sample-like text.
+
+    Lines are cycled from the curated samples so text density and vocabulary
+    resemble real intake packets. `lines_per_page` controls page size in
+    characters; it defaults to a full page.
+    """
     width, height = LETTER
+    max_lines = int((height - 2 * MARGIN_Y) / LINE_HEIGHT)
+    lines_per_page = min(lines_per_page or max_lines, max_lines)
+    source = [line for text in SAMPLES.values() for line in text.strip().splitlines() if line.strip()]
+
+    c = canvas.Canvas(str(output_path), pagesize=LETTER)
+    c.setTitle(output_path.stem.replace("_", " ").title())
+    c.setAuthor("Demand Letter Generator – Sample Data")
+    cursor = 0
+    for page in range(1, page_count + 1):
+        c.setFont("Helvetica", 12)
+        y = height - MARGIN_Y
+        c.drawString(MARGIN_X, y, f"Exhibit page {page} of {page_count}")
+        for _ in range(lines_per_page - 1):
+            y -= LINE_HEIGHT
+            c.drawString(MARGIN_X, y, source[cursor % len(source)])
+            cursor += 1
+        c.showPage()
+    c.save()
+
+
+def build_samples() -> None:
+    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
-    for filename, content in samples.items():
+    for filename, content in SAMPLES.items():
         output_path = OUTPUT_DIR / filename
-        c = canvas.Canvas(str(output_path), pagesize=LETTER)
-        c.setTitle(filename.replace("_", " ").title())
-        c.setAuthor("Demand Letter Generator – Sample Data")
-        c.setFont("Helvetica", 12)
-        _write_paragraph(c, content.strip(), width, height)
-        c.save()
+        write_pdf(output_path, content, filename.replace("_", " ").title())
         try:
             relative = output_path.relative_to(Path.cwd())
         except ValueError: